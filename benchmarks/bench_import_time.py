@@ -0,0 +1,90 @@
+"""
+Cold-start benchmark: import time and peak memory of the app per deployment role.
+
+Usage:
+    python -m benchmarks.bench_import_time --repeat 3
+    python -m benchmarks.bench_import_time --roles accounts chat --warm
+
+Each measurement runs in a fresh interpreter, importing ``main`` with the
+role's ENABLED_ROUTERS. With --warm the role's lazy subsystems (TensorFlow
+model, FAISS index) are then loaded too, which is the cost a first request
+or WARM_UP pays. --modules also times single heavy modules on their own.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROLES = {
+    "all": ("auth,binance,timeseries,rag,forecasting,contact,cache", []),
+    "accounts": ("auth,binance,cache", []),
+    "charts": ("auth,timeseries", []),
+    "chat": ("auth,rag", ["rag"]),
+    "forecasting": ("auth,forecasting", ["forecasting"]),
+}
+
+MODULES = [
+    "routes.binance_routes",
+    "routes.timeseries_routes",
+    "routes.rag_bot_routes",
+    "routes.forecasting_routes",
+    "services.rag_services",
+    "services.forecasting_services",
+]
+
+# Runs in the child interpreter: import, optionally load lazy subsystems, report timings and peak RSS
+CHILD = """
+import asyncio, importlib, json, resource, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+imported = time.perf_counter() - start
+warm = None
+if len(sys.argv) > 2:
+    from services.lazy_loader import warm_up
+    start = time.perf_counter()
+    asyncio.run(warm_up(sys.argv[2].split(",")))
+    warm = time.perf_counter() - start
+print(json.dumps({"import": imported, "warm": warm, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def measure(module: str, env: dict, warm: list, repeat: int) -> dict:
+    results = []
+    for _ in range(repeat):
+        command = [sys.executable, "-c", CHILD, module] + ([",".join(warm)] if warm else [])
+        completed = subprocess.run(command, env={**os.environ, **env}, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"}
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    best = min(results, key=lambda result: result["import"])
+    return {**best, "rss_mb": max(result["rss_mb"] for result in results)}
+
+
+def print_row(name: str, result: dict) -> None:
+    if "error" in result:
+        print(f"{name:<34}  error: {result['error']}")
+        return
+    warm = f"{result['warm'] * 1000:>10.0f}" if result["warm"] is not None else f"{'-':>10}"
+    print(f"{name:<34}{result['import'] * 1000:>10.0f}{warm}{result['rss_mb']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app import time and memory per deployment role")
+    parser.add_argument("--roles", nargs="+", choices=ROLES, default=list(ROLES))
+    parser.add_argument("--warm", action="store_true", help="Also load the role's lazy subsystems")
+    parser.add_argument("--modules", action="store_true", help="Also time heavy modules on their own")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'target':<34}{'import ms':>10}{'warm ms':>10}{'peak MB':>10}")
+    for role in args.roles:
+        routers, lazy = ROLES[role]
+        print_row(f"main [{role}]", measure("main", {"ENABLED_ROUTERS": routers}, lazy if args.warm else [], args.repeat))
+    if args.modules:
+        for module in MODULES:
+            print_row(module, measure(module, {}, [], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Throughput benchmark for the vectorized indicator engine.
+
+Usage:
+    python -m benchmarks.bench_indicators --candles 1000000 --repeat 5 [--compare-pandas]
+    python -m benchmarks.bench_indicators --candles 1000000 --series-length 1000 --compare-pandas
+
+With --series-length the candles are split into many short series, which is
+what scanning many symbols per request looks like.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from services import indicators
+
+ONE_HOUR_MS = 60 * 60 * 1000
+
+
+# Helper function to build a random-walk OHLCV series
+def make_candles(n: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    close = 30000 + np.cumsum(rng.normal(0, 25, n))
+    spread = rng.random(n) * 40
+    return {
+        "open_time": 1_600_000_000_000 + np.arange(n, dtype=np.int64) * ONE_HOUR_MS,
+        "high": close + spread,
+        "low": close - spread,
+        "close": close,
+        "volume": rng.random(n) * 100
+    }
+
+
+def engine_kernels(c: dict) -> dict:
+    return {
+        "bollinger(20)": lambda: indicators.bollinger(c["close"], 20),
+        "rsi(14)": lambda: indicators.rsi(c["close"], 14),
+        "macd(12,26,9)": lambda: indicators.macd(c["close"]),
+        "stochastic(14,3)": lambda: indicators.stochastic(c["high"], c["low"], c["close"]),
+        "vwap(daily)": lambda: indicators.vwap(c["high"], c["low"], c["close"], c["volume"], c["open_time"])
+    }
+
+
+def pandas_kernels(c: dict) -> dict:
+    df = pd.DataFrame(c)
+    df["timestamp"] = pd.to_datetime(df["open_time"], unit="ms")
+
+    def rsi():
+        delta = df["close"].diff()
+        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+        return 100 - (100 / (1 + gain / loss))
+
+    def vwap():
+        pv = (df["high"] + df["low"] + df["close"]) / 3 * df["volume"]
+        date = df["timestamp"].dt.date
+        return pv.groupby(date).cumsum() / df["volume"].groupby(date).cumsum()
+
+    return {
+        "bollinger(20)": lambda: (df["close"].rolling(20).mean(), df["close"].rolling(20).std(), df["close"].ewm(span=20, adjust=False).mean()),
+        "rsi(14)": rsi,
+        "macd(12,26,9)": lambda: (df["close"].ewm(span=12, adjust=False).mean() - df["close"].ewm(span=26, adjust=False).mean()).ewm(span=9, adjust=False).mean(),
+        "stochastic(14,3)": lambda: (100 * (df["close"] - df["low"].rolling(14).min()) / (df["high"].rolling(14).max() - df["low"].rolling(14).min())).rolling(3).mean(),
+        "vwap(daily)": vwap
+    }
+
+
+def best_time(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indicator throughput")
+    parser.add_argument("--candles", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--series-length", type=int, default=None, help="Split the candles into series of this length")
+    parser.add_argument("--compare-pandas", action="store_true")
+    args = parser.parse_args()
+
+    length = args.series_length or args.candles
+    series = [make_candles(length, seed) for seed in range(max(1, args.candles // length))]
+    total = length * len(series)
+    print(f"{len(series)} series x {length} candles")
+
+    def run_all(kernels_for):
+        kernels = [kernels_for(candles) for candles in series]
+        return {name: (lambda name=name: [k[name]() for k in kernels]) for name in kernels[0]}
+
+    engine = run_all(engine_kernels)
+    baseline = run_all(pandas_kernels) if args.compare_pandas else {}
+
+    print(f"{'indicator':<18}{'engine ms':>12}{'Mcandles/s':>12}" + (f"{'pandas ms':>12}{'speedup':>10}" if baseline else ""))
+    for name, fn in engine.items():
+        elapsed = best_time(fn, args.repeat)
+        line = f"{name:<18}{elapsed * 1000:>12.1f}{total / elapsed / 1e6:>12.1f}"
+        if baseline:
+            pandas_elapsed = best_time(baseline[name], args.repeat)
+            line += f"{pandas_elapsed * 1000:>12.1f}{pandas_elapsed / elapsed:>9.1f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Recall/latency benchmark for the chatbot's FAISS index types.
+
+Usage:
+    python -m benchmarks.bench_rag_index --vectors 100000 --dimension 1536 --queries 500
+    python -m benchmarks.bench_rag_index --store binance_docs_index_store --queries 200
+
+Recall@k is measured against exact (flat) search. With --store the vectors of
+an existing store are used, and queries are stored vectors plus noise, which
+is close to how user questions land near document chunks. Load times are for
+reading each index into memory versus memory-mapping it.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from services import vector_index
+
+
+# Helper function to build clustered random vectors, which behave more like embeddings than uniform noise
+def make_vectors(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 1, (max(1, n // 100), dimension))
+    vectors = centers[rng.integers(0, len(centers), n)] + rng.normal(0, 0.3, (n, dimension))
+    return vectors.astype(np.float32)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    return (picked + rng.normal(0, 0.1, picked.shape)).astype(np.float32)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+# Helper function to time single-query searches, the way the chatbot issues them
+def search_latencies(index, queries: np.ndarray, k: int):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[np.newaxis, :], k)
+        timings.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return np.array(results), np.array(timings) * 1000
+
+
+def load_time(path: str, index_type: str, mmap: bool) -> float:
+    start = time.perf_counter()
+    vector_index.read_index(path, index_type, mmap)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index types for the docs chatbot")
+    parser.add_argument("--store", default=None, help="Take vectors from an existing store instead of generating them")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    args = parser.parse_args()
+
+    if args.store:
+        stored = faiss.read_index(str(Path(args.store) / vector_index.INDEX_FILE))
+        vectors = stored.reconstruct_n(0, stored.ntotal)
+    else:
+        vectors = make_vectors(args.vectors, args.dimension)
+    queries = make_queries(vectors, args.queries)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = []
+        for index_type, knob, values in (
+            (vector_index.FLAT_INDEX, None, [None]),
+            (vector_index.IVF_INDEX, "nprobe", args.nprobe),
+            (vector_index.HNSW_INDEX, "efSearch", args.ef_search),
+        ):
+            start = time.perf_counter()
+            index = vector_index.make_index(vectors, index_type, args.nlist, args.hnsw_m)
+            build_seconds = time.perf_counter() - start
+            path = Path(workdir) / index_type
+            path.mkdir()
+            faiss.write_index(index, str(path / vector_index.INDEX_FILE))
+            print(
+                f"{index_type:<6} build {build_seconds:6.1f}s  "
+                f"load {load_time(str(path), index_type, False) * 1000:8.1f}ms  "
+                f"mmap {load_time(str(path), index_type, True) * 1000:8.1f}ms"
+            )
+            runs.append((index_type, knob, values, index))
+
+        truth = None
+        print(f"\n{'index':<8}{'param':>14}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for index_type, knob, values, index in runs:
+            for value in values:
+                if knob == "nprobe":
+                    vector_index.tune_index(index, nprobe=value)
+                elif knob == "efSearch":
+                    vector_index.tune_index(index, ef_search=value)
+                found, latencies = search_latencies(index, queries, args.k)
+                if truth is None:
+                    truth = found
+                param = f"{knob}={value}" if knob else "exact"
+                print(
+                    f"{index_type:<8}{param:>14}{recall(found, truth):>10.3f}"
+                    f"{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 95):>10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
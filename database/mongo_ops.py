@@ -1,8 +1,35 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
 from fastapi import HTTPException
+from cachetools import TTLCache
+from services.cache_utils import AsyncTTLCache
 
-# Connect to MongoDB
-mongo_client = MongoClient("mongodb://localhost:27017/vasu")
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Connection pool settings; every request shares this one client
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/vasu")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# Connect to MongoDB (non-blocking Motor client, so queries overlap with other I/O)
+mongo_client = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS
+)
 db = mongo_client["binance_db"]
 users_collection = db["users"]
 spot_data_collection = db["spot_data"]
@@ -13,7 +40,110 @@ futures_account_info_collection = db["futures_account_info"]
 futures_trades_collection = db["futures_trades"]
 futures_position_info_collection = db["futures_positions_info"]
 futures_account_balances_collection = db["futures_account_balances"]
+# One small index document per user (latest bucket) plus fixed-size buckets of chat messages
 conversations_collection = db["conversations"]
+conversation_buckets_collection = db["conversation_buckets"]
+traded_symbols_collection = db["traded_symbols"]
+sync_watermarks_collection = db["sync_watermarks"]
+
+# One document per trade / transfer, unique per account
+spot_trade_records_collection = db["spot_trade_records"]
+futures_trade_records_collection = db["futures_trade_records"]
+transfer_records_collection = db["universal_transfer_records"]
+
+ACCOUNT_KEY_FIELDS = ("user_id", "client_name", "account_name")
+TRADE_KEY_FIELDS = ACCOUNT_KEY_FIELDS + ("symbol", "id")
+TRANSFER_KEY_FIELDS = ACCOUNT_KEY_FIELDS + ("tranId",)
+
+# Chat messages per bucket document; a new bucket is opened when the latest one is full
+CONVERSATION_BUCKET_SIZE = int(os.getenv("CONVERSATION_BUCKET_SIZE", "100"))
+# Buckets kept per user, oldest dropped first (0 keeps all)
+CONVERSATION_MAX_BUCKETS = int(os.getenv("CONVERSATION_MAX_BUCKETS", "0"))
+# Buckets whose newest message is older than this are deleted by a TTL index (0 keeps them)
+CONVERSATION_RETENTION_DAYS = float(os.getenv("CONVERSATION_RETENTION_DAYS", "0"))
+
+# Account credentials rarely change, so authenticated requests read them from memory
+ACCOUNT_CACHE_TTL_SECONDS = int(os.getenv("ACCOUNT_CACHE_TTL_SECONDS", "300"))
+ACCOUNT_CACHE_MAXSIZE = 1024
+account_cache = AsyncTTLCache("account_credentials", maxsize=ACCOUNT_CACHE_MAXSIZE, ttl=ACCOUNT_CACHE_TTL_SECONDS)
+
+# Cache keys of every cached account document, by Mongo _id, for targeted invalidation;
+# bounded like the cache itself, and an id expires no earlier than the entries loaded for it
+_account_cache_keys: TTLCache = TTLCache(maxsize=ACCOUNT_CACHE_MAXSIZE, ttl=ACCOUNT_CACHE_TTL_SECONDS)
+
+# Backoff between attempts to reopen the account change stream
+ACCOUNT_WATCH_RETRY_SECONDS = 1.0
+ACCOUNT_WATCH_MAX_RETRY_SECONDS = 60.0
+
+# Server error codes: change streams unsupported (standalone server), resume point no longer in the oplog
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573}
+CHANGE_STREAM_HISTORY_LOST_CODES = {136, 280, 286}
+
+# Helper function to load an account document through the credential cache
+async def find_account(cache_key: Tuple, query: Dict[str, Any]) -> Dict[str, Any]:
+    async def load_account():
+        account = await accounts_collection.find_one(query)
+        if not account:
+            # Raised inside the loader so missing accounts are never cached
+            raise HTTPException(status_code=404, detail="Failed to get account information")
+        # Re-set rather than mutate so the id's TTL restarts with this load
+        _account_cache_keys[account["_id"]] = _account_cache_keys.get(account["_id"], set()) | {cache_key}
+        return account
+
+    return await account_cache.get_or_load(cache_key, load_account)
+
+# Helper function to drop cached credentials of one account document, or all of them
+def invalidate_account_cache(account_id: Optional[Any] = None):
+    if account_id is None:
+        account_cache.clear()
+        _account_cache_keys.clear()
+        return
+    for cache_key in _account_cache_keys.pop(account_id, ()):
+        account_cache.invalidate(cache_key)
+    # A load still running may be reading this account under a key not recorded yet
+    account_cache.invalidate_loading()
+
+# Background task invalidating cached credentials whenever an account document changes
+async def watch_account_changes():
+    """
+    Follow the accounts change stream for the life of the app.
+
+    A dropped stream is reopened with exponential backoff from the last
+    resume token, so no change is missed. When there is no usable token the
+    whole credential cache is dropped instead, since changes made while the
+    stream was down cannot be replayed.
+    """
+    resume_token = None
+    delay = ACCOUNT_WATCH_RETRY_SECONDS
+    while True:
+        try:
+            async with accounts_collection.watch(resume_after=resume_token) as stream:
+                delay = ACCOUNT_WATCH_RETRY_SECONDS
+                resume_token = stream.resume_token or resume_token
+                async for change in stream:
+                    if "documentKey" in change:
+                        invalidate_account_cache(change["documentKey"]["_id"])
+                    else:
+                        # drop / rename / invalidate events
+                        invalidate_account_cache()
+                    resume_token = stream.resume_token
+                # The stream ends after an invalidate event and cannot be resumed past it
+                resume_token = None
+        except OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                # Change streams need a replica set; on a standalone server entries expire by TTL only
+                logger.warning(f"Account change stream unavailable, relying on cache TTL: {str(e)}")
+                return
+            if e.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                resume_token = None
+            logger.error(f"Account change stream failed, retrying in {delay:.0f}s: {str(e)}")
+        except Exception as e:
+            logger.error(f"Account change stream stopped, retrying in {delay:.0f}s: {str(e)}")
+
+        if resume_token is None:
+            invalidate_account_cache()
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, ACCOUNT_WATCH_MAX_RETRY_SECONDS)
 
 # Helper function to get account info from MongoDB
 async def get_account_info(client_name: str,account_name: str):
@@ -23,9 +153,7 @@ async def get_account_info(client_name: str,account_name: str):
         "message": "Failed to get account information",
         "data": None
     }
-    account = accounts_collection.find_one({"client_name": client_name, "account_name": account_name})
-    if not account:
-        raise HTTPException(status_code=base_response["status_code"], detail=base_response["message"])
+    account = await find_account(("account", client_name, account_name), {"client_name": client_name, "account_name": account_name})
     
     # Explicitly create a JSON-serializable dictionary
     account_data = {
@@ -49,9 +177,7 @@ async def get_account_info_by_email(email: str):
         "message": "Failed to get account information",
         "data": None
     }
-    account = accounts_collection.find_one({"email": email})
-    if not account:
-        raise HTTPException(status_code=base_response["status_code"], detail=base_response["message"])
+    account = await find_account(("email", email), {"email": email})
     
     # Explicitly create a JSON-serializable dictionary
     account_data = {
@@ -64,4 +190,350 @@ async def get_account_info_by_email(email: str):
     base_response["status_code"] = 200
     base_response["message"] = "Fetch account information successfully"
     base_response["data"] = account_data
-    return base_response
\ No newline at end of file
+    return base_response
+
+# Helper function to get the per-symbol trade sync watermarks of an account
+async def get_sync_watermarks(user_id: str, client_name: str, account_name: str, market: str) -> Dict[str, Dict[str, Any]]:
+    watermarks = sync_watermarks_collection.find(
+        {"user_id": user_id, "client_name": client_name, "account_name": account_name, "market": market},
+        {"_id": 0, "symbol": 1, "last_trade_id": 1, "last_trade_time": 1}
+    )
+    return {watermark["symbol"]: watermark async for watermark in watermarks}
+
+# Helper function to advance trade sync watermarks after new trades are stored
+async def set_sync_watermarks(user_id: str, client_name: str, account_name: str, market: str, watermarks: Dict[str, Tuple[int, datetime]]):
+    if not watermarks:
+        return
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name, "market": market, "symbol": symbol},
+            {"$set": {"last_trade_id": last_trade_id, "last_trade_time": last_trade_time, "synced_at": datetime.utcnow()}},
+            upsert=True
+        )
+        for symbol, (last_trade_id, last_trade_time) in watermarks.items()
+    ]
+    await sync_watermarks_collection.bulk_write(operations, ordered=False)
+
+# Helper function to insert records that are not stored yet; existing rows are left untouched
+async def upsert_records(collection, records: List[Dict[str, Any]], key_fields: Sequence[str]) -> int:
+    if not records:
+        return 0
+    operations = [
+        UpdateOne({field: record[field] for field in key_fields}, {"$setOnInsert": record}, upsert=True)
+        for record in records
+    ]
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.upserted_count
+
+# Index definitions per collection: (fields, options). Reads filter on the account
+# first, then symbol and time, so those lead every compound index.
+def _keys(*fields: str) -> List[Tuple[str, int]]:
+    return [(field, ASCENDING) for field in fields]
+
+INDEXES = [
+    (spot_trade_records_collection, [
+        (_keys(*TRADE_KEY_FIELDS), {"unique": True, "name": "account_symbol_trade_id"}),
+        (_keys(*ACCOUNT_KEY_FIELDS, "symbol", "time", "id"), {"name": "account_symbol_time_id"}),
+        (_keys(*ACCOUNT_KEY_FIELDS, "time", "id"), {"name": "account_time_id"}),
+    ]),
+    (futures_trade_records_collection, [
+        (_keys(*TRADE_KEY_FIELDS), {"unique": True, "name": "account_symbol_trade_id"}),
+        (_keys(*ACCOUNT_KEY_FIELDS, "symbol", "time", "id"), {"name": "account_symbol_time_id"}),
+        (_keys(*ACCOUNT_KEY_FIELDS, "time", "id"), {"name": "account_time_id"}),
+    ]),
+    (transfer_records_collection, [
+        (_keys(*TRANSFER_KEY_FIELDS), {"unique": True, "name": "account_tran_id"}),
+        (_keys(*ACCOUNT_KEY_FIELDS, "timestamp", "tranId"), {"name": "account_timestamp_tran_id"}),
+    ]),
+    (sync_watermarks_collection, [
+        (_keys(*ACCOUNT_KEY_FIELDS, "market", "symbol"), {"unique": True, "name": "account_market_symbol"}),
+    ]),
+    (traded_symbols_collection, [
+        (_keys(*ACCOUNT_KEY_FIELDS, "market"), {"unique": True, "name": "account_market"}),
+    ]),
+    (spot_data_collection, [(_keys(*ACCOUNT_KEY_FIELDS), {"name": "account"})]),
+    (futures_account_info_collection, [(_keys(*ACCOUNT_KEY_FIELDS), {"name": "account"})]),
+    (futures_position_info_collection, [(_keys(*ACCOUNT_KEY_FIELDS), {"name": "account"})]),
+    (futures_account_balances_collection, [(_keys(*ACCOUNT_KEY_FIELDS), {"name": "account"})]),
+    (accounts_collection, [
+        (_keys("client_name", "account_name"), {"name": "client_account"}),
+        (_keys("email"), {"name": "email"}),
+    ]),
+    (users_collection, [(_keys("email"), {"name": "email"})]),
+    (conversations_collection, [(_keys("user_id"), {"name": "user_id"})]),
+    (conversation_buckets_collection, [(_keys("user_id", "seq"), {"name": "user_seq", "unique": True})]),
+]
+
+# Indexes replaced by the ones above; sorted scans need the tie-breaking id in the index
+SUPERSEDED_INDEXES = [
+    (spot_trade_records_collection, ["account_symbol_time", "account_time"]),
+    (futures_trade_records_collection, ["account_symbol_time", "account_time"]),
+    (transfer_records_collection, ["account_timestamp"]),
+]
+
+# Helper function to create the indexes the collections rely on (idempotent, run at startup)
+async def ensure_indexes():
+    for collection, indexes in INDEXES:
+        for keys, options in indexes:
+            await collection.create_index(keys, **options)
+    for collection, names in SUPERSEDED_INDEXES:
+        existing = await collection.index_information()
+        for name in names:
+            if name in existing:
+                await collection.drop_index(name)
+    await ensure_conversation_retention()
+    logger.info("MongoDB indexes ensured")
+
+# Helper function to keep the conversation TTL index in line with CONVERSATION_RETENTION_DAYS
+async def ensure_conversation_retention():
+    name = "retention"
+    existing = (await conversation_buckets_collection.index_information()).get(name)
+    if CONVERSATION_RETENTION_DAYS <= 0:
+        if existing:
+            await conversation_buckets_collection.drop_index(name)
+        return
+    ttl = int(CONVERSATION_RETENTION_DAYS * 86400)
+    if existing is None:
+        await conversation_buckets_collection.create_index([("last_timestamp", ASCENDING)], name=name, expireAfterSeconds=ttl)
+    elif existing.get("expireAfterSeconds") != ttl:
+        # Changing the expiry of an existing TTL index goes through collMod, not create_index
+        await db.command("collMod", conversation_buckets_collection.name, index={"name": name, "expireAfterSeconds": ttl})
+
+# Helper function to build a projection that returns only the given fields
+def fields_projection(fields: Sequence[str]) -> Dict[str, int]:
+    return {"_id": 0, **{field: 1 for field in fields}}
+
+# Documents fetched per round trip when a query result is iterated instead of loaded whole
+STREAM_BATCH_SIZE = int(os.getenv("MONGO_STREAM_BATCH_SIZE", "1000"))
+
+# Helper function to open a cursor over an account's stored trades within a time range, oldest first
+def trades_in_range_cursor(
+    collection,
+    account: Dict[str, Any],
+    start_dt: datetime,
+    end_dt: datetime,
+    fields: Sequence[str],
+    symbol: Optional[str] = None
+):
+    query = {**account, "time": {"$gte": start_dt, "$lte": end_dt}}
+    if symbol:
+        query["symbol"] = symbol
+    cursor = collection.find(query, fields_projection(fields)).sort([("time", ASCENDING), ("id", ASCENDING)])
+    return cursor.batch_size(STREAM_BATCH_SIZE)
+
+# Helper function to query an account's stored trades within a time range, oldest first
+async def find_trades_in_range(
+    collection,
+    account: Dict[str, Any],
+    start_dt: datetime,
+    end_dt: datetime,
+    fields: Sequence[str],
+    symbol: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    return await trades_in_range_cursor(collection, account, start_dt, end_dt, fields, symbol).to_list(length=None)
+
+# Helper function to open a cursor over an account's stored transfers, optionally within a time range, oldest first
+def transfers_cursor(
+    account: Dict[str, Any],
+    fields: Sequence[str],
+    start_dt: Optional[datetime] = None,
+    end_dt: Optional[datetime] = None
+):
+    query = dict(account)
+    if start_dt and end_dt:
+        query["timestamp"] = {"$gte": start_dt, "$lte": end_dt}
+    cursor = transfer_records_collection.find(query, fields_projection(fields)).sort([("timestamp", ASCENDING), ("tranId", ASCENDING)])
+    return cursor.batch_size(STREAM_BATCH_SIZE)
+
+# Helper function to query the most recent stored trades of each symbol of an account, oldest first
+async def find_recent_trades(
+    collection,
+    account: Dict[str, Any],
+    limit: int,
+    fields: Sequence[str],
+    symbol: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    symbols = [symbol] if symbol else await collection.distinct("symbol", account)
+    trades = []
+    for trade_symbol in symbols:
+        cursor = collection.find({**account, "symbol": trade_symbol}, fields_projection(fields))
+        trades.extend(await cursor.sort([("time", DESCENDING), ("id", DESCENDING)]).limit(limit).to_list(length=None))
+    trades.sort(key=lambda trade: (trade["time"], trade["id"]))
+    return trades
+
+# Helper function to read one page of documents after a keyset position, newest first
+async def find_keyset_page(
+    collection,
+    query: Dict[str, Any],
+    time_field: str,
+    id_field: str,
+    fields: Sequence[str],
+    page_size: int,
+    after: Optional[Tuple[datetime, Any]] = None
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Documents matching ``query`` ordered by (``time_field``, ``id_field``)
+    descending, strictly after ``after`` in that order. The time bound is
+    applied as a range on the indexed field, so each page is an index range
+    scan no matter how deep into the history it is. Returns the page and
+    whether more documents follow.
+    """
+    query = dict(query)
+    if after is not None:
+        after_time, after_id = after
+        time_range = dict(query.get(time_field, {}))
+        time_range["$lte"] = min(time_range.get("$lte", after_time), after_time)
+        query[time_field] = time_range
+        query["$or"] = [{time_field: {"$lt": after_time}}, {id_field: {"$lt": after_id}}]
+    cursor = collection.find(query, fields_projection(fields)).sort([(time_field, DESCENDING), (id_field, DESCENDING)])
+    documents = await cursor.limit(page_size + 1).to_list(length=None)
+    return documents[:page_size], len(documents) > page_size
+
+# Helper function to build the update that appends messages to a conversation bucket
+def _bucket_append(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "$push": {"messages": {"$each": messages}},
+        "$inc": {"count": len(messages)},
+        "$min": {"first_timestamp": messages[0]["timestamp"]},
+        "$max": {"last_timestamp": messages[-1]["timestamp"]}
+    }
+
+# Helper function to read the seq of a user's newest conversation bucket
+async def _latest_conversation_seq(user_id: str) -> Optional[int]:
+    index = await conversations_collection.find_one({"user_id": user_id}, {"_id": 0, "latest_seq": 1})
+    return index.get("latest_seq") if index else None
+
+# Helper function to append messages to a user's chat conversation, opening a new bucket when the latest is full
+async def append_conversation_messages(user_id: str, messages: List[Dict[str, Any]]):
+    """
+    Messages live in ``conversation_buckets`` documents of at most
+    CONVERSATION_BUCKET_SIZE messages, numbered by ``seq`` per user; the
+    user's ``conversations`` document only records ``latest_seq``. An append
+    touches two small documents no matter how long the conversation is.
+
+    Concurrent appends never overfill a bucket: every write is guarded by
+    the bucket's count, and a bucket without room sends the append on to the
+    next one.
+    """
+    room = {"$lte": CONVERSATION_BUCKET_SIZE - len(messages)}
+    seq = await _latest_conversation_seq(user_id) or 0
+    while True:
+        try:
+            # Appends to bucket seq if it has room, creates it if missing, and raises if it is full
+            await conversation_buckets_collection.update_one(
+                {"user_id": user_id, "seq": seq, "count": room},
+                _bucket_append(messages),
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            # The bucket is full, or another request created it at the same moment and it may still have room
+            bucket = await conversation_buckets_collection.find_one({"user_id": user_id, "seq": seq}, {"_id": 0, "count": 1})
+            if bucket is not None and bucket.get("count", 0) > room["$lte"]:
+                seq += 1
+            seq = max(seq, await _latest_conversation_seq(user_id) or 0)
+    await conversations_collection.update_one({"user_id": user_id}, {"$max": {"latest_seq": seq}}, upsert=True)
+    if CONVERSATION_MAX_BUCKETS > 0:
+        await conversation_buckets_collection.delete_many({"user_id": user_id, "seq": {"$lte": seq - CONVERSATION_MAX_BUCKETS}})
+
+# Helper function to read one page of a user's chat history, newest first
+async def find_conversation_page(
+    user_id: str,
+    page_size: int,
+    before: Optional[Tuple[int, int]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[int, int]]]:
+    """
+    ``before`` is a (bucket seq, offset) position: the page starts with the
+    message just before ``offset`` in that bucket. Returns the messages and
+    the position of the next page, or None when the history is exhausted.
+    Only the buckets the page spans are read.
+    """
+    query: Dict[str, Any] = {"user_id": user_id}
+    if before is not None:
+        query["seq"] = {"$lte": before[0]}
+    cursor = conversation_buckets_collection.find(query, {"_id": 0, "seq": 1, "messages": 1}).sort("seq", DESCENDING)
+    page: List[Dict[str, Any]] = []
+    async for bucket in cursor:
+        messages = bucket["messages"]
+        if before is not None and bucket["seq"] == before[0]:
+            messages = messages[:before[1]]
+        taken = messages[-(page_size - len(page)):]
+        page.extend(reversed(taken))
+        if len(page) < page_size:
+            continue
+        if len(messages) > len(taken):
+            return page, (bucket["seq"], len(messages) - len(taken))
+        older = await cursor.to_list(length=1)
+        return page, ((older[0]["seq"], len(older[0]["messages"])) if older else None)
+    return page, None
+
+# Helper function to load the last messages of a user's chat conversation, oldest first
+async def recent_conversation_messages(user_id: str, limit: int) -> List[Dict[str, Any]]:
+    if limit <= 0:
+        return []
+    messages, _ = await find_conversation_page(user_id, limit)
+    return messages[::-1]
+
+# Helper function to move conversations stored as one ever-growing messages array into buckets
+async def migrate_legacy_conversations() -> int:
+    migrated = 0
+    async for conversation in conversations_collection.find({"messages": {"$exists": True}}):
+        user_id = conversation["user_id"]
+        messages = conversation["messages"]
+        chunks = [messages[i:i + CONVERSATION_BUCKET_SIZE] for i in range(0, len(messages), CONVERSATION_BUCKET_SIZE)]
+        # Legacy messages predate any bucket, so they are numbered below the oldest existing one
+        oldest = await conversation_buckets_collection.find_one({"user_id": user_id}, {"seq": 1}, sort=[("seq", ASCENDING)])
+        first_seq = (oldest["seq"] if oldest else len(chunks)) - len(chunks)
+        if chunks:
+            await conversation_buckets_collection.insert_many([
+                {
+                    "user_id": user_id,
+                    "seq": first_seq + i,
+                    "count": len(chunk),
+                    "messages": chunk,
+                    "first_timestamp": chunk[0]["timestamp"],
+                    "last_timestamp": chunk[-1]["timestamp"]
+                }
+                for i, chunk in enumerate(chunks)
+            ])
+        update: Dict[str, Any] = {"$unset": {"messages": ""}}
+        if chunks:
+            update["$max"] = {"latest_seq": first_seq + len(chunks) - 1}
+        await conversations_collection.update_one({"_id": conversation["_id"]}, update)
+        migrated += len(messages)
+    logger.info(f"Migrated {migrated} legacy conversation messages into buckets")
+    return migrated
+
+# Helper function to copy legacy one-document-per-account arrays into the per-record collections
+async def migrate_legacy_trade_documents() -> Dict[str, int]:
+    migrated = {"spot_trades": 0, "futures_trades": 0, "transfers": 0}
+
+    async for document in trades_collection.find({"trades": {"$exists": True}}):
+        # Legacy spot documents were stored per user without an account name; use it when unambiguous
+        account_name = document.get("account_name")
+        if account_name is None:
+            accounts = await accounts_collection.find({"client_name": document.get("client_name")}, {"account_name": 1}).to_list(length=None)
+            if len(accounts) == 1:
+                account_name = accounts[0]["account_name"]
+            else:
+                logger.warning(f"Cannot resolve account for legacy spot trades of user {document['user_id']}; skipping")
+                continue
+        account = {"user_id": document["user_id"], "client_name": document.get("client_name"), "account_name": account_name, "email": document.get("email")}
+        migrated["spot_trades"] += await upsert_records(
+            spot_trade_records_collection, [{**account, **trade} for trade in document["trades"]], TRADE_KEY_FIELDS
+        )
+
+    async for document in futures_trades_collection.find({"trades": {"$exists": True}}):
+        account = {field: document.get(field) for field in ACCOUNT_KEY_FIELDS + ("email",)}
+        migrated["futures_trades"] += await upsert_records(
+            futures_trade_records_collection, [{**account, **trade} for trade in document["trades"]], TRADE_KEY_FIELDS
+        )
+
+    async for document in transfers_collection.find({"transfers": {"$exists": True}}):
+        account = {field: document.get(field) for field in ACCOUNT_KEY_FIELDS + ("email",)}
+        migrated["transfers"] += await upsert_records(
+            transfer_records_collection, [{**account, **transfer} for transfer in document["transfers"]], TRANSFER_KEY_FIELDS
+        )
+
+    logger.info(f"Migrated legacy documents: {migrated}")
+    return migrated
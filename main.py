@@ -1,20 +1,53 @@
+import asyncio
+import importlib
+import os
+import logging
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from routes.auth_routes import *
-from routes.binance_routes import *
-from routes.timeseries_routes import *
-from routes.rag_bot_routes import *
-from routes.forecasting_routes import *
-from routes.contact_routes import *
-
-app = FastAPI()
-
-app.include_router(auth_router)
-app.include_router(binance_router)
-app.include_router(timeseries_router)
-app.include_router(rag_bot_router)
-app.include_router(forecast_router)
-app.include_router(contact_router)
+from services.lazy_loader import close_loaded, warm_up
+from database.mongo_ops import ensure_indexes, migrate_legacy_conversations, migrate_legacy_trade_documents
+
+# orjson serializes responses several times faster than the stdlib json encoder
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Routers by name: (module, router attribute). Modules of disabled routers are never imported.
+ROUTERS = {
+    "auth": ("routes.auth_routes", "auth_router"),
+    "binance": ("routes.binance_routes", "binance_router"),
+    "timeseries": ("routes.timeseries_routes", "timeseries_router"),
+    "rag": ("routes.rag_bot_routes", "rag_bot_router"),
+    "forecasting": ("routes.forecasting_routes", "forecast_router"),
+    "contact": ("routes.contact_routes", "contact_router"),
+    "cache": ("routes.cache_routes", "cache_router"),
+}
+
+# Routers served by this deployment role, e.g. ENABLED_ROUTERS=auth,binance,cache for an accounts-only worker
+ENABLED_ROUTERS = [name.strip() for name in os.getenv("ENABLED_ROUTERS", ",".join(ROUTERS)).split(",") if name.strip()]
+
+# Lazily loaded subsystems to load in the background at startup, e.g. WARM_UP=rag,forecasting
+WARM_UP = [name.strip() for name in os.getenv("WARM_UP", "").split(",") if name.strip()]
+
+for router_name in ENABLED_ROUTERS:
+    if router_name not in ROUTERS:
+        raise ValueError(f"Unknown router in ENABLED_ROUTERS: {router_name} (expected one of {', '.join(ROUTERS)})")
+    module_name, attribute = ROUTERS[router_name]
+    app.include_router(getattr(importlib.import_module(module_name), attribute))
+
+# Routers that call Binance with stored account credentials; the Binance background services are
+# imported and started only when one of them is enabled
+BINANCE_ROUTERS = ("binance", "timeseries")
+USES_BINANCE = any(router_name in ENABLED_ROUTERS for router_name in BINANCE_ROUTERS)
+
+if USES_BINANCE:
+    from services.binance_client_pool import binance_client_pool
+    from services.exchange_info import start_exchange_info_refresh, stop_exchange_info_refresh
+    from database.mongo_ops import watch_account_changes
+if "binance" in ENABLED_ROUTERS:
+    from services.snapshot_scheduler import snapshot_scheduler
+    from services.user_data_stream import user_data_streams
+if "timeseries" in ENABLED_ROUTERS:
+    from services.market_data_hub import market_data_hub
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +57,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def prepare_database():
+    try:
+        await ensure_indexes()
+        # One-off copy of the old one-document-per-account trade arrays
+        if os.getenv("MIGRATE_LEGACY_TRADES") == "1":
+            await migrate_legacy_trade_documents()
+        # One-off split of the old one-document-per-user chat histories into buckets
+        if os.getenv("MIGRATE_LEGACY_CONVERSATIONS") == "1":
+            await migrate_legacy_conversations()
+    except Exception as e:
+        logging.getLogger(__name__).error(f"MongoDB startup preparation failed: {str(e)}")
+    app.state.account_watcher = None
+    if USES_BINANCE:
+        # Keep cached account credentials in sync with the accounts collection
+        app.state.account_watcher = asyncio.create_task(watch_account_changes())
+        # Keep exchange metadata (symbol lists, assets, status) fresh in memory
+        start_exchange_info_refresh()
+    if "binance" in ENABLED_ROUTERS:
+        # Refresh account snapshots in the background so endpoints can serve them from MongoDB
+        snapshot_scheduler.start()
+        # Live balances and positions from Binance user data streams (USER_DATA_STREAMS=1)
+        user_data_streams.start()
+    # Load models and indexes before their first request without delaying startup
+    app.state.warm_up = asyncio.create_task(warm_up(WARM_UP))
+
+@app.on_event("shutdown")
+async def shutdown_background_work():
+    if app.state.account_watcher is not None:
+        app.state.account_watcher.cancel()
+    app.state.warm_up.cancel()
+    if "binance" in ENABLED_ROUTERS:
+        await snapshot_scheduler.stop()
+        await user_data_streams.stop()
+    if "timeseries" in ENABLED_ROUTERS:
+        await market_data_hub.close()
+    # Drain or release lazily loaded subsystems (forecast batches in flight)
+    await close_loaded()
+    if USES_BINANCE:
+        await stop_exchange_info_refresh()
+        # Close the pooled Binance HTTP sessions
+        await binance_client_pool.close()
+
 @app.get("/")
 def home():
     return {"message": "Welcome to the AI-Powered News Recommender API"}
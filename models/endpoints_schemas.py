@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 
@@ -9,7 +11,8 @@ from pydantic import BaseModel
 class SpotAccountRequest(BaseModel):
     account_name: str
     client_name: str
-    
+    force_refresh: bool = False  # Optional: refresh the snapshot from Binance instead of serving the stored one
+
 # Pydantic model for request body
 class TradeListRequest(BaseModel):
     client_name: str
@@ -18,6 +21,10 @@ class TradeListRequest(BaseModel):
     start_time: int | None = None  # Optional: Unix timestamp in milliseconds
     end_time: int | None = None  # Optional: Unix timestamp in milliseconds
     limit: int = 500  # Default: 500, max: 1000
+    format: Literal["json", "ndjson", "json_stream"] = "json"  # Optional: "ndjson" / "json_stream" stream rows as they are read
+    page_size: int | None = None  # Optional: If provided, return one page (max: 1000) and a next_cursor
+    cursor: str | None = None  # Optional: next_cursor of the previous page
+    numeric: bool = False  # Optional: return prices and amounts as JSON numbers instead of formatted strings
 
 # Pydantic model for request body
 class UniversalTransferRequest(BaseModel):
@@ -25,12 +32,17 @@ class UniversalTransferRequest(BaseModel):
     account_name: str
     start_time: int | None = None  # Optional: Unix timestamp in milliseconds
     end_time: int | None = None  # Optional: Unix timestamp in milliseconds
+    format: Literal["json", "ndjson", "json_stream"] = "json"  # Optional: "ndjson" / "json_stream" stream rows as they are read
+    page_size: int | None = None  # Optional: If provided, return one page (max: 1000) and a next_cursor
+    cursor: str | None = None  # Optional: next_cursor of the previous page
+    numeric: bool = False  # Optional: return prices and amounts as JSON numbers instead of formatted strings
     
 # Pydantic model for request body
 class FuturesAccountRequest(BaseModel):
     client_name: str
     account_name: str
-    
+    force_refresh: bool = False  # Optional: refresh the snapshot from Binance instead of serving the stored one
+
 # Pydantic model for request body
 class FuturesTradeListRequest(BaseModel):
     client_name: str 
@@ -39,13 +51,22 @@ class FuturesTradeListRequest(BaseModel):
     start_time: int | None = None  # Optional: Unix timestamp in milliseconds
     end_time: int | None = None  # Optional: Unix timestamp in milliseconds
     limit: int = 500  # Default: 500, max: 1000
+    format: Literal["json", "ndjson", "json_stream"] = "json"  # Optional: "ndjson" / "json_stream" stream rows as they are read
+    page_size: int | None = None  # Optional: If provided, return one page (max: 1000) and a next_cursor
+    cursor: str | None = None  # Optional: next_cursor of the previous page
+    numeric: bool = False  # Optional: return prices and amounts as JSON numbers instead of formatted strings
     
 # Pydantic model for request body
 class FuturesPositionInfoRequest(BaseModel):
     client_name: str 
     account_name: str
-    
+    page_size: int | None = None  # Optional: If provided, return one page (max: 1000) and a next_cursor
+    cursor: str | None = None  # Optional: next_cursor of the previous page
+    numeric: bool = False  # Optional: return prices and amounts as JSON numbers instead of formatted strings
+    force_refresh: bool = False  # Optional: refresh the snapshot from Binance instead of serving the stored one
+
 # Pydantic model for request body
 class FuturesAccountBalancesRequest(BaseModel):
     client_name: str
-    account_name: str
\ No newline at end of file
+    account_name: str
+    force_refresh: bool = False  # Optional: refresh the snapshot from Binance instead of serving the stored one
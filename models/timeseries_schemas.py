@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -55,4 +55,21 @@ class StochasticData(BaseModel):
 class VWAPData(BaseModel):
     timestamps: List[str]
     vwap: List[float]
-    close: List[float]
\ No newline at end of file
+    close: List[float]
+
+class IndicatorSpec(BaseModel):
+    name: str  # 'trend', 'rsi', 'macd', 'stochastic' or 'vwap'
+    params: Dict[str, Union[int, float]] = {}  # e.g. {"window": 50} for trend
+    label: Optional[str] = None  # Key in the response, defaults to name
+
+class IndicatorBatchRequest(BaseModel):
+    coin: str
+    interval: str
+    start_date: str
+    end_date: str
+    indicators: List[IndicatorSpec]
+
+class IndicatorBatchData(BaseModel):
+    timestamps: List[str]
+    close: List[float]
+    indicators: Dict[str, Dict[str, List[Optional[float]]]]
@@ -6,9 +6,9 @@ from database.auth import *
 auth_router = APIRouter()
 
 @auth_router.post("/auth/register")
-def register(data: RegisterSchema):
+async def register(data: RegisterSchema):
     print("In register")
-    user_response = register_user(data.email, data.password)
+    user_response = await register_user(data.email, data.password)
     print(user_response)
     if not user_response:
         raise HTTPException(status_code=user_response["status_code"], detail=user_response["message"])
@@ -17,8 +17,8 @@ def register(data: RegisterSchema):
     return {"message": "User registered successfully", "user_id": user_response["data"]["user_id"]}
 
 @auth_router.post("/auth/login")
-def login(data: LoginSchema):
-    user_response = login_user(data.email, data.password)
+async def login(data: LoginSchema):
+    user_response = await login_user(data.email, data.password)
     if not user_response["success"]:
         raise HTTPException(status_code=user_response["status_code"], detail=user_response["message"])
     
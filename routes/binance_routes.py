@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
@@ -11,6 +12,9 @@ import uuid
 from database.auth import *
 from services.utils import *
 from services.binance_services import *
+from services.streaming import *
+from services.pagination import *
+from services.snapshot_scheduler import *
 
 binance_router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -39,16 +43,13 @@ async def spot_account_information(request: SpotAccountRequest, user: dict = Dep
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
 
-        print("Fetching and storing balances")
-        # Fetch and store balances
-        balances = await fetch_and_store_spot_balances(
-            client_name= client_name,
-            account_name= account_name,
-            email=user["email"],
-            user_id=user_id,
-            api_key=api_key,
-            secret_key=secret_key
+        # Serve the stored snapshot; the scheduler keeps it fresh and Binance is only called on a miss or force_refresh
+        snapshot = await load_snapshot(
+            SPOT_BALANCES, user_id, client_name, account_name, user["email"],
+            lambda: refresh_spot_balances(client_name, account_name, user["email"], user_id, api_key, secret_key),
+            request.force_refresh
         )
+        balances = format_spot_balances(snapshot)
 
         # print(balances)
         
@@ -60,7 +61,8 @@ async def spot_account_information(request: SpotAccountRequest, user: dict = Dep
                 "message": "Successfully fetched spot account information data",
                 "data": {
                     "client_name": client_name,
-                    "balances": balances
+                    "balances": balances,
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
         else:
@@ -71,12 +73,15 @@ async def spot_account_information(request: SpotAccountRequest, user: dict = Dep
                 "message": f"spot account information data is empty for {account_name}",
                 "data": {
                     "client_name": client_name,
-                    "balances": balances
+                    "balances": balances,
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
             
         return base_response
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -109,6 +114,38 @@ async def spot_trade_list(request: TradeListRequest, user: dict = Depends(get_cu
         secret_key = account_response["data"]["secret_key"]
         user_id = user["user_id"]
 
+        # Keyset-paged mode: sync on the first page only, later pages are index range reads
+        if request.page_size is not None:
+            check_page_size(request.page_size)
+            if not request.cursor:
+                await sync_spot_trades(user["email"], client_name, account_name, user_id, api_key, secret_key, request.symbol)
+            page = await page_spot_trades(client_name, account_name, user_id, request.page_size, request.cursor, request.symbol, request.start_time, request.end_time, request.numeric)
+            return ORJSONResponse({
+                "success": True,
+                "status_code": 200,
+                "message": f"Trades for {request.account_name}",
+                "data": {
+                    "client_name": request.account_name,
+                    "trades": page["rows"],
+                    "next_cursor": page["next_cursor"]
+                }
+            })
+
+        # Stream large histories straight from the Mongo cursor instead of building the list
+        if request.format != JSON_FORMAT:
+            await sync_spot_trades(user["email"], client_name, account_name, user_id, api_key, secret_key, request.symbol)
+            return stream_rows(
+                request.format,
+                {
+                    "success": True,
+                    "status_code": 200,
+                    "message": f"Trades for {request.account_name}",
+                    "data": {"client_name": request.account_name}
+                },
+                "trades",
+                iter_spot_trades(client_name, account_name, user_id, request.symbol, request.start_time, request.end_time, request.limit, request.numeric)
+            )
+
         # Fetch and store trades
         spot_trades = await fetch_and_store_spot_trades(
             email=user["email"],
@@ -120,7 +157,8 @@ async def spot_trade_list(request: TradeListRequest, user: dict = Depends(get_cu
             symbol=request.symbol,
             start_time=request.start_time,
             end_time=request.end_time,
-            limit=request.limit
+            limit=request.limit,
+            numeric=request.numeric
         )
         if spot_trades:
                 # Prepare response
@@ -144,8 +182,10 @@ async def spot_trade_list(request: TradeListRequest, user: dict = Depends(get_cu
                 }
             }
 
-        return base_response
+        return ORJSONResponse(base_response)
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -181,6 +221,38 @@ async def spot_universal_transfer_history(
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
 
+        # Keyset-paged mode: sync on the first page only, later pages are index range reads
+        if request.page_size is not None:
+            check_page_size(request.page_size)
+            if not request.cursor:
+                await sync_universal_transfers(client_name, account_name, user["email"], user_id, api_key, secret_key, request.start_time, request.end_time)
+            page = await page_universal_transfers(client_name, account_name, user_id, request.page_size, request.cursor, request.start_time, request.end_time, request.numeric)
+            return ORJSONResponse({
+                "success": True,
+                "status_code": 200,
+                "message": f"Universal transfers for {account_name}",
+                "data": {
+                    "client_name": account_name,
+                    "transfers": page["rows"],
+                    "next_cursor": page["next_cursor"]
+                }
+            })
+
+        # Stream large histories straight from the Mongo cursor instead of building the list
+        if request.format != JSON_FORMAT:
+            await sync_universal_transfers(client_name, account_name, user["email"], user_id, api_key, secret_key, request.start_time, request.end_time)
+            return stream_rows(
+                request.format,
+                {
+                    "success": True,
+                    "status_code": 200,
+                    "message": f"Universal transfers for {account_name}",
+                    "data": {"client_name": account_name}
+                },
+                "transfers",
+                iter_universal_transfers(client_name, account_name, user_id, request.start_time, request.end_time, request.numeric)
+            )
+
         # Fetch and store transfers
         transfers = await fetch_and_store_universal_transfers(
             client_name=client_name,
@@ -190,7 +262,8 @@ async def spot_universal_transfer_history(
             api_key=api_key,
             secret_key=secret_key,
             start_time=request.start_time,
-            end_time=request.end_time
+            end_time=request.end_time,
+            numeric=request.numeric
         )
 
         if transfers:
@@ -216,8 +289,10 @@ async def spot_universal_transfer_history(
                     "transfers": transfers
                 }
             }
-        return base_response
+        return ORJSONResponse(base_response)
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -252,15 +327,13 @@ async def futures_account_information(
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
 
-        # Fetch and store futures account information
-        account_data = await fetch_and_store_futures_account_info(
-            client_name=client_name,
-            account_name=account_name,
-            email=user["email"],
-            user_id=user_id,
-            api_key=api_key,
-            secret_key=secret_key
+        # Serve the stored snapshot; the scheduler keeps it fresh and Binance is only called on a miss or force_refresh
+        snapshot = await load_snapshot(
+            FUTURES_ACCOUNT_INFO, user_id, client_name, account_name, user["email"],
+            lambda: refresh_futures_account_info(client_name, account_name, user["email"], user_id, api_key, secret_key),
+            request.force_refresh
         )
+        account_data = format_futures_account_info(snapshot)
 
         if account_data:
             # Prepare response
@@ -271,7 +344,8 @@ async def futures_account_information(
                 "data": {
                     "account_name": account_name,
                     "assets": account_data["assets"],
-                    "positions": account_data["positions"]
+                    "positions": account_data["positions"],
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
         
@@ -284,12 +358,15 @@ async def futures_account_information(
                 "data": {
                     "account_name": account_name,
                     "assets": account_data["assets"],
-                    "positions": account_data["positions"]
+                    "positions": account_data["positions"],
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
             
         return base_response
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -329,6 +406,38 @@ async def futures_trade_list(
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
 
+        # Keyset-paged mode: sync on the first page only, later pages are index range reads
+        if request.page_size is not None:
+            check_page_size(request.page_size)
+            if not request.cursor:
+                await sync_futures_trades(client_name, account_name, user_id, api_key, secret_key, request.symbol, user["email"])
+            page = await page_futures_trades(client_name, account_name, user_id, request.page_size, request.cursor, request.symbol, request.start_time, request.end_time, request.numeric)
+            return ORJSONResponse({
+                "success": True,
+                "status_code": 200,
+                "message": f"Futures trade list for {client_name}",
+                "data": {
+                    "account_name": account_name,
+                    "trades": page["rows"],
+                    "next_cursor": page["next_cursor"]
+                }
+            })
+
+        # Stream large histories straight from the Mongo cursor instead of building the list
+        if request.format != JSON_FORMAT:
+            await sync_futures_trades(client_name, account_name, user_id, api_key, secret_key, request.symbol, user["email"])
+            return stream_rows(
+                request.format,
+                {
+                    "success": True,
+                    "status_code": 200,
+                    "message": f"Futures trade list for {client_name}",
+                    "data": {"account_name": account_name}
+                },
+                "trades",
+                iter_futures_trades(client_name, account_name, user_id, request.symbol, request.start_time, request.end_time, request.limit, request.numeric)
+            )
+
         # Fetch and store trades
         trades = await fetch_and_store_futures_trades(
             client_name=client_name,
@@ -340,7 +449,8 @@ async def futures_trade_list(
             symbol=request.symbol,
             start_time=request.start_time,
             end_time=request.end_time,
-            limit=request.limit
+            limit=request.limit,
+            numeric=request.numeric
         )
 
         if trades:
@@ -366,8 +476,10 @@ async def futures_trade_list(
                 }
             }
             
-        return base_response
+        return ORJSONResponse(base_response)
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -402,16 +514,31 @@ async def futures_position_information(
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
 
-        # Fetch and store position information
-        positions = await fetch_and_store_futures_position_info(
-            client_name=client_name,
-            account_name=account_name,
-            email=user["email"],
-            user_id=user_id,
-            api_key=api_key,
-            secret_key=secret_key
+        # Serve the stored snapshot; the scheduler keeps it fresh and Binance is only called on a miss or force_refresh
+        snapshot = await load_snapshot(
+            FUTURES_POSITIONS, user_id, client_name, account_name, user["email"],
+            lambda: refresh_futures_position_info(client_name, account_name, user_id, api_key, secret_key, user["email"]),
+            request.force_refresh and not request.cursor
         )
 
+        # Keyset-paged mode: every page reads the stored snapshot
+        if request.page_size is not None:
+            check_page_size(request.page_size)
+            page = page_futures_positions(snapshot, request.page_size, request.cursor, request.numeric)
+            return ORJSONResponse({
+                "success": True,
+                "status_code": 200,
+                "message": f"Futures position information for {account_name}",
+                "data": {
+                    "account_name": account_name,
+                    "positions": page["rows"],
+                    "next_cursor": page["next_cursor"],
+                    "as_of": snapshot_as_of(snapshot)
+                }
+            })
+
+        positions = format_positions(snapshot, request.numeric)
+
         if positions:
             # Prepare response
             base_response = {
@@ -420,7 +547,8 @@ async def futures_position_information(
                 "message": f"Futures position information for {client_name} stored successfully",
                 "data": {
                     "account_name": account_name,
-                    "positions": positions
+                    "positions": positions,
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
         else:
@@ -431,12 +559,15 @@ async def futures_position_information(
                 "message": f"Futures position information for {account_name} is empty",
                 "data": {
                     "account_name": account_name,
-                    "positions": positions
+                    "positions": positions,
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
             
-        return base_response
+        return ORJSONResponse(base_response)
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -471,14 +602,13 @@ async def futures_account_balances(
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
 
-        # Fetch and store account balances
-        balances = await fetch_and_store_futures_account_balances(
-            client_name=client_name,
-            account_name=account_name,
-            user_id=user_id,
-            api_key=api_key,
-            secret_key=secret_key
+        # Serve the stored snapshot; the scheduler keeps it fresh and Binance is only called on a miss or force_refresh
+        snapshot = await load_snapshot(
+            FUTURES_BALANCES, user_id, client_name, account_name, user["email"],
+            lambda: refresh_futures_account_balances(client_name, account_name, user_id, api_key, secret_key, user["email"]),
+            request.force_refresh
         )
+        balances = format_futures_balances(snapshot)
 
         if balances:
             # Prepare response
@@ -488,7 +618,8 @@ async def futures_account_balances(
                 "message": f"Futures account balances for {account_name} stored successfully",
                 "data": {
                     "account_name": account_name,
-                    "balances": balances
+                    "balances": balances,
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
         else:
@@ -499,12 +630,15 @@ async def futures_account_balances(
                 "message": f"Futures account balances for {account_name} is empty",
                 "data": {
                     "account_name": account_name,
-                    "balances": balances
+                    "balances": balances,
+                    "as_of": snapshot_as_of(snapshot)
                 }
             }
             
         return base_response
 
+    except HTTPException:
+        raise
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Binance API error: {str(e)}")
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+import logging
+from database.auth import *
+from services.cache_utils import get_cache_stats
+
+cache_router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# FastAPI endpoint for in-process cache statistics
+@cache_router.get("/cache/stats")
+async def cache_stats(user: dict = Depends(get_current_user)):
+    stats = get_cache_stats()
+    logger.info(f"User {user.get('email')} requested cache stats")
+    return {
+        "success": True,
+        "status_code": 200,
+        "message": "Fetched cache statistics successfully",
+        "data": stats
+    }
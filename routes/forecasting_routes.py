@@ -1,6 +1,5 @@
 from fastapi import FastAPI, HTTPException, APIRouter, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 from fastapi.responses import JSONResponse
@@ -8,8 +7,8 @@ import numpy as np
 from models.forecast_schemas import *
 from database.auth import *
 import logging
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import load_model
+import importlib
+from services.lazy_loader import LazyResource
 import pytz
 
 # Set up logging
@@ -18,15 +17,18 @@ logger = logging.getLogger(__name__)
 
 forecast_router = APIRouter()
 
+# TensorFlow and the LSTM model load on the first forecast (or at startup with WARM_UP=forecasting)
+forecasting = LazyResource(
+    "forecasting",
+    lambda: importlib.import_module("services.forecasting_services"),
+    # Let batched rollouts still in flight finish at shutdown
+    close=lambda forecasting_services: forecasting_services.forecast_batcher.close()
+)
+
 # Constants (same as in your training script)
-LOOK_BACK = 120
 TICKER_SYMBOL = "BTC-USD"
 INTERVAL = "1h"
 
-# Load the pre-trained LSTM model
-model = load_model('trained_models/lstm_btc_model.h5')
-scaler = MinMaxScaler(feature_range=(0, 1))
-
 @forecast_router.post("/api/forecast")
 async def get_forecast(request: forecast_request, user: dict = Depends(get_current_user)):
     try:
@@ -49,34 +51,10 @@ async def get_forecast(request: forecast_request, user: dict = Depends(get_curre
             logger.error(f"Start date {start_date} is in the past")
             raise HTTPException(status_code=400, detail="Start date cannot be in the past.")
         
-        # Fetch historical Bitcoin data (last 400 days for context, but ensure enough for LOOK_BACK)
-        historical_start = current_date - timedelta(days=400)
-        logger.info(f"Fetching BTC-USD data from {historical_start} to {current_date}")
-        btc = yf.download(TICKER_SYMBOL, start=historical_start, end=current_date + timedelta(days=1), interval=INTERVAL)
-        
-        if btc.empty:
-            logger.error("No historical data returned from yfinance.")
-            raise HTTPException(status_code=404, detail="No historical data available for the model.")
-        
-        # Prepare historical data
-        prices = btc["Close"]
-        if isinstance(prices, pd.DataFrame):
-            logger.warning(f"Prices is a DataFrame, converting to Series. Columns: {prices.columns.tolist()}")
-            if len(prices.columns) == 1:
-                prices = prices.iloc[:, 0]
-            else:
-                logger.error(f"Prices DataFrame has multiple columns: {prices.columns.tolist()}")
-                raise HTTPException(status_code=500, detail="Unexpected multi-column DataFrame for prices.")
-        
-        prices = prices.dropna()
-        if prices.empty:
-            logger.error("Prices Series is empty after dropping NaN values.")
-            raise HTTPException(status_code=404, detail="No valid price data available after processing.")
-        
-        # Ensure we have enough data for the LOOK_BACK window
-        if len(prices) < LOOK_BACK:
-            logger.error(f"Not enough data for LOOK_BACK window: {len(prices)} < {LOOK_BACK}")
-            raise HTTPException(status_code=400, detail="Not enough historical data for forecasting.")
+        forecasting_services = await forecasting.get()
+
+        # Fetch historical Bitcoin data (last 400 days for context), shared by every request in the same hour
+        prices = await forecasting_services.get_price_history(TICKER_SYMBOL, INTERVAL, current_date)
         
         # Slice the last 30 days of historical data for the response (convert to daily for consistency)
         last_30_days_start = current_date - timedelta(days=30)
@@ -100,14 +78,6 @@ async def get_forecast(request: forecast_request, user: dict = Depends(get_curre
         }
         logger.info(f"Historical stats: {hist_stats}")
         
-        # Prepare data for LSTM prediction
-        closing_prices = prices.values.reshape(-1, 1)
-        scaler.fit(closing_prices)  # Fit the scaler on all historical data
-        scaled_data = scaler.transform(closing_prices)
-
-        # Create the last window for prediction
-        last_window = scaled_data[-LOOK_BACK:].reshape((1, LOOK_BACK, 1))
-        
         # Calculate forecast steps (daily forecast)
         days_to_start = (forecast_start - current_date).days
         days_to_end = (forecast_end - current_date).days
@@ -118,16 +88,10 @@ async def get_forecast(request: forecast_request, user: dict = Depends(get_curre
             logger.error(f"Invalid forecast period: {forecast_steps} steps")
             raise HTTPException(status_code=400, detail="Invalid forecast period.")
         
-        # Iterative forecasting with LSTM
-        predictions = []
-        current_window = last_window.copy()
-        for _ in range(forecast_steps * 24):  # Convert days to hours since model was trained on hourly data
-            pred = model.predict(current_window, verbose=0)
-            predictions.append(pred[0][0])
-            current_window = np.append(current_window[:, 1:, :], pred.reshape(1, 1, 1), axis=1)
-        
-        # Inverse transform predictions
-        forecast_prices = scaler.inverse_transform(np.array(predictions).reshape(-1, 1)).flatten()
+        # Iterative forecasting with LSTM from the last closed candle, shared with overlapping requests
+        # Convert days to hours since model was trained on hourly data
+        hourly_forecast = await forecasting_services.get_price_rollout(TICKER_SYMBOL, prices, (days_to_end + 1) * 24)
+        forecast_prices = hourly_forecast[days_to_start * 24:(days_to_end + 1) * 24]
         
         # Aggregate hourly predictions to daily (mean)
         forecast_prices_daily = []
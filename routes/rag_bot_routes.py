@@ -1,12 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import Dict
-from langchain_community.vectorstores import FAISS
-from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-# from langchain.embeddings import AzureOpenAIEmbeddings
-from langchain.schema import HumanMessage
+from typing import Dict, Optional
 import os
+import logging
 from models.rag_bot_schemas import *
+from services.lazy_loader import LazyResource
+from services.streaming import sse_event
+from services.pagination import check_page_size, decode_cursor, encode_cursor
 from database.auth import *
 from database.mongo_ops import *
 from bson import ObjectId
@@ -16,70 +18,137 @@ from dotenv import load_dotenv
 load_dotenv()
 
 rag_bot_router = APIRouter()
+logger = logging.getLogger(__name__)
 
-# Load FAISS index
-faiss_index = FAISS.load_local("binance_docs_index_store", embeddings=AzureOpenAIEmbeddings(
-    azure_deployment='embedding_model',
-    openai_api_version='2023-05-15',
-    chunk_size=1000
-), allow_dangerous_deserialization=True)
+# Helper function to build the chatbot: Azure clients, the FAISS index and the answer caches
+def build_rag_pipeline():
+    # Imported here so workers that never answer a question don't load LangChain
+    from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+    from services.rag_services import CachedEmbeddings, RagPipeline
+    from services.vector_index import load_vector_store
 
-# Azure OpenAI GPT setup
-chat = AzureChatOpenAI(
-    openai_api_version="2024-05-01-preview",
-    azure_deployment="model-4o",
-    temperature=0.7
-)
+    # Query embeddings are memoized; FAISS uses the same wrapper for anything it embeds itself
+    embeddings = CachedEmbeddings(AzureOpenAIEmbeddings(
+        azure_deployment='embedding_model',
+        openai_api_version='2023-05-15',
+        chunk_size=1000
+    ))
+
+    # Load FAISS index (memory-mapped; flat, IVF or HNSW per RAG_INDEX_PATH)
+    faiss_index = load_vector_store(embeddings)
+
+    # Azure OpenAI GPT setup
+    chat = AzureChatOpenAI(
+        openai_api_version="2024-05-01-preview",
+        azure_deployment="model-4o",
+        temperature=0.7
+    )
+
+    # Retrieval + answer pipeline with the semantic answer cache in front of the LLM
+    return RagPipeline(embeddings, faiss_index, chat)
+
+# Built on the first question (or at startup with WARM_UP=rag)
+rag = LazyResource("rag", build_rag_pipeline)
 
 # API endpoint
 @rag_bot_router.post("/chat/query")
-def handle_query(request: QueryRequest, user: dict = Depends(get_current_user)):
+async def handle_query(request: QueryRequest, user: dict = Depends(get_current_user)):
     # Step 1: Get user_id
-    print("In rag bot")
     user_id = user["user_id"]
     user_message = {
         "role": "user",
         "text": request.query,
         "timestamp": datetime.utcnow()
     }
-    # Step 2: Search similar documents
-    relevant_docs = faiss_index.similarity_search(request.query, k=4)
-    if not relevant_docs:
-        return {"response": "No relevant information found."}
-
-    # Step 3: Prepare prompt
-    context = "\n\n".join([doc.page_content for doc in relevant_docs])
-    prompt = f"""Use the following extracted document content to answer the question:
-
-        {context}
+    # Step 2-4: Retrieve similar documents and answer, reusing cached answers for near-identical questions
+    rag_pipeline = await rag.get()
+    result = await rag_pipeline.answer(request.query)
+    if not result["found"]:
+        return {"response": result["answer"]}
 
-        Question: {request.query}
-
-        Answer:"""
-        
-
-    # Step 4: Get answer from Azure GPT
-    response = chat([HumanMessage(content=prompt)])
-    
     bot_message = {
         "role": "bot",
-        "text": response.content,
+        "text": result["answer"],
         "timestamp": datetime.utcnow()
     }
-    
-    # Check for existing conversation
-    conversation = conversations_collection.find_one({"user_id": user_id})
-
-    if conversation:
-        conversations_collection.update_one(
-            {"user_id": conversation["user_id"]},
-            {"$push": {"messages": {"$each": [user_message, bot_message]}}}
-        )
-    else:
-        conversations_collection.insert_one({
-            "user_id": user_id,
-            "messages": [user_message, bot_message]
-        })
+
+    # Step 5: Save the exchange
+    await append_conversation_messages(user_id, [user_message, bot_message])
 
     # Step 6: Return answer
-    return {"answer": response.content}
\ No newline at end of file
+    return {"answer": result["answer"]}
+
+# Streaming variant: tokens are sent as server-sent events while the model generates
+@rag_bot_router.post("/chat/stream")
+async def stream_query(request: QueryRequest, user: dict = Depends(get_current_user)):
+    user_id = user["user_id"]
+    user_message = {
+        "role": "user",
+        "text": request.query,
+        "timestamp": datetime.utcnow()
+    }
+    result = {}
+
+    async def events():
+        try:
+            rag_pipeline = await rag.get()
+            async for event in rag_pipeline.stream(
+                request.query,
+                lambda limit: recent_conversation_messages(user_id, limit)
+            ):
+                if event.get("done"):
+                    result.update(event)
+                    yield sse_event({"answer": event["answer"], "cached": event["cached"]}, event="done")
+                else:
+                    yield sse_event({"token": event["token"]})
+        except Exception as e:
+            logger.error(f"Chat stream failed: {str(e)}")
+            yield sse_event({"detail": "Failed to generate an answer"}, event="error")
+
+    # Runs once the whole stream has been sent, so storage never delays a token
+    async def save_conversation():
+        if result.get("found"):
+            bot_message = {
+                "role": "bot",
+                "text": result["answer"],
+                "timestamp": datetime.utcnow()
+            }
+            await append_conversation_messages(user_id, [user_message, bot_message])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(save_conversation)
+    )
+
+# Paged chat history, newest message first
+@rag_bot_router.get("/chat/history")
+async def chat_history(page_size: int = 50, cursor: Optional[str] = None, user: dict = Depends(get_current_user)):
+    base_response = {
+        "success": False,
+        "status_code": 500,
+        "message": "Failed to fetch chat history",
+        "data": None
+    }
+    check_page_size(page_size)
+    before = None
+    if cursor:
+        position = decode_cursor(cursor, ("seq", "offset"))
+        if not isinstance(position["seq"], int) or not isinstance(position["offset"], int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        before = (position["seq"], position["offset"])
+    try:
+        messages, next_position = await find_conversation_page(user["user_id"], page_size, before)
+    except Exception as e:
+        logger.error(f"Failed to fetch chat history: {str(e)}")
+        return base_response
+
+    base_response["success"] = True
+    base_response["status_code"] = 200
+    base_response["message"] = "Fetched chat history successfully"
+    base_response["data"] = {
+        "messages": messages,
+        "next_cursor": encode_cursor({"seq": next_position[0], "offset": next_position[1]}) if next_position else None
+    }
+    return base_response
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+import asyncio
 import logging 
 from typing import List, Optional
 from datetime import datetime
@@ -6,50 +7,31 @@ from models.timeseries_schemas import *
 from services.timeseries_services import *
 from database.auth import *
 from database.mongo_ops import *
-import requests
+from services.exchange_info import spot_exchange_info
+from services.market_data_hub import CLIENT_QUEUE_SIZE, kline_stream, market_data_hub, ticker_stream
 
 timeseries_router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
 @timeseries_router.get("/timeseries/crypto_list", response_model=List[str])
-def get_crypto_list(user: dict = Depends(get_current_user)):
+async def get_crypto_list(user: dict = Depends(get_current_user)):
     """
-    Fetch all USDT trading pairs from Binance API.
+    Fetch all USDT trading pairs from the cached Binance exchange info.
     Returns a list of symbols like ["BTCUSDT", "ETHUSDT", ...].
     """
     logger.info(f"User {user.get('email')} requested crypto list")
-    print(user)
-    print("HELLO")
     
     try:
-        # Binance public API endpoint for exchange information
-        url = "https://api.binance.com/api/v3/exchangeInfo"
-        response = requests.get(url, timeout=5)
-        
-        # Check if the request was successful
-        if response.status_code != 200:
-            logger.error(f"Binance API error: {response.status_code} - {response.text}")
-            raise HTTPException(status_code=502, detail="Failed to fetch data from Binance API")
-        
-        data = response.json()
-        
-        # Extract USDT pairs from symbols
-        usdt_pairs = [
-            symbol["symbol"]
-            for symbol in data.get("symbols", [])
-            if symbol["quoteAsset"] == "USDT" and symbol["status"] == "TRADING"
-        ]
-        
-        # Sort the list for consistency
-        usdt_pairs.sort()
+        # Served from memory; the exchange info is refreshed in the background
+        usdt_pairs = await spot_exchange_info.list_symbols(quote_asset="USDT", status="TRADING")
         
         logger.info(f"Retrieved {len(usdt_pairs)} USDT trading pairs")
         return usdt_pairs
     
-    except requests.RequestException as e:
-        logger.error(f"Error fetching Binance data: {str(e)}")
-        raise HTTPException(status_code=502, detail="Error connecting to Binance API")
+    except BinanceAPIException as e:
+        logger.error(f"Binance API error: {str(e)}")
+        raise HTTPException(status_code=502, detail="Failed to fetch data from Binance API")
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -68,29 +50,24 @@ async def get_crypto_data(coin: str, interval: str, start_date: str, end_date: s
     )       
 
 @timeseries_router.get("/timeseries/crypto_indicators", response_model=IndicatorData)
-async def get_indicators(coin: str, interval: str, start_date: str, end_date: str, user: dict = Depends(get_current_user)):
+async def get_indicators(coin: str, interval: str, start_date: str, end_date: str, window: int = 20, num_std: float = 2, user: dict = Depends(get_current_user)):
     email = user["email"]
-    new_start_date = adjust_start_date(start_date, interval)
+    new_start_date = adjust_start_date(start_date, interval, indicator_warmup("trend", {"window": window}))
 
     df = await fetch_ohlcv(email, coin, interval, new_start_date, end_date)
-    # Calculate indicators
-    df['sma_20'] = df['close'].rolling(window=20).mean()
-    df['ema_20'] = df['close'].ewm(span=20, adjust=False).mean()
-    df['bollinger_std'] = df['close'].rolling(window=20).std()
-    df['bollinger_upper'] = df['sma_20'] + (2 * df['bollinger_std'])
-    df['bollinger_lower'] = df['sma_20'] - (2 * df['bollinger_std'])
+    # Calculate indicators (field names keep the historical 20-period naming)
+    trend = compute_indicator(df, "trend", interval, {"window": window, "num_std": num_std})
 
     # Filter to only include rows from the original (user-requested) start_date
-    original_start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-    df = df[df['timestamp'] >= original_start_datetime]
+    mask = requested_rows(df, start_date)
 
     return IndicatorData(
-        timestamps=df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-        close=df['close'].tolist(),
-        sma_20=df['sma_20'].tolist(),
-        ema_20=df['ema_20'].tolist(),
-        bollinger_upper=df['bollinger_upper'].tolist(),
-        bollinger_lower=df['bollinger_lower'].tolist(),
+        timestamps=format_timestamps(df, mask),
+        close=df['close'].to_numpy()[mask].tolist(),
+        sma_20=indicators.to_list(trend['sma'][mask], decimals=None),
+        ema_20=indicators.to_list(trend['ema'][mask], decimals=None),
+        bollinger_upper=indicators.to_list(trend['bollinger_upper'][mask], decimals=None),
+        bollinger_lower=indicators.to_list(trend['bollinger_lower'][mask], decimals=None),
     )
 
 # @timeseries_router.get("/timeseries/crypto_returns", response_model=ReturnsData)
@@ -153,85 +130,61 @@ async def get_comparison(coin1: str, coin2: str, interval: str, start_date: str,
 
 # Crypto RSI endpoint (replacing Returns)
 @timeseries_router.get("/timeseries/crypto_rsi", response_model=RSIData)
-async def get_rsi(coin: str, interval: str, start_date: str, end_date: str, user: dict = Depends(get_current_user)):
+async def get_rsi(coin: str, interval: str, start_date: str, end_date: str, period: int = 14, user: dict = Depends(get_current_user)):
     email = user["email"]
-    new_start_date = adjust_start_date(start_date, interval)
+    new_start_date = adjust_start_date(start_date, interval, max(20, indicator_warmup("rsi", {"period": period})))
     df = await fetch_ohlcv(email, coin, interval, new_start_date, end_date)
     
-    # Calculate RSI (14-period)
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-    rs = gain / loss
-    df['rsi'] = 100 - (100 / (1 + rs))
+    # Calculate RSI
+    rsi = compute_indicator(df, "rsi", interval, {"period": period})
     
     # Filter to original start date
-    original_start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-    df = df[df['timestamp'] >= original_start_datetime]
-    
-    # Handle NaN values
-    df['rsi'] = df['rsi'].fillna(50)  # Default to neutral RSI if NaN
+    mask = requested_rows(df, start_date)
     
     return RSIData(
-        timestamps=df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-        rsi=df['rsi'].round(4).tolist()
+        timestamps=format_timestamps(df, mask),
+        rsi=indicators.to_list(rsi['rsi'][mask])
     )
 
 # Crypto MACD endpoint (replacing Anomalies)
 @timeseries_router.get("/timeseries/crypto_macd", response_model=MACDData)
-async def get_macd(coin: str, interval: str, start_date: str, end_date: str, user: dict = Depends(get_current_user)):
+async def get_macd(coin: str, interval: str, start_date: str, end_date: str, fast: int = 12, slow: int = 26, signal: int = 9, user: dict = Depends(get_current_user)):
     email = user["email"]
-    new_start_date = adjust_start_date(start_date, interval)
+    params = {"fast": fast, "slow": slow, "signal": signal}
+    new_start_date = adjust_start_date(start_date, interval, max(20, indicator_warmup("macd", params)))
     df = await fetch_ohlcv(email, coin, interval, new_start_date, end_date)
     
     # Calculate MACD
-    ema_12 = df['close'].ewm(span=12, adjust=False).mean()
-    ema_26 = df['close'].ewm(span=26, adjust=False).mean()
-    df['macd'] = ema_12 - ema_26
-    df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
-    df['histogram'] = df['macd'] - df['signal']
+    macd = compute_indicator(df, "macd", interval, params)
     
     # Filter to original start date
-    original_start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-    df = df[df['timestamp'] >= original_start_datetime]
-    
-    # Handle NaN values
-    df['macd'] = df['macd'].fillna(0)
-    df['signal'] = df['signal'].fillna(0)
-    df['histogram'] = df['histogram'].fillna(0)
+    mask = requested_rows(df, start_date)
     
     return MACDData(
-        timestamps=df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-        macd=df['macd'].round(4).tolist(),
-        signal=df['signal'].round(4).tolist(),
-        histogram=df['histogram'].round(4).tolist()
+        timestamps=format_timestamps(df, mask),
+        macd=indicators.to_list(macd['macd'][mask]),
+        signal=indicators.to_list(macd['signal'][mask]),
+        histogram=indicators.to_list(macd['histogram'][mask])
     )
 
 # Crypto Stochastic endpoint (new)
 @timeseries_router.get("/timeseries/crypto_stochastic", response_model=StochasticData)
-async def get_stochastic(coin: str, interval: str, start_date: str, end_date: str, user: dict = Depends(get_current_user)):
+async def get_stochastic(coin: str, interval: str, start_date: str, end_date: str, k_period: int = 14, d_period: int = 3, user: dict = Depends(get_current_user)):
     email = user["email"]
-    new_start_date = adjust_start_date(start_date, interval)
+    params = {"k_period": k_period, "d_period": d_period}
+    new_start_date = adjust_start_date(start_date, interval, max(20, indicator_warmup("stochastic", params)))
     df = await fetch_ohlcv(email, coin, interval, new_start_date, end_date)
     
     # Calculate Stochastic Oscillator (%K and %D)
-    df['low_14'] = df['low'].rolling(window=14).min()
-    df['high_14'] = df['high'].rolling(window=14).max()
-    df['k'] = 100 * (df['close'] - df['low_14']) / (df['high_14'] - df['low_14'])
-    df['d'] = df['k'].rolling(window=3).mean()
+    stochastic = compute_indicator(df, "stochastic", interval, params)
     
     # Filter to original start date
-    original_start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-    df = df[df['timestamp'] >= original_start_datetime]
-    
-    # Handle NaN values
-    df['k'] = df['k'].fillna(50)
-    df['d'] = df['d'].fillna(50)
+    mask = requested_rows(df, start_date)
     
     return StochasticData(
-        timestamps=df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-        k=df['k'].round(4).tolist(),
-        d=df['d'].round(4).tolist()
+        timestamps=format_timestamps(df, mask),
+        k=indicators.to_list(stochastic['k'][mask]),
+        d=indicators.to_list(stochastic['d'][mask])
     )
 
 # Crypto VWAP endpoint (new)
@@ -242,28 +195,110 @@ async def get_vwap(coin: str, interval: str, start_date: str, end_date: str, use
     df = await fetch_ohlcv(email, coin, interval, new_start_date, end_date)
     
     # Calculate VWAP
-    df['typical_price'] = (df['high'] + df['low'] + df['close']) / 3
-    df['price_volume'] = df['typical_price'] * df['volume']
-    # For intraday intervals, reset VWAP daily
-    if interval in ["1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h"]:
-        df['date'] = df['timestamp'].dt.date
-        df['cum_pv'] = df.groupby('date')['price_volume'].cumsum()
-        df['cum_volume'] = df.groupby('date')['volume'].cumsum()
-    else:
-        df['cum_pv'] = df['price_volume'].cumsum()
-        df['cum_volume'] = df['volume'].cumsum()
-    df['vwap'] = df['cum_pv'] / df['cum_volume']
+    vwap = compute_indicator(df, "vwap", interval, {})
     
     # Filter to original start date
-    original_start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
-    df = df[df['timestamp'] >= original_start_datetime]
-    
-    # HandleインプットHandle NaN values
-    df['vwap'] = df['vwap'].fillna(df['close'])  # Use close price if VWAP is NaN
-    df['close'] = df['close'].fillna(df['close'].mean())  # Fallback to mean close
+    mask = requested_rows(df, start_date)
     
     return VWAPData(
-        timestamps=df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-        vwap=df['vwap'].round(4).tolist(),
-        close=df['close'].round(4).tolist()
-    )
\ No newline at end of file
+        timestamps=format_timestamps(df, mask),
+        vwap=indicators.to_list(vwap['vwap'][mask]),
+        close=indicators.to_list(indicators.as_array(df['close'])[mask])
+    )
+
+# Batch endpoint computing several indicators on a single OHLCV download
+@timeseries_router.post("/timeseries/crypto_indicators/batch", response_model=IndicatorBatchData)
+async def get_indicators_batch(request: IndicatorBatchRequest, user: dict = Depends(get_current_user)):
+    email = user["email"]
+    if not request.indicators:
+        raise HTTPException(status_code=400, detail="At least one indicator is required")
+
+    labels = [spec.label or spec.name for spec in request.indicators]
+    if len(set(labels)) != len(labels):
+        raise HTTPException(status_code=400, detail="Indicator labels must be unique; set 'label' when repeating an indicator")
+
+    # Fetch once with the largest warm-up window any requested indicator needs
+    warmup = max(indicator_warmup(spec.name, spec.params) for spec in request.indicators)
+    new_start_date = adjust_start_date(request.start_date, request.interval, warmup)
+    df = await fetch_ohlcv(email, request.coin, request.interval, new_start_date, request.end_date)
+
+    results = {
+        label: compute_indicator(df, spec.name, request.interval, spec.params)
+        for label, spec in zip(labels, request.indicators)
+    }
+
+    # Filter to only include rows from the original (user-requested) start_date
+    mask = requested_rows(df, request.start_date)
+
+    return IndicatorBatchData(
+        timestamps=format_timestamps(df, mask),
+        close=df['close'].to_numpy()[mask].tolist(),
+        indicators={
+            label: {output: indicators.to_list(values[mask]) for output, values in outputs.items()}
+            for label, outputs in results.items()
+        }
+    )
+
+
+@timeseries_router.websocket("/timeseries/ws")
+async def live_market_data(websocket: WebSocket, token: str):
+    """
+    Live candles and tickers for charts.
+
+    Browsers can't set headers on a WebSocket, so the JWT comes as the
+    ``token`` query parameter. The client sends
+    ``{"action": "subscribe" | "unsubscribe", "coin": "BTCUSDT", "interval": "1m"}``
+    for candles, or ``"type": "ticker"`` instead of ``interval`` for the 24h
+    ticker. Each subscription starts with a ``snapshot`` message followed by
+    incremental ``kline``/``ticker`` updates.
+    """
+    try:
+        user = decode_access_token(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    logger.info(f"User {user.get('email')} opened a market data socket")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    streams = set()
+
+    async def send_updates():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    sender = asyncio.create_task(send_updates())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action")
+            coin = str(message.get("coin", "")).upper()
+            interval = None if message.get("type") == "ticker" else message.get("interval")
+            if action not in ("subscribe", "unsubscribe"):
+                await websocket.send_json({"type": "error", "detail": "action must be subscribe or unsubscribe"})
+                continue
+            if interval is not None and interval not in INTERVAL_MAP:
+                await websocket.send_json({"type": "error", "detail": f"Unsupported interval: {interval}"})
+                continue
+            if await spot_exchange_info.get_symbol(coin) is None:
+                await websocket.send_json({"type": "error", "detail": f"Unknown symbol: {coin}"})
+                continue
+            stream = kline_stream(coin, interval) if interval else ticker_stream(coin)
+            if action == "subscribe" and stream not in streams:
+                try:
+                    await market_data_hub.subscribe(queue, coin, interval)
+                except BinanceAPIException as e:
+                    await websocket.send_json({"type": "error", "detail": f"Failed to load {stream}: {str(e)}"})
+                    continue
+                streams.add(stream)
+            elif action == "unsubscribe" and stream in streams:
+                streams.discard(stream)
+                await market_data_hub.unsubscribe(queue, stream)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Market data socket error: {str(e)}")
+    finally:
+        sender.cancel()
+        for stream in streams:
+            await market_data_hub.unsubscribe(queue, stream)
@@ -3,7 +3,7 @@ from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from uuid import uuid4
 
-def register_user(email: str, password: str) -> Dict:
+async def register_user(email: str, password: str) -> Dict:
     base_response = {
         "message": "Failed to register user",
         "success": False,
@@ -18,7 +18,7 @@ def register_user(email: str, password: str) -> Dict:
             return base_response
 
         # Check for existing user
-        existing = users_collection.find_one({"email": email})
+        existing = await users_collection.find_one({"email": email})
         if existing:
             base_response["message"] = "User already exists"
             base_response["success"] = True
@@ -33,7 +33,7 @@ def register_user(email: str, password: str) -> Dict:
         }
 
         # Insert user with error handling
-        result = users_collection.insert_one(user)
+        result = await users_collection.insert_one(user)
         mongo_id = str(result.inserted_id)
 
         base_response["data"] = {
@@ -49,7 +49,7 @@ def register_user(email: str, password: str) -> Dict:
         base_response["status_code"] = 500
     return base_response
 
-def login_user(email: str, password: str) -> Dict:
+async def login_user(email: str, password: str) -> Dict:
     base_response = {
         "message": "Invalid credentials",
         "success": False,
@@ -64,7 +64,7 @@ def login_user(email: str, password: str) -> Dict:
             return base_response
 
         # Find user
-        login_response = users_collection.find_one({"email": email, "password": password})
+        login_response = await users_collection.find_one({"email": email, "password": password})
         if not login_response:
             return base_response
 
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Set
+
+from binance.async_client import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# How often the Binance server-time offset is re-measured
+TIME_SYNC_INTERVAL_SECONDS = int(os.getenv("BINANCE_TIME_SYNC_INTERVAL", "300"))
+
+# Upper bound on pooled account clients; the least recently used one is closed beyond this
+MAX_POOLED_CLIENTS = int(os.getenv("BINANCE_MAX_POOLED_CLIENTS", "64"))
+
+# Pool key of the unauthenticated client used for public market data
+PUBLIC_CLIENT_KEY = ""
+
+# Headers of the last Binance response received by the current task
+last_response_headers: ContextVar[Optional[Any]] = ContextVar("binance_last_response_headers", default=None)
+
+
+class PooledAsyncClient(AsyncClient):
+    """
+    ``AsyncClient`` that records each response's headers for the task awaiting it.
+
+    ``AsyncClient.response`` is shared by every request on the client, so a
+    concurrent request can overwrite it before the caller reads it;
+    ``last_response_headers`` is per task and holds this request's headers.
+    """
+
+    async def _handle_response(self, response):
+        last_response_headers.set(response.headers)
+        return await super()._handle_response(response)
+
+
+class BinanceClientPool:
+    """
+    Long-lived ``AsyncClient`` instances keyed per account (API key).
+
+    Each client keeps its aiohttp session open between requests instead of
+    building a new ``Client`` and doing a server-time round trip on every call.
+    The clock offset to the Binance server does not depend on the account, so
+    it is measured once, shared by every pooled client and refreshed every
+    ``TIME_SYNC_INTERVAL_SECONDS`` in the background.
+
+    A client handed out by ``get_client`` is leased to the calling task until
+    that task finishes. Clients evicted from the pool or replaced after a
+    credential rotation are closed only once no task holds them any more.
+    """
+
+    def __init__(self, time_sync_interval: float = TIME_SYNC_INTERVAL_SECONDS, max_clients: int = MAX_POOLED_CLIENTS):
+        self.time_sync_interval = time_sync_interval
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, AsyncClient]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._timestamp_offset = 0
+        self._offset_synced_at: Optional[float] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        # client -> tasks currently holding it
+        self._leases: Dict[AsyncClient, Set[asyncio.Task]] = {}
+        # Clients out of the pool that are closed when their last lease ends
+        self._retired: Set[AsyncClient] = set()
+        self._closing: Set[asyncio.Task] = set()
+
+    async def get_client(self, api_key: str, secret_key: str) -> AsyncClient:
+        """Pooled client for an account, created on first use and kept in sync with server time."""
+        async with self._lock:
+            client = self._clients.get(api_key)
+            if client is not None and client.API_SECRET != secret_key:
+                # Credentials were rotated; don't keep signing with the old secret
+                self._retire(self._clients.pop(api_key))
+                client = None
+
+            if client is None:
+                client = PooledAsyncClient(api_key=api_key or None, api_secret=secret_key or None)
+                client.timestamp_offset = self._timestamp_offset
+                self._clients[api_key] = client
+                self._evict()
+            else:
+                self._clients.move_to_end(api_key)
+            self._lease(client)
+
+        await self._sync_time(client)
+        return client
+
+    async def get_public_client(self) -> AsyncClient:
+        """Unauthenticated client for public endpoints (exchange info, klines)."""
+        return await self.get_client(PUBLIC_CLIENT_KEY, PUBLIC_CLIENT_KEY)
+
+    async def _sync_time(self, client: AsyncClient) -> None:
+        """Refresh the offset when due; only the very first measurement is waited for."""
+        if self._offset_synced_at is not None and time.monotonic() - self._offset_synced_at < self.time_sync_interval:
+            return
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._measure_offset(client))
+            self._sync_task.add_done_callback(self._sync_done)
+        if self._offset_synced_at is None:
+            # Signed requests are rejected without an offset, so wait for the first one
+            await asyncio.shield(self._sync_task)
+
+    async def _measure_offset(self, client: AsyncClient) -> None:
+        server_time = await client.get_server_time()
+        time_diff = server_time['serverTime'] - int(time.time() * 1000)
+        if abs(time_diff - self._timestamp_offset) > 500:  # Only log significant drift (>500ms)
+            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
+        self._timestamp_offset = time_diff
+        self._offset_synced_at = time.monotonic()
+        for pooled in list(self._clients.values()) + list(self._retired):
+            pooled.timestamp_offset = time_diff
+
+    def _sync_done(self, task: asyncio.Task) -> None:
+        self._sync_task = None
+        if not task.cancelled() and task.exception() is not None:
+            # The previous offset stays in use until the next attempt succeeds
+            logger.warning(f"Failed to sync Binance server time: {str(task.exception())}")
+
+    def _lease(self, client: AsyncClient) -> None:
+        task = asyncio.current_task()
+        holders = self._leases.setdefault(client, set())
+        if task is None or task in holders:
+            return
+        holders.add(task)
+        task.add_done_callback(lambda finished: self._release(client, finished))
+
+    def _release(self, client: AsyncClient, task: asyncio.Task) -> None:
+        holders = self._leases.get(client)
+        if holders is None:
+            return
+        holders.discard(task)
+        if holders:
+            return
+        del self._leases[client]
+        if client in self._retired:
+            self._retired.discard(client)
+            self._spawn_close(client)
+
+    def _retire(self, client: AsyncClient) -> None:
+        """Take a client out of service, closing it now if idle or when its last lease ends."""
+        if self._leases.get(client):
+            self._retired.add(client)
+        else:
+            self._leases.pop(client, None)
+            self._spawn_close(client)
+
+    def _spawn_close(self, client: AsyncClient) -> None:
+        task = asyncio.create_task(self._close_client(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _evict(self) -> None:
+        while len(self._clients) > self.max_clients:
+            _, client = self._clients.popitem(last=False)
+            self._retire(client)
+
+    async def _close_client(self, client: AsyncClient) -> None:
+        try:
+            await client.close_connection()
+        except Exception as e:
+            logger.warning(f"Failed to close Binance client session: {str(e)}")
+
+    async def close(self) -> None:
+        """Close every pooled session; called on application shutdown."""
+        async with self._lock:
+            if self._sync_task is not None:
+                self._sync_task.cancel()
+            clients = list(self._clients.values()) + list(self._retired)
+            self._clients.clear()
+            self._retired.clear()
+            self._leases.clear()
+            for client in clients:
+                await self._close_client(client)
+            if self._closing:
+                await asyncio.gather(*self._closing, return_exceptions=True)
+            self._offset_synced_at = None
+
+
+binance_client_pool = BinanceClientPool()
@@ -1,12 +1,15 @@
-from binance.client import Client
+from binance.async_client import AsyncClient
 from binance.exceptions import BinanceAPIException
 from datetime import datetime
 import uuid
-import time
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 from database.mongo_ops import *
 from services.utils import *
+from services.binance_client_pool import binance_client_pool
+from services.rate_limiter import *
+from services.symbol_discovery import *
+from services.pagination import *
 from database.mongo_ops import *
 
 # Helper function to split time range into 24-hour chunks
@@ -21,34 +24,121 @@ def split_time_range(start_time: int, end_time: int) -> list[tuple[int, int]]:
         current_start = current_end
     return ranges
 
-# Core function to fetch and store spot account balances
-async def fetch_and_store_spot_balances(
+# Maximum page size of the myTrades / userTrades endpoints
+TRADE_PAGE_LIMIT = 1000
+
+# Helper function to page trades forward by id until caught up with the exchange
+async def fetch_trades_from_id(fetch_page, from_id: int) -> List[Dict[str, Any]]:
+    trades = []
+    while True:
+        page = await fetch_page(from_id)
+        trades.extend(page)
+        if len(page) < TRADE_PAGE_LIMIT:
+            return trades
+        from_id = page[-1]["id"] + 1
+
+# Helper function to compute the new watermark of every symbol that received trades
+def trade_watermarks(trades: List[Dict[str, Any]]) -> Dict[str, tuple]:
+    watermarks = {}
+    for trade in trades:
+        current = watermarks.get(trade["symbol"])
+        if current is None or trade["id"] > current[0]:
+            watermarks[trade["symbol"]] = (trade["id"], trade["time"])
+    return watermarks
+
+# Stored fields returned by the trade-list and transfer endpoints
+SPOT_TRADE_FIELDS = [
+    "symbol", "id", "orderId", "orderListId", "price", "qty", "quoteQty", "commission",
+    "commissionAsset", "time", "isBuyer", "isMaker", "isBestMatch"
+]
+FUTURES_TRADE_FIELDS = [
+    "symbol", "id", "orderId", "side", "price", "qty", "realizedPnl", "quoteQty", "commission",
+    "commissionAsset", "time", "positionSide", "buyer", "maker"
+]
+TRANSFER_FIELDS = ["asset", "amount", "type", "status", "tranId", "timestamp"]
+
+# Helper function to iterate the stored trades a request asks for
+async def iter_selected_trades(
+    collection,
+    account: Dict[str, Any],
+    fields: List[str],
+    symbol: Optional[str],
+    start_time: Optional[int],
+    end_time: Optional[int],
+    limit: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Trades in [start_time, end_time] when both are given, read from the cursor
+    batch by batch; else the `limit` most recent per symbol, which are bounded
+    and have to be merged across symbols anyway.
+    """
+    if start_time and end_time:
+        start_dt = datetime.fromtimestamp(start_time / 1000)
+        end_dt = datetime.fromtimestamp(end_time / 1000)
+        async for trade in trades_in_range_cursor(collection, account, start_dt, end_dt, fields, symbol):
+            yield trade
+        return
+    for trade in await find_recent_trades(collection, account, limit, fields, symbol):
+        yield trade
+
+# Helper function to format a stored record with its numbers left as JSON numbers; only datetimes need converting
+def format_numeric(record: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: int(value.timestamp() * 1000) if isinstance(value, datetime) else value
+        for key, value in record.items()
+    }
+
+# Helper function to read one keyset page of an account's stored records, newest first
+async def page_records(
+    collection,
+    query: Dict[str, Any],
+    time_field: str,
+    id_field: str,
+    fields: List[str],
+    page_size: int,
+    cursor: Optional[str],
+    format_record
+) -> Dict[str, Any]:
+    after = keyset_position(cursor, time_field, id_field) if cursor else None
+    records, has_more = await find_keyset_page(collection, query, time_field, id_field, fields, page_size, after)
+    return {
+        "rows": [format_record(record) for record in records],
+        "next_cursor": keyset_cursor(records[-1], time_field, id_field) if has_more else None
+    }
+
+# Helper function to build the Mongo filter of a trade page request
+def trade_page_query(
+    account: Dict[str, Any],
+    symbol: Optional[str],
+    start_time: Optional[int],
+    end_time: Optional[int]
+) -> Dict[str, Any]:
+    query = dict(account)
+    if symbol:
+        query["symbol"] = symbol
+    if start_time or end_time:
+        query["time"] = {}
+        if start_time:
+            query["time"]["$gte"] = datetime.fromtimestamp(start_time / 1000)
+        if end_time:
+            query["time"]["$lte"] = datetime.fromtimestamp(end_time / 1000)
+    return query
+
+# Core function to fetch spot account balances and store them as the account's snapshot
+async def refresh_spot_balances(
     client_name: str,
     account_name: str,
     email: str,
     user_id: str,
     api_key: str,
     secret_key: str
-) -> List[Dict[str, Any]]:
+) -> Dict[str, Any]:
     try:
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
-        
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
-
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
-
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
         # Fetch spot account information
-        account_info = client.get_account()
+        account_info = await client.get_account()
 
         # Extract balances (non-zero balances only)
         balances = [
@@ -72,209 +162,208 @@ async def fetch_and_store_spot_balances(
             "document_id": str(uuid.uuid4())
         }
 
-        # Remove existing balances for this account_name and user_id
-        spot_data_collection.delete_many({"user_id": user_id})
-
-        print(balance_document)
-        # Store balances in MongoDB
-        if balances:
-            spot_data_collection.insert_one(balance_document)
-        print(balances)
-        
-        spot_balances = []
-        for balance in balances: 
-            print(balance)
-            spot_balances.append({
-                "asset": balance["asset"],
-                "free": balance["free"],
-                "locked": balance["locked"]
-            })
-        print("Returning spot balances",spot_balances)
-        return spot_balances
+        # Swap the account's snapshot in one write so readers never find it missing
+        await spot_data_collection.replace_one(
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+            balance_document,
+            upsert=True
+        )
+        return balance_document
 
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise
     except Exception as e:
-        logger.error(f"Error in fetch_and_store_spot_balances: {str(e)}")
+        logger.error(f"Error in refresh_spot_balances: {str(e)}")
         raise
 
-# Core function to fetch and store spot trades
-async def fetch_and_store_spot_trades(
+# Helper function to format a stored spot balance snapshot for the response
+def format_spot_balances(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "asset": balance["asset"],
+            "free": balance["free"],
+            "locked": balance["locked"]
+        }
+        for balance in document["balances"]
+    ]
+
+# Core function to fetch and store spot account balances
+async def fetch_and_store_spot_balances(
+    client_name: str,
+    account_name: str,
+    email: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str
+) -> List[Dict[str, Any]]:
+    return format_spot_balances(await refresh_spot_balances(client_name, account_name, email, user_id, api_key, secret_key))
+
+# Core function to fetch new spot trades from Binance and store them
+async def sync_spot_trades(
     email: str,
     client_name: str,
-    account_name: str, 
+    account_name: str,
     user_id: str,
     api_key: str,
     secret_key: str,
-    symbol: Optional[str] = None,
-    start_time: Optional[int] = None,
-    end_time: Optional[int] = None,
-    limit: int = 500
-) -> List[Dict[str, Any]]:
+    symbol: Optional[str] = None
+) -> int:
     try:
-        print("In fetch and stores spot trades function")
-        print(f"Symbol: {symbol}")
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
-        
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
-
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+        # Get symbols to query: only those this account has traded, not every listed pair
+        symbols = [symbol] if symbol else await get_traded_symbols(client, user_id, client_name, account_name, SPOT_MARKET)
 
-        # Get symbols to query
-        symbols = [symbol] if symbol else await get_all_symbols()
-
-        # Check MongoDB for existing trades
-        existing_trades = []
-        missing_ranges = []
-        if start_time and end_time:
-            start_dt = datetime.fromtimestamp(start_time / 1000)
-            end_dt = datetime.fromtimestamp(end_time / 1000)
-            document = trades_collection.find_one({"user_id": user_id})
-            if document and "trades" in document:
-                # Filter trades within the requested time range
-                existing_trades = [
-                    trade for trade in document["trades"]
-                    if start_dt <= trade["time"] <= end_dt
-                    and (not symbol or trade["symbol"] == symbol)
-                ]
-                # Determine missing time ranges
-                existing_times = {trade["time"] for trade in existing_trades}
-                time_ranges = split_time_range(start_time, end_time)
-                for start, end in time_ranges:
-                    start_dt_chunk = datetime.fromtimestamp(start / 1000)
-                    end_dt_chunk = datetime.fromtimestamp(end / 1000)
-                    # Check if any trade exists in this time chunk
-                    has_trades = any(
-                        start_dt_chunk <= trade_time <= end_dt_chunk
-                        for trade_time in existing_times
-                    )
-                    if not has_trades:
-                        missing_ranges.append((start, end))
-        else:
-            missing_ranges = [(start_time, end_time)] if start_time and end_time else []
+        # Per-symbol sync watermarks: only trades after the last stored id are fetched
+        watermarks = await get_sync_watermarks(user_id, client_name, account_name, SPOT_MARKET)
 
-        # Fetch trades from Binance if needed
-        new_trades = []
-        trade_ids = {trade["id"] for trade in existing_trades}  # Track existing trade IDs
-        for symbol in symbols:
+        # Helper function to page one symbol's new trades under the shared weight budget
+        async def fetch_symbol_trades(symbol: str) -> List[Dict[str, Any]]:
             try:
-                trade_list = []
-                # If no time range or no missing ranges, fetch recent trades
-                if not start_time or not end_time or not missing_ranges:
-                    params = {"symbol": symbol, "limit": limit}
-                    trade_list = client.get_my_trades(**params)
-                else:
-                    # Fetch trades for missing time ranges
-                    for start, end in missing_ranges:
-                        params = {
-                            "symbol": symbol,
-                            "startTime": start,
-                            "endTime": end,
-                            "limit": limit
-                        }
-                        chunk_trades = client.get_my_trades(**params)
-                        trade_list.extend(chunk_trades)
-                        await asyncio.sleep(0.1)  # 100ms delay to respect rate limits
+                watermark = watermarks.get(symbol)
+                from_id = watermark["last_trade_id"] + 1 if watermark else 0
+                return await fetch_trades_from_id(
+                    lambda from_id: spot_weight_limiter.call(
+                        SPOT_MY_TRADES_WEIGHT, client.get_my_trades,
+                        symbol=symbol, fromId=from_id, limit=TRADE_PAGE_LIMIT
+                    ),
+                    from_id
+                )
+            except BinanceAPIException as e:
+                logger.warning(f"Failed to fetch trades for symbol {symbol}: {str(e)}")
+                return []
 
-                if not trade_list:
-                    continue
+        # Fetch new trades from Binance, several symbols at a time
+        symbol_trades = await gather_bounded(symbols, fetch_symbol_trades)
 
-                # Prepare trades for storage
-                for trade in trade_list:
-                    if trade["id"] not in trade_ids:
-                        trade_ids.add(trade["id"])
-                        new_trades.append({
-                            "symbol": trade["symbol"],
-                            "id": trade["id"],
-                            "orderId": trade["orderId"],
-                            "orderListId": trade["orderListId"],
-                            "price": float(trade["price"]),
-                            "qty": float(trade["qty"]),
-                            "quoteQty": float(trade["quoteQty"]),
-                            "commission": float(trade["commission"]),
-                            "commissionAsset": trade["commissionAsset"],
-                            "time": datetime.fromtimestamp(trade["time"] / 1000),
-                            "isBuyer": trade["isBuyer"],
-                            "isMaker": trade["isMaker"],
-                            "isBestMatch": trade["isBestMatch"]
-                        })
+        account = {"user_id": user_id, "client_name": client_name, "account_name": account_name, "email": email}
+        new_trades = []
+        for trade_list in symbol_trades:
+            # Prepare trades for storage, one document per trade
+            for trade in trade_list:
+                new_trades.append({
+                    **account,
+                    "symbol": trade["symbol"],
+                    "id": trade["id"],
+                    "orderId": trade["orderId"],
+                    "orderListId": trade["orderListId"],
+                    "price": float(trade["price"]),
+                    "qty": float(trade["qty"]),
+                    "quoteQty": float(trade["quoteQty"]),
+                    "commission": float(trade["commission"]),
+                    "commissionAsset": trade["commissionAsset"],
+                    "time": datetime.fromtimestamp(trade["time"] / 1000),
+                    "isBuyer": trade["isBuyer"],
+                    "isMaker": trade["isMaker"],
+                    "isBestMatch": trade["isBestMatch"]
+                })
+
+        # Keep the account's traded-symbol set current
+        await record_traded_symbols(user_id, client_name, account_name, SPOT_MARKET, {trade["symbol"] for trade in new_trades})
+
+        # Store only the trades that are not in MongoDB yet
+        stored = await upsert_records(spot_trade_records_collection, new_trades, TRADE_KEY_FIELDS)
+        logger.info(f"Stored {stored} new spot trades for {client_name}/{account_name}")
+
+        # Advance watermarks only once the trades are stored
+        await set_sync_watermarks(user_id, client_name, account_name, SPOT_MARKET, trade_watermarks(new_trades))
+        return stored
 
-            except BinanceAPIException as e:
-                logger.warning(f"Failed to fetch trades for symbol {symbol}: {str(e)}")
-                continue
+    except Exception as e:
+        logger.error(f"Error in sync_spot_trades: {str(e)}")
+        raise
 
-        # Combine existing and new trades
-        all_trades = existing_trades + new_trades
-
-        # Update MongoDB document
-        if all_trades:
-            # Remove existing document
-            trades_collection.delete_many({"user_id": user_id})
-            # Create new document
-            trade_document = {
-                "user_id": user_id,
-                "client_name": client_name,
-                "email": email,
-                "trades": all_trades,
-                "timestamp": datetime.utcnow(),
-                "document_id": str(uuid.uuid4())
-            }
-            trades_collection.insert_one(trade_document)
+# Helper function to format a stored spot trade for the response
+def format_spot_trade(trade: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "symbol": trade["symbol"],
+        "id": trade["id"],
+        "orderId": trade["orderId"],
+        "orderListId": trade["orderListId"],
+        "price": str(trade["price"]),
+        "qty": str(trade["qty"]),
+        "quoteQty": str(trade["quoteQty"]),
+        "commission": str(trade["commission"]),
+        "commissionAsset": trade["commissionAsset"],
+        "time": int(trade["time"].timestamp() * 1000),
+        "isBuyer": trade["isBuyer"],
+        "isMaker": trade["isMaker"],
+        # Not carried by the user data stream, so fills stored from it have none
+        "isBestMatch": trade.get("isBestMatch")
+    }
+
+# Core function to iterate the requested stored spot trades, formatted for the response
+async def iter_spot_trades(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    symbol: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    limit: int = 500,
+    numeric: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    async for trade in iter_selected_trades(
+        spot_trade_records_collection,
+        {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+        SPOT_TRADE_FIELDS,
+        symbol,
+        start_time,
+        end_time,
+        limit
+    ):
+        yield format_numeric(trade) if numeric else format_spot_trade(trade)
+
+# Core function to read one page of stored spot trades, newest first
+async def page_spot_trades(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    page_size: int,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    numeric: bool = False
+) -> Dict[str, Any]:
+    return await page_records(
+        spot_trade_records_collection,
+        trade_page_query({"user_id": user_id, "client_name": client_name, "account_name": account_name}, symbol, start_time, end_time),
+        "time",
+        "id",
+        SPOT_TRADE_FIELDS,
+        page_size,
+        cursor,
+        format_numeric if numeric else format_spot_trade
+    )
 
-        # Format trades for response
-        response_trades = [
-            {
-                "symbol": trade["symbol"],
-                "id": trade["id"],
-                "orderId": trade["orderId"],
-                "orderListId": trade["orderListId"],
-                "price": str(trade["price"]),
-                "qty": str(trade["qty"]),
-                "quoteQty": str(trade["quoteQty"]),
-                "commission": str(trade["commission"]),
-                "commissionAsset": trade["commissionAsset"],
-                "time": int(trade["time"].timestamp() * 1000),
-                "isBuyer": trade["isBuyer"],
-                "isMaker": trade["isMaker"],
-                "isBestMatch": trade["isBestMatch"]
-            }
-            for trade in all_trades
-        ]
-        # if response_trades:
-        #     base_response = {
-        #         "success": True,
-        #         "message": "Fetched spot trades successfully",
-        #         "status_code": 200,
-        #         "data": response_trades
-        #     }
-        # else:
-        #     base_response ={
-        #         "success": True,
-        #         "message": "Spot trades are empty",
-        #         "status_code": 200,
-        #         "data": []
-        #     }
-
-        return response_trades
+# Core function to fetch and store spot trades
+async def fetch_and_store_spot_trades(
+    email: str,
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str,
+    symbol: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    limit: int = 500,
+    numeric: bool = False
+) -> List[Dict[str, Any]]:
+    try:
+        await sync_spot_trades(email, client_name, account_name, user_id, api_key, secret_key, symbol)
+        return [trade async for trade in iter_spot_trades(client_name, account_name, user_id, symbol, start_time, end_time, limit, numeric)]
 
     except Exception as e:
         logger.error(f"Error in fetch_and_store_spot_trades: {str(e)}")
         raise
     
     
-# Core function to fetch and store universal transfer history
-async def fetch_and_store_universal_transfers(
+# Core function to fetch new universal transfers from Binance and store them
+async def sync_universal_transfers(
     client_name: str,
     account_name: str,
     email: str,
@@ -283,22 +372,10 @@ async def fetch_and_store_universal_transfers(
     secret_key: str,
     start_time: Optional[int] = None,
     end_time: Optional[int] = None
-) -> Dict[str, Any]:
+) -> int:
     try:
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
-
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
-
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
         # List of transfer types from original code
         types_list = [
@@ -322,13 +399,14 @@ async def fetch_and_store_universal_transfers(
         if start_time and end_time:
             start_dt = datetime.fromtimestamp(start_time / 1000)
             end_dt = datetime.fromtimestamp(end_time / 1000)
-            document = transfers_collection.find_one({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-            if document and "transfers" in document:
-                # Filter transfers within the requested time range
-                existing_transfers = [
-                    transfer for transfer in document["transfers"]
-                    if start_dt <= transfer["timestamp"] <= end_dt
-                ]
+            # Stored transfers within the requested time range; only ids and times are needed here
+            existing_transfers = await transfers_cursor(
+                {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+                ["tranId", "timestamp"],
+                start_dt,
+                end_dt
+            ).to_list(length=None)
+            if existing_transfers:
                 # Determine missing time ranges
                 existing_times = {transfer["timestamp"] for transfer in existing_transfers}
                 time_ranges = split_time_range(start_time, end_time)
@@ -346,6 +424,7 @@ async def fetch_and_store_universal_transfers(
             missing_ranges = [(start_time, end_time)] if start_time and end_time else []
 
         # Fetch transfers from Binance if needed
+        account = {"user_id": user_id, "client_name": client_name, "account_name": account_name, "email": email}
         new_transfers = []
         tran_ids = {transfer["tranId"] for transfer in existing_transfers}  # Track existing transaction IDs
         for transfer_type in types_list:
@@ -357,7 +436,7 @@ async def fetch_and_store_universal_transfers(
                 # If no time range or no missing ranges, fetch recent transfers
                 if not start_time or not end_time or not missing_ranges:
                     params = {"type": transfer_type}
-                    transfer_data = client.query_universal_transfer_history(**params)
+                    transfer_data = await client.query_universal_transfer_history(**params)
                     if transfer_data and "rows" in transfer_data:
                         transfer_list = transfer_data["rows"]
                 else:
@@ -368,7 +447,7 @@ async def fetch_and_store_universal_transfers(
                             "startTime": start,
                             "endTime": end
                         }
-                        transfer_data = client.query_universal_transfer_history(**params)
+                        transfer_data = await client.query_universal_transfer_history(**params)
                         if transfer_data and "rows" in transfer_data:
                             transfer_list.extend(transfer_data["rows"])
                         await asyncio.sleep(0.1)  # 100ms delay to respect rate limits
@@ -381,6 +460,7 @@ async def fetch_and_store_universal_transfers(
                     if transfer["tranId"] not in tran_ids:
                         tran_ids.add(transfer["tranId"])
                         new_transfers.append({
+                            **account,
                             "asset": transfer["asset"],
                             "amount": float(transfer["amount"]),
                             "type": transfer["type"],
@@ -393,59 +473,93 @@ async def fetch_and_store_universal_transfers(
                 logger.warning(f"Failed to fetch transfers for type {transfer_type}: {str(e)}")
                 continue
 
-        # Combine existing and new transfers
-        all_transfers = existing_transfers + new_transfers
-
-        # Update MongoDB document
-        if all_transfers:
-            # Remove existing document
-            transfers_collection.delete_many({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-            # Create new document
-            transfer_document = {
-                "user_id": user_id,
-                "client_name": client_name,
-                "account_name": account_name,
-                "email": email,
-                "transfers": all_transfers,
-                "timestamp": datetime.utcnow(),
-                "document_id": str(uuid.uuid4())
-            }
-            transfers_collection.insert_one(transfer_document)
-
-        # Format transfers for response
-        # response = {
-        #     "total": len(all_transfers),
-            # "rows": [
-            #     {
-            #         "asset": transfer["asset"],
-            #         "amount": str(transfer["amount"]),
-            #         "type": transfer["type"],
-            #         "status": transfer["status"],
-            #         "tranId": transfer["tranId"],
-            #         "timestamp": int(transfer["timestamp"].timestamp() * 1000)
-            #     }
-            #     for transfer in all_transfers
-            # ]
-        # }
-        response = [
-                {
-                    "asset": transfer["asset"],
-                    "amount": str(transfer["amount"]),
-                    "type": transfer["type"],
-                    "status": transfer["status"],
-                    "tranId": transfer["tranId"],
-                    "timestamp": int(transfer["timestamp"].timestamp() * 1000)
-                }
-                for transfer in all_transfers
-            ]
-        return response
+        # Store only the transfers that are not in MongoDB yet
+        stored = await upsert_records(transfer_records_collection, new_transfers, TRANSFER_KEY_FIELDS)
+        logger.info(f"Stored {stored} new universal transfers for {client_name}/{account_name}")
+        return stored
+
+    except Exception as e:
+        logger.error(f"Error in sync_universal_transfers: {str(e)}")
+        raise
+
+# Helper function to format a stored transfer for the response
+def format_transfer(transfer: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "asset": transfer["asset"],
+        "amount": str(transfer["amount"]),
+        "type": transfer["type"],
+        "status": transfer["status"],
+        "tranId": transfer["tranId"],
+        "timestamp": int(transfer["timestamp"].timestamp() * 1000)
+    }
+
+# Core function to iterate stored universal transfers, formatted for the response
+async def iter_universal_transfers(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    numeric: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """Transfers in [start_time, end_time] when both are given, else every stored transfer of the account."""
+    start_dt = datetime.fromtimestamp(start_time / 1000) if start_time and end_time else None
+    end_dt = datetime.fromtimestamp(end_time / 1000) if start_time and end_time else None
+    async for transfer in transfers_cursor(
+        {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+        TRANSFER_FIELDS,
+        start_dt,
+        end_dt
+    ):
+        yield format_numeric(transfer) if numeric else format_transfer(transfer)
+
+# Core function to read one page of stored universal transfers, newest first
+async def page_universal_transfers(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    page_size: int,
+    cursor: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    numeric: bool = False
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {"user_id": user_id, "client_name": client_name, "account_name": account_name}
+    if start_time and end_time:
+        query["timestamp"] = {"$gte": datetime.fromtimestamp(start_time / 1000), "$lte": datetime.fromtimestamp(end_time / 1000)}
+    return await page_records(
+        transfer_records_collection,
+        query,
+        "timestamp",
+        "tranId",
+        TRANSFER_FIELDS,
+        page_size,
+        cursor,
+        format_numeric if numeric else format_transfer
+    )
+
+# Core function to fetch and store universal transfer history
+async def fetch_and_store_universal_transfers(
+    client_name: str,
+    account_name: str,
+    email: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    numeric: bool = False
+) -> List[Dict[str, Any]]:
+    try:
+        await sync_universal_transfers(client_name, account_name, email, user_id, api_key, secret_key, start_time, end_time)
+        return [transfer async for transfer in iter_universal_transfers(client_name, account_name, user_id, start_time, end_time, numeric)]
 
     except Exception as e:
         logger.error(f"Error in fetch_and_store_universal_transfers: {str(e)}")
         raise
 
-# Core function to fetch and store futures account information
-async def fetch_and_store_futures_account_info(
+# Core function to fetch futures account information and store it as the account's snapshot
+async def refresh_futures_account_info(
     client_name: str,
     account_name: str,
     email: str,
@@ -454,24 +568,11 @@ async def fetch_and_store_futures_account_info(
     secret_key: str
 ) -> Dict[str, Any]:
     try:
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
-        
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
-
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
-
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
         # Fetch futures account information
-        acc_info = client.futures_account()
+        acc_info = await client.futures_account()
 
         # Process assets for MongoDB storage
         assets = [
@@ -523,6 +624,7 @@ async def fetch_and_store_futures_account_info(
         account_document = {
             "user_id": user_id,
             "client_name": client_name,
+            "account_name": account_name,
             "email": email,
             "feeTier": acc_info["feeTier"],
             "feeBurn": acc_info["feeBurn"],
@@ -549,95 +651,107 @@ async def fetch_and_store_futures_account_info(
             "document_id": str(uuid.uuid4())
         }
 
-        # Remove existing document for this account
-        futures_account_info_collection.delete_many({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-
-        # Store the single document in MongoDB
-        if assets or positions:
-            futures_account_info_collection.insert_one(account_document)
-
-        # Format response to match Binance API
-        response = {
-            "feeTier": acc_info["feeTier"],
-            "feeBurn": acc_info["feeBurn"],
-            "canTrade": acc_info["canTrade"],
-            "canDeposit": acc_info["canDeposit"],
-            "canWithdraw": acc_info["canWithdraw"],
-            "updateTime": int(float(acc_info["updateTime"])) if acc_info["updateTime"] else 0,
-            "multiAssetsMargin": acc_info["multiAssetsMargin"],
-            "tradeGroupId": acc_info["tradeGroupId"],
-            "totalInitialMargin": f"{float(acc_info['totalInitialMargin']):.8f}",
-            "totalMaintMargin": f"{float(acc_info['totalMaintMargin']):.8f}",
-            "totalWalletBalance": f"{float(acc_info['totalWalletBalance']):.8f}",
-            "totalUnrealizedProfit": f"{float(acc_info['totalUnrealizedProfit']):.8f}",
-            "totalMarginBalance": f"{float(acc_info['totalMarginBalance']):.8f}",
-            "totalPositionInitialMargin": f"{float(acc_info['totalPositionInitialMargin']):.8f}",
-            "totalOpenOrderInitialMargin": f"{float(acc_info['totalOpenOrderInitialMargin']):.8f}",
-            "totalCrossWalletBalance": f"{float(acc_info['totalCrossWalletBalance']):.8f}",
-            "totalCrossUnPnl": f"{float(acc_info['totalCrossUnPnl']):.8f}",
-            "availableBalance": f"{float(acc_info['availableBalance']):.8f}",
-            "maxWithdrawAmount": f"{float(acc_info['maxWithdrawAmount']):.8f}",
-            "assets": [
-                {
-                    "asset": asset["asset"],
-                    "walletBalance": f"{float(asset['walletBalance']):.8f}",
-                    "unrealizedProfit": f"{float(asset['unrealizedProfit']):.8f}",
-                    "marginBalance": f"{float(asset['marginBalance']):.8f}",
-                    "maintMargin": f"{float(asset['maintMargin']):.8f}",
-                    "initialMargin": f"{float(asset['initialMargin']):.8f}",
-                    "positionInitialMargin": f"{float(asset['positionInitialMargin']):.8f}",
-                    "openOrderInitialMargin": f"{float(asset['openOrderInitialMargin']):.8f}",
-                    "crossWalletBalance": f"{float(asset['crossWalletBalance']):.8f}",
-                    "crossUnPnl": f"{float(asset['crossUnPnl']):.8f}",
-                    "availableBalance": f"{float(asset['availableBalance']):.8f}",
-                    "maxWithdrawAmount": f"{float(asset['maxWithdrawAmount']):.8f}",
-                    "marginAvailable": asset["marginAvailable"],
-                    "updateTime": int(asset["updateTime"].timestamp() * 1000) if isinstance(asset["updateTime"], datetime) else int(float(asset["updateTime"])) if asset["updateTime"] else 0
-                }
-                for asset in assets
-            ],
-            "positions": [
-                {
-                    "symbol": position["symbol"],
-                    "initialMargin": f"{float(position['initialMargin']):.8f}",
-                    "maintMargin": f"{float(position['maintMargin']):.8f}",
-                    "unrealizedProfit": f"{float(position['unrealizedProfit']):.8f}",
-                    "positionInitialMargin": f"{float(position['positionInitialMargin']):.8f}",
-                    "openOrderInitialMargin": f"{float(position['openOrderInitialMargin']):.8f}",
-                    "leverage": f"{float(position['leverage']):.8f}",
-                    "isolated": position["isolated"],
-                    "entryPrice": f"{float(position['entryPrice']):.8f}",
-                    "breakEvenPrice": f"{float(position['breakEvenPrice']):.8f}",
-                    "maxNotional": f"{float(position['maxNotional']):.8f}",
-                    "positionSide": position["positionSide"],
-                    "positionAmt": f"{float(position['positionAmt']):.8f}",
-                    "notional": f"{float(position['notional']):.8f}",
-                    "isolatedWallet": f"{float(position['isolatedWallet']):.8f}",
-                    "updateTime": int(position["updateTime"].timestamp() * 1000) if isinstance(position["updateTime"], datetime) else int(float(position["updateTime"])) if position["updateTime"] else 0,
-                    "bidNotional": f"{float(position['bidNotional']):.8f}",
-                    "askNotional": f"{float(position['askNotional']):.8f}"
-                }
-                for position in positions
-            ]
-        }
-
-        return response
+        # Swap the account's snapshot in one write so readers never find it missing
+        await futures_account_info_collection.replace_one(
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+            account_document,
+            upsert=True
+        )
+        return account_document
 
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise
     except Exception as e:
-        logger.error(f"Error in fetch_and_store_futures_account_info: {str(e)}")
+        logger.error(f"Error in refresh_futures_account_info: {str(e)}")
         raise
+
+# Helper function to format a stored futures account snapshot to match the Binance API
+def format_futures_account_info(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "feeTier": document["feeTier"],
+        "feeBurn": document["feeBurn"],
+        "canTrade": document["canTrade"],
+        "canDeposit": document["canDeposit"],
+        "canWithdraw": document["canWithdraw"],
+        "updateTime": int(document["updateTime"].timestamp() * 1000) if isinstance(document["updateTime"], datetime) else int(float(document["updateTime"])) if document["updateTime"] else 0,
+        "multiAssetsMargin": document["multiAssetsMargin"],
+        "tradeGroupId": document["tradeGroupId"],
+        "totalInitialMargin": f"{float(document['totalInitialMargin']):.8f}",
+        "totalMaintMargin": f"{float(document['totalMaintMargin']):.8f}",
+        "totalWalletBalance": f"{float(document['totalWalletBalance']):.8f}",
+        "totalUnrealizedProfit": f"{float(document['totalUnrealizedProfit']):.8f}",
+        "totalMarginBalance": f"{float(document['totalMarginBalance']):.8f}",
+        "totalPositionInitialMargin": f"{float(document['totalPositionInitialMargin']):.8f}",
+        "totalOpenOrderInitialMargin": f"{float(document['totalOpenOrderInitialMargin']):.8f}",
+        "totalCrossWalletBalance": f"{float(document['totalCrossWalletBalance']):.8f}",
+        "totalCrossUnPnl": f"{float(document['totalCrossUnPnl']):.8f}",
+        "availableBalance": f"{float(document['availableBalance']):.8f}",
+        "maxWithdrawAmount": f"{float(document['maxWithdrawAmount']):.8f}",
+        "assets": [
+            {
+                "asset": asset["asset"],
+                "walletBalance": f"{float(asset['walletBalance']):.8f}",
+                "unrealizedProfit": f"{float(asset['unrealizedProfit']):.8f}",
+                "marginBalance": f"{float(asset['marginBalance']):.8f}",
+                "maintMargin": f"{float(asset['maintMargin']):.8f}",
+                "initialMargin": f"{float(asset['initialMargin']):.8f}",
+                "positionInitialMargin": f"{float(asset['positionInitialMargin']):.8f}",
+                "openOrderInitialMargin": f"{float(asset['openOrderInitialMargin']):.8f}",
+                "crossWalletBalance": f"{float(asset['crossWalletBalance']):.8f}",
+                "crossUnPnl": f"{float(asset['crossUnPnl']):.8f}",
+                "availableBalance": f"{float(asset['availableBalance']):.8f}",
+                "maxWithdrawAmount": f"{float(asset['maxWithdrawAmount']):.8f}",
+                "marginAvailable": asset["marginAvailable"],
+                "updateTime": int(asset["updateTime"].timestamp() * 1000) if isinstance(asset["updateTime"], datetime) else int(float(asset["updateTime"])) if asset["updateTime"] else 0
+            }
+            for asset in document["assets"]
+        ],
+        "positions": [
+            {
+                "symbol": position["symbol"],
+                "initialMargin": f"{float(position['initialMargin']):.8f}",
+                "maintMargin": f"{float(position['maintMargin']):.8f}",
+                "unrealizedProfit": f"{float(position['unrealizedProfit']):.8f}",
+                "positionInitialMargin": f"{float(position['positionInitialMargin']):.8f}",
+                "openOrderInitialMargin": f"{float(position['openOrderInitialMargin']):.8f}",
+                "leverage": f"{float(position['leverage']):.8f}",
+                "isolated": position["isolated"],
+                "entryPrice": f"{float(position['entryPrice']):.8f}",
+                "breakEvenPrice": f"{float(position['breakEvenPrice']):.8f}",
+                "maxNotional": f"{float(position['maxNotional']):.8f}",
+                "positionSide": position["positionSide"],
+                "positionAmt": f"{float(position['positionAmt']):.8f}",
+                "notional": f"{float(position['notional']):.8f}",
+                "isolatedWallet": f"{float(position['isolatedWallet']):.8f}",
+                "updateTime": int(position["updateTime"].timestamp() * 1000) if isinstance(position["updateTime"], datetime) else int(float(position["updateTime"])) if position["updateTime"] else 0,
+                "bidNotional": f"{float(position['bidNotional']):.8f}",
+                "askNotional": f"{float(position['askNotional']):.8f}"
+            }
+            for position in document["positions"]
+        ]
+    }
+
+# Core function to fetch and store futures account information
+async def fetch_and_store_futures_account_info(
+    client_name: str,
+    account_name: str,
+    email: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str
+) -> Dict[str, Any]:
+    return format_futures_account_info(await refresh_futures_account_info(client_name, account_name, email, user_id, api_key, secret_key))
     
 
 # Core function to fetch futures account trades with retries
 async def fetch_futures_account_trades(
-    client: Client,
+    client: AsyncClient,
     symbol: str,
     start_time: Optional[int] = None,
     end_time: Optional[int] = None,
-    limit: int = 500
+    limit: int = 500,
+    from_id: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     for attempt in range(5):  # Try up to 5 times
         try:
@@ -650,8 +764,10 @@ async def fetch_futures_account_trades(
                 params["startTime"] = start_time
             if end_time:
                 params["endTime"] = end_time
+            if from_id is not None:
+                params["fromId"] = from_id
 
-            trades = client.futures_account_trades(**params)
+            trades = await futures_weight_limiter.call(FUTURES_USER_TRADES_WEIGHT, client.futures_account_trades, **params)
             return trades
         except BinanceAPIException as e:
             logger.warning(f"Attempt {attempt + 1} failed for symbol {symbol}: {str(e)}")
@@ -661,198 +777,224 @@ async def fetch_futures_account_trades(
                 raise
     return []
 
-# Core function to fetch and store futures trade list
-async def fetch_and_store_futures_trades(
+# Core function to fetch new futures trades from Binance and store them
+async def sync_futures_trades(
     client_name: str,
     account_name: str,
     user_id: str,
     api_key: str,
     secret_key: str,
     symbol: Optional[str] = None,
-    start_time: Optional[int] = None,
-    end_time: Optional[int] = None,
-    limit: int = 500,
     email: Optional[str] = None
-) -> List[Dict[str, Any]]:
+) -> int:
     try:
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
-        
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
-
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+        # Get symbols to query: only those this account has traded, not every listed contract
+        symbols = [symbol] if symbol else await get_traded_symbols(client, user_id, client_name, account_name, FUTURES_MARKET)
 
-        # Get symbols to query
-        symbols = [symbol] if symbol else await get_all_symbols_futures()
-
-        # Check MongoDB for existing trades
-        existing_trades = []
-        missing_ranges = []
-        if start_time and end_time:
-            start_dt = datetime.fromtimestamp(start_time / 1000)
-            end_dt = datetime.fromtimestamp(end_time / 1000)
-            document = futures_trades_collection.find_one({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-            if document and "trades" in document:
-                # Filter trades within the requested time range
-                existing_trades = [
-                    trade for trade in document["trades"]
-                    if start_dt <= trade["time"] <= end_dt
-                    and (not symbol or trade["symbol"] == symbol)
-                ]
-                # Determine missing time ranges
-                existing_times = {trade["time"] for trade in existing_trades}
-                time_ranges = split_time_range(start_time, end_time)
-                for start, end in time_ranges:
-                    start_dt_chunk = datetime.fromtimestamp(start / 1000)
-                    end_dt_chunk = datetime.fromtimestamp(end / 1000)
-                    # Check if any trade exists in this time chunk
-                    has_trades = any(
-                        start_dt_chunk <= trade_time <= end_dt_chunk
-                        for trade_time in existing_times
-                    )
-                    if not has_trades:
-                        missing_ranges.append((start, end))
-        else:
-            missing_ranges = [(start_time, end_time)] if start_time and end_time else []
+        # Per-symbol sync watermarks: only trades after the last stored id are fetched
+        watermarks = await get_sync_watermarks(user_id, client_name, account_name, FUTURES_MARKET)
 
-        # Fetch trades from Binance if needed
-        new_trades = []
-        trade_ids = {trade["id"] for trade in existing_trades}  # Track existing trade IDs
-        for symbol in symbols:
+        # Helper function to page one symbol's new trades under the shared weight budget
+        async def fetch_symbol_trades(symbol: str) -> List[Dict[str, Any]]:
             try:
-                trade_list = []
-                # If no time range or no missing ranges, fetch recent trades
-                if not start_time or not end_time or not missing_ranges:
-                    trade_list = await fetch_futures_account_trades(
+                watermark = watermarks.get(symbol)
+                from_id = watermark["last_trade_id"] + 1 if watermark else 0
+                return await fetch_trades_from_id(
+                    lambda from_id: fetch_futures_account_trades(
                         client=client,
                         symbol=symbol,
-                        limit=limit
-                    )
-                else:
-                    # Fetch trades for missing time ranges
-                    for start, end in missing_ranges:
-                        chunk_trades = await fetch_futures_account_trades(
-                            client=client,
-                            symbol=symbol,
-                            start_time=start,
-                            end_time=end,
-                            limit=limit
-                        )
-                        trade_list.extend(chunk_trades)
-                        await asyncio.sleep(0.1)  # 100ms delay to respect rate limits
-
-                if not trade_list:
-                    continue
-
-                # Prepare trades for storage
-                for trade in trade_list:
-                    if trade["id"] not in trade_ids:
-                        trade_ids.add(trade["id"])
-                        new_trades.append({
-                            "symbol": trade["symbol"],
-                            "id": trade["id"],
-                            "orderId": trade["orderId"],
-                            "side": trade["side"],
-                            "price": float(trade["price"]),
-                            "qty": float(trade["qty"]),
-                            "realizedPnl": float(trade["realizedPnl"]),
-                            "quoteQty": float(trade["quoteQty"]),
-                            "commission": float(trade["commission"]),
-                            "commissionAsset": trade["commissionAsset"],
-                            "time": datetime.fromtimestamp(trade["time"] / 1000),
-                            "positionSide": trade["positionSide"],
-                            "buyer": trade["buyer"],
-                            "maker": trade["maker"]
-                        })
-
+                        from_id=from_id,
+                        limit=TRADE_PAGE_LIMIT
+                    ),
+                    from_id
+                )
             except BinanceAPIException as e:
                 logger.warning(f"Failed to fetch futures trades for symbol {symbol}: {str(e)}")
-                continue
-
-        # Combine existing and new trades
-        all_trades = existing_trades + new_trades
-
-        # Update MongoDB document
-        if all_trades:
-            # Remove existing document
-            futures_trades_collection.delete_many({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-            # Create new document
-            trade_document = {
-                "user_id": user_id,
-                "client_name": client_name,
-                "account_name": account_name,
-                "email": email,
-                "trades": all_trades,
-                "timestamp": datetime.utcnow(),
-                "document_id": str(uuid.uuid4())
-            }
-            futures_trades_collection.insert_one(trade_document)
+                return []
 
-        # Format trades for response
-        response_trades = [
-            {
-                "symbol": trade["symbol"],
-                "id": trade["id"],
-                "orderId": trade["orderId"],
-                "side": trade["side"],
-                "price": f"{float(trade['price']):.8f}",
-                "qty": f"{float(trade['qty']):.8f}",
-                "realizedPnl": f"{float(trade['realizedPnl']):.8f}",
-                "quoteQty": f"{float(trade['quoteQty']):.8f}",
-                "commission": f"{float(trade['commission']):.8f}",
-                "commissionAsset": trade["commissionAsset"],
-                "time": int(trade["time"].timestamp() * 1000),
-                "positionSide": trade["positionSide"],
-                "buyer": trade["buyer"],
-                "maker": trade["maker"]
-            }
-            for trade in all_trades
-        ]
+        # Fetch new trades from Binance, several symbols at a time
+        symbol_trades = await gather_bounded(symbols, fetch_symbol_trades)
 
-        return response_trades
+        account = {"user_id": user_id, "client_name": client_name, "account_name": account_name, "email": email}
+        new_trades = []
+        for trade_list in symbol_trades:
+            # Prepare trades for storage, one document per trade
+            for trade in trade_list:
+                new_trades.append({
+                    **account,
+                    "symbol": trade["symbol"],
+                    "id": trade["id"],
+                    "orderId": trade["orderId"],
+                    "side": trade["side"],
+                    "price": float(trade["price"]),
+                    "qty": float(trade["qty"]),
+                    "realizedPnl": float(trade["realizedPnl"]),
+                    "quoteQty": float(trade["quoteQty"]),
+                    "commission": float(trade["commission"]),
+                    "commissionAsset": trade["commissionAsset"],
+                    "time": datetime.fromtimestamp(trade["time"] / 1000),
+                    "positionSide": trade["positionSide"],
+                    "buyer": trade["buyer"],
+                    "maker": trade["maker"]
+                })
+
+        # Keep the account's traded-symbol set current
+        await record_traded_symbols(user_id, client_name, account_name, FUTURES_MARKET, {trade["symbol"] for trade in new_trades})
+
+        # Store only the trades that are not in MongoDB yet
+        stored = await upsert_records(futures_trade_records_collection, new_trades, TRADE_KEY_FIELDS)
+        logger.info(f"Stored {stored} new futures trades for {client_name}/{account_name}")
+
+        # Advance watermarks only once the trades are stored
+        await set_sync_watermarks(user_id, client_name, account_name, FUTURES_MARKET, trade_watermarks(new_trades))
+        return stored
 
     except Exception as e:
-        logger.error(f"Error in fetch_and_store_futures_trades: {str(e)}")
+        logger.error(f"Error in sync_futures_trades: {str(e)}")
         raise
 
-        
-# Core function to fetch and store futures position information
-async def fetch_and_store_futures_position_info(
+# Helper function to format a stored futures trade for the response
+def format_futures_trade(trade: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "symbol": trade["symbol"],
+        "id": trade["id"],
+        "orderId": trade["orderId"],
+        "side": trade["side"],
+        "price": f"{float(trade['price']):.8f}",
+        "qty": f"{float(trade['qty']):.8f}",
+        "realizedPnl": f"{float(trade['realizedPnl']):.8f}",
+        "quoteQty": f"{float(trade['quoteQty']):.8f}",
+        "commission": f"{float(trade['commission']):.8f}",
+        "commissionAsset": trade["commissionAsset"],
+        "time": int(trade["time"].timestamp() * 1000),
+        "positionSide": trade["positionSide"],
+        "buyer": trade["buyer"],
+        "maker": trade["maker"]
+    }
+
+# Core function to iterate the requested stored futures trades, formatted for the response
+async def iter_futures_trades(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    symbol: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    limit: int = 500,
+    numeric: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    async for trade in iter_selected_trades(
+        futures_trade_records_collection,
+        {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+        FUTURES_TRADE_FIELDS,
+        symbol,
+        start_time,
+        end_time,
+        limit
+    ):
+        yield format_numeric(trade) if numeric else format_futures_trade(trade)
+
+# Core function to read one page of stored futures trades, newest first
+async def page_futures_trades(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    page_size: int,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    numeric: bool = False
+) -> Dict[str, Any]:
+    return await page_records(
+        futures_trade_records_collection,
+        trade_page_query({"user_id": user_id, "client_name": client_name, "account_name": account_name}, symbol, start_time, end_time),
+        "time",
+        "id",
+        FUTURES_TRADE_FIELDS,
+        page_size,
+        cursor,
+        format_numeric if numeric else format_futures_trade
+    )
+
+# Core function to fetch and store futures trade list
+async def fetch_and_store_futures_trades(
     client_name: str,
     account_name: str,
     user_id: str,
     api_key: str,
     secret_key: str,
-    email: Optional[str] = None
+    symbol: Optional[str] = None,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    limit: int = 500,
+    email: Optional[str] = None,
+    numeric: bool = False
 ) -> List[Dict[str, Any]]:
     try:
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
+        await sync_futures_trades(client_name, account_name, user_id, api_key, secret_key, symbol, email)
+        return [trade async for trade in iter_futures_trades(client_name, account_name, user_id, symbol, start_time, end_time, limit, numeric)]
 
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
+    except Exception as e:
+        logger.error(f"Error in fetch_and_store_futures_trades: {str(e)}")
+        raise
 
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
+        
+# Helper function to format a futures position for the response
+def format_position(position: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "symbol": position["symbol"],
+        "positionSide": position["positionSide"],
+        "positionAmt": f"{float(position['positionAmt']):.8f}",
+        "entryPrice": f"{float(position['entryPrice']):.8f}",
+        "breakEvenPrice": f"{float(position['breakEvenPrice']):.8f}",
+        "markPrice": f"{float(position['markPrice']):.8f}",
+        "unRealizedProfit": f"{float(position['unRealizedProfit']):.8f}",
+        "liquidationPrice": f"{float(position['liquidationPrice']):.8f}",
+        "isolatedMargin": f"{float(position['isolatedMargin']):.8f}",
+        "notional": f"{float(position['notional']):.8f}",
+        "marginAsset": position["marginAsset"],
+        "isolatedWallet": f"{float(position['isolatedWallet']):.8f}",
+        "initialMargin": f"{float(position['initialMargin']):.8f}",
+        "maintMargin": f"{float(position['maintMargin']):.8f}",
+        "positionInitialMargin": f"{float(position['positionInitialMargin']):.8f}",
+        "openOrderInitialMargin": f"{float(position['openOrderInitialMargin']):.8f}",
+        "adl": int(float(position["adl"])),  # Ensure adl is an integer
+        "bidNotional": f"{float(position['bidNotional']):.8f}",
+        "askNotional": f"{float(position['askNotional']):.8f}",
+        "updateTime": int(position["updateTime"].timestamp() * 1000) if isinstance(position["updateTime"], datetime) else int(float(position["updateTime"])) if position["updateTime"] else 0
+    }
+
+# Helper function to read one page of a stored position snapshot, ordered by symbol and side
+def page_futures_positions(
+    document: Dict[str, Any],
+    page_size: int,
+    cursor: Optional[str] = None,
+    numeric: bool = False
+) -> Dict[str, Any]:
+    # Positions are one small document per account, so they are paged in memory
+    page = page_in_memory(document.get("positions", []), ("symbol", "positionSide"), page_size, cursor)
+    format_record = format_numeric if numeric else format_position
+    return {"rows": [format_record(position) for position in page["rows"]], "next_cursor": page["next_cursor"]}
 
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+# Core function to fetch futures positions and store them as the account's snapshot
+async def refresh_futures_position_info(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str,
+    email: Optional[str] = None
+) -> Dict[str, Any]:
+    try:
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
         # Fetch futures position information
-        position_info = client.futures_position_information()
+        position_info = await client.futures_position_information()
 
         # Process positions for MongoDB storage
         positions = [
@@ -892,78 +1034,53 @@ async def fetch_and_store_futures_position_info(
             "document_id": str(uuid.uuid4())
         }
 
-        # Remove existing document for this account
-        futures_position_info_collection.delete_many({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-
-        # Store the single document in MongoDB
-        if positions:
-            futures_position_info_collection.insert_one(position_document)
-
-        # Format response to match Binance API
-        response = [
-            {
-                "symbol": position["symbol"],
-                "positionSide": position["positionSide"],
-                "positionAmt": f"{float(position['positionAmt']):.8f}",
-                "entryPrice": f"{float(position['entryPrice']):.8f}",
-                "breakEvenPrice": f"{float(position['breakEvenPrice']):.8f}",
-                "markPrice": f"{float(position['markPrice']):.8f}",
-                "unRealizedProfit": f"{float(position['unRealizedProfit']):.8f}",
-                "liquidationPrice": f"{float(position['liquidationPrice']):.8f}",
-                "isolatedMargin": f"{float(position['isolatedMargin']):.8f}",
-                "notional": f"{float(position['notional']):.8f}",
-                "marginAsset": position["marginAsset"],
-                "isolatedWallet": f"{float(position['isolatedWallet']):.8f}",
-                "initialMargin": f"{float(position['initialMargin']):.8f}",
-                "maintMargin": f"{float(position['maintMargin']):.8f}",
-                "positionInitialMargin": f"{float(position['positionInitialMargin']):.8f}",
-                "openOrderInitialMargin": f"{float(position['openOrderInitialMargin']):.8f}",
-                "adl": int(float(position["adl"])),  # Ensure adl is an integer
-                "bidNotional": f"{float(position['bidNotional']):.8f}",
-                "askNotional": f"{float(position['askNotional']):.8f}",
-                "updateTime": int(position["updateTime"].timestamp() * 1000) if isinstance(position["updateTime"], datetime) else int(float(position["updateTime"])) if position["updateTime"] else 0
-            }
-            for position in positions
-        ]
-
-        return response
+        # Swap the account's snapshot in one write so readers never find it missing
+        await futures_position_info_collection.replace_one(
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+            position_document,
+            upsert=True
+        )
+        return position_document
 
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise
     except Exception as e:
-        logger.error(f"Error in fetch_and_store_futures_position_info: {str(e)}")
+        logger.error(f"Error in refresh_futures_position_info: {str(e)}")
         raise
 
-    
-# Core function to fetch and store futures account balances
-async def fetch_and_store_futures_account_balances(
+# Helper function to format a stored position snapshot, or keep the stored numbers as they are
+def format_positions(document: Dict[str, Any], numeric: bool = False) -> List[Dict[str, Any]]:
+    format_record = format_numeric if numeric else format_position
+    return [format_record(position) for position in document["positions"]]
+
+# Core function to fetch and store futures position information
+async def fetch_and_store_futures_position_info(
     client_name: str,
     account_name: str,
     user_id: str,
     api_key: str,
     secret_key: str,
-    email: Optional[str] = None
+    email: Optional[str] = None,
+    numeric: bool = False
 ) -> List[Dict[str, Any]]:
-    try:
-        # Initialize Binance client
-        client = Client(api_key=api_key, api_secret=secret_key)
-
-        # Synchronize with Binance server time
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)  # Current local time in milliseconds
-
-        # Calculate time difference
-        time_diff = server_timestamp - local_timestamp
+    return format_positions(await refresh_futures_position_info(client_name, account_name, user_id, api_key, secret_key, email), numeric)
 
-        # Adjust client timestamp if necessary
-        if abs(time_diff) > 500:  # If time difference is significant (>500ms)
-            logger.info(f"Adjusting timestamp by {time_diff}ms to match Binance server time")
-            client.timestamp_offset = time_diff
+# Core function to fetch futures balances and store them as the account's snapshot
+async def refresh_futures_account_balances(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str,
+    email: Optional[str] = None
+) -> Dict[str, Any]:
+    try:
+        # Pooled async client; the server-time offset is cached and refreshed by the pool
+        client = await binance_client_pool.get_client(api_key, secret_key)
 
         # Fetch futures account balances
-        futures_balance = client.futures_account_balance()
+        futures_balance = await client.futures_account_balance()
 
         # Process balances for MongoDB storage
         balances = [
@@ -992,34 +1109,45 @@ async def fetch_and_store_futures_account_balances(
             "document_id": str(uuid.uuid4())
         }
 
-        # Remove existing document for this account
-        futures_account_balances_collection.delete_many({"user_id": user_id, "client_name": client_name, "account_name": account_name})
-
-        # Store the single document in MongoDB
-        if balances:
-            futures_account_balances_collection.insert_one(balance_document)
-
-        # Format response to match Binance API
-        response = [
-            {
-                "accountAlias": balance["accountAlias"],
-                "asset": balance["asset"],
-                "balance": f"{float(balance['balance']):.8f}",
-                "crossWalletBalance": f"{float(balance['crossWalletBalance']):.8f}",
-                "crossUnPnl": f"{float(balance['crossUnPnl']):.8f}",
-                "availableBalance": f"{float(balance['availableBalance']):.8f}",
-                "maxWithdrawAmount": f"{float(balance['maxWithdrawAmount']):.8f}",
-                "marginAvailable": balance["marginAvailable"],
-                "updateTime": int(balance["updateTime"].timestamp() * 1000) if isinstance(balance["updateTime"], datetime) else int(float(balance["updateTime"])) if balance["updateTime"] else 0
-            }
-            for balance in balances
-        ]
-
-        return response
+        # Swap the account's snapshot in one write so readers never find it missing
+        await futures_account_balances_collection.replace_one(
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+            balance_document,
+            upsert=True
+        )
+        return balance_document
 
     except BinanceAPIException as e:
         logger.error(f"Binance API Exception: {str(e)}")
         raise
     except Exception as e:
-        logger.error(f"Error in fetch_and_store_futures_account_balances: {str(e)}")
+        logger.error(f"Error in refresh_futures_account_balances: {str(e)}")
         raise
+
+# Helper function to format a stored futures balance snapshot to match the Binance API
+def format_futures_balances(document: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "accountAlias": balance["accountAlias"],
+            "asset": balance["asset"],
+            "balance": f"{float(balance['balance']):.8f}",
+            "crossWalletBalance": f"{float(balance['crossWalletBalance']):.8f}",
+            "crossUnPnl": f"{float(balance['crossUnPnl']):.8f}",
+            "availableBalance": f"{float(balance['availableBalance']):.8f}",
+            "maxWithdrawAmount": f"{float(balance['maxWithdrawAmount']):.8f}",
+            "marginAvailable": balance["marginAvailable"],
+            "updateTime": int(balance["updateTime"].timestamp() * 1000) if isinstance(balance["updateTime"], datetime) else int(float(balance["updateTime"])) if balance["updateTime"] else 0
+        }
+        for balance in document["balances"]
+    ]
+
+# Core function to fetch and store futures account balances
+async def fetch_and_store_futures_account_balances(
+    client_name: str,
+    account_name: str,
+    user_id: str,
+    api_key: str,
+    secret_key: str,
+    email: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    return format_futures_balances(await refresh_futures_account_balances(client_name, account_name, user_id, api_key, secret_key, email))
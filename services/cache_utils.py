@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Registry of named caches so their counters can be reported in one place
+CACHES: Dict[str, "AsyncTTLCache"] = {}
+
+
+# Helper function to run ``loader`` once per key at a time, sharing its result with concurrent callers
+async def single_flight(inflight: Dict[Hashable, asyncio.Future], key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+    """
+    Returns ``(value, shared)``; ``shared`` is True when another caller's load
+    was awaited instead of running ``loader``. The shared future is always
+    settled: with the value, with the loader's exception, or cancelled when
+    the loading caller is cancelled, in which case a waiter takes over the load.
+    """
+    while True:
+        future = inflight.get(key)
+        if future is None:
+            break
+        try:
+            return await asyncio.shield(future), True
+        except asyncio.CancelledError:
+            # Only the loading caller was cancelled, not this one; load it here instead
+            if future.cancelled() and not asyncio.current_task().cancelling():
+                continue
+            raise
+
+    future = asyncio.get_running_loop().create_future()
+    inflight[key] = future
+    try:
+        value = await loader()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved when nobody else was waiting on it
+        future.exception()
+        raise
+    else:
+        future.set_result(value)
+        return value, False
+    finally:
+        if inflight.get(key) is future:
+            del inflight[key]
+
+
+class AsyncTTLCache:
+    """
+    TTL + LRU cache for use from async code.
+
+    Wraps ``cachetools.TTLCache`` and adds hit/miss counters and single-flight
+    loading: concurrent ``get_or_load`` calls for the same missing key share
+    one loader call instead of each doing the work. A key invalidated while
+    it is being loaded is returned to the waiting callers but not cached, so
+    the value read before the change isn't served for a full TTL.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # key -> invalidations seen since its running load started; only kept while the key is loading
+        self._generations: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+        CACHES[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._cache[key] = value
+
+    def invalidate(self, key: Hashable) -> None:
+        self._cache.pop(key, None)
+        if key in self._generations:
+            self._generations[key] += 1
+
+    def invalidate_loading(self) -> None:
+        """Keep every load now running from being cached, for changes whose keys aren't known yet."""
+        for key in self._generations:
+            self._generations[key] += 1
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self.invalidate_loading()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the live (non-expired) entries; does not touch the counters."""
+        self._cache.expire()
+        return list(self._cache.items())
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+
+        async def load() -> Any:
+            self._generations[key] = 0
+            try:
+                value = await loader()
+                if self._generations[key] == 0:
+                    self._cache[key] = value
+                return value
+            finally:
+                del self._generations[key]
+
+        # Someone already loading this key counts as a hit; their result is shared
+        value, shared = await single_flight(self._inflight, key, load)
+        if shared:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "maxsize": self._cache.maxsize,
+            "ttl": self._cache.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters for every registered cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in CACHES.items()}
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from binance.async_client import AsyncClient
+
+from services.binance_client_pool import binance_client_pool
+
+logger = logging.getLogger(__name__)
+
+# exchangeInfo changes a few times a day; refresh it in the background on this interval
+EXCHANGE_INFO_REFRESH_SECONDS = int(os.getenv("EXCHANGE_INFO_REFRESH_SECONDS", "900"))
+
+# Fields kept per symbol; the rest of the (multi-megabyte) payload is dropped
+SYMBOL_FIELDS = ("symbol", "baseAsset", "quoteAsset", "status")
+
+
+class ExchangeInfoCache:
+    """
+    In-memory copy of one market's exchangeInfo, indexed by symbol, base asset and quote asset.
+
+    The first lookup loads it; after ``start()`` a background task reloads it
+    every ``refresh_interval`` seconds and swaps the indexes in one step, so
+    readers never see a half-built snapshot. A failed refresh keeps serving the
+    previous snapshot.
+    """
+
+    def __init__(self, market: str, fetch: Callable[[AsyncClient], Awaitable[Dict[str, Any]]], refresh_interval: float = EXCHANGE_INFO_REFRESH_SECONDS):
+        self.market = market
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.updated_at: Optional[float] = None
+        self._symbols: Dict[str, Dict[str, Any]] = {}
+        self._by_base: Dict[str, List[str]] = {}
+        self._by_quote: Dict[str, List[str]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> None:
+        client = await binance_client_pool.get_public_client()
+        info = await self.fetch(client)
+
+        symbols: Dict[str, Dict[str, Any]] = {}
+        by_base: Dict[str, List[str]] = {}
+        by_quote: Dict[str, List[str]] = {}
+        for entry in info["symbols"]:
+            symbol = {field: entry.get(field) for field in SYMBOL_FIELDS}
+            symbols[symbol["symbol"]] = symbol
+            by_base.setdefault(symbol["baseAsset"], []).append(symbol["symbol"])
+            by_quote.setdefault(symbol["quoteAsset"], []).append(symbol["symbol"])
+
+        self._symbols, self._by_base, self._by_quote = symbols, by_base, by_quote
+        self.updated_at = time.time()
+        logger.info(f"Loaded {self.market} exchange info: {len(symbols)} symbols")
+
+    async def ensure_loaded(self) -> None:
+        if self.updated_at is not None:
+            return
+        async with self._lock:
+            if self.updated_at is None:
+                await self.refresh()
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh {self.market} exchange info, serving previous snapshot: {str(e)}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def get_symbol(self, symbol: str) -> Optional[Dict[str, Any]]:
+        await self.ensure_loaded()
+        return self._symbols.get(symbol)
+
+    async def list_symbols(
+        self,
+        base_asset: Optional[str] = None,
+        quote_asset: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> List[str]:
+        """Sorted symbol names, optionally filtered by base asset, quote asset and trading status."""
+        await self.ensure_loaded()
+        if base_asset is not None:
+            candidates = self._by_base.get(base_asset, [])
+        elif quote_asset is not None:
+            candidates = self._by_quote.get(quote_asset, [])
+        else:
+            candidates = self._symbols.keys()
+
+        symbols = []
+        for name in candidates:
+            symbol = self._symbols[name]
+            if quote_asset is not None and symbol["quoteAsset"] != quote_asset:
+                continue
+            if status is not None and symbol["status"] != status:
+                continue
+            symbols.append(name)
+        return sorted(symbols)
+
+
+spot_exchange_info = ExchangeInfoCache("spot", lambda client: client.get_exchange_info())
+futures_exchange_info = ExchangeInfoCache("futures", lambda client: client.futures_exchange_info())
+
+
+# Helper function to start background refresh of every exchange-info cache
+def start_exchange_info_refresh() -> None:
+    spot_exchange_info.start()
+    futures_exchange_info.start()
+
+
+# Helper function to stop the background refresh tasks
+async def stop_exchange_info_refresh() -> None:
+    await spot_exchange_info.stop()
+    await futures_exchange_info.stop()
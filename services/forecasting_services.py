@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import List, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+import yfinance as yf
+from fastapi import HTTPException
+from sklearn.preprocessing import MinMaxScaler
+from tensorflow.keras.models import load_model
+
+from services.cache_utils import AsyncTTLCache
+
+logger = logging.getLogger(__name__)
+
+# Constants (same as in the training script)
+LOOK_BACK = 120
+MODEL_PATH = 'trained_models/lstm_btc_model.h5'
+
+# How long the batcher waits for more requests before running a rollout, and how many it merges
+BATCH_WINDOW_SECONDS = 0.02
+MAX_BATCH_SIZE = 32
+
+# Days of hourly history used as model context
+HISTORY_DAYS = 400
+
+# Rollout horizons are rounded up to whole weeks so overlapping date ranges share one rollout
+ROLLOUT_HORIZON_BUCKET_HOURS = 7 * 24
+
+# Price history is keyed by the current hour and rollouts by the last candle, so both stay valid for an hour
+history_cache = AsyncTTLCache("forecast_history", maxsize=8, ttl=60 * 60)
+rollout_cache = AsyncTTLCache("forecast_rollout", maxsize=64, ttl=60 * 60)
+
+
+class LSTMForecaster:
+    """
+    Autoregressive rollout of the hourly LSTM model.
+
+    The whole rollout runs inside one compiled ``tf.function``: the window is
+    shifted in-graph and predictions are written into a preallocated
+    ``TensorArray``, so an N-step forecast is a single call instead of N
+    ``model.predict`` round trips through Keras.
+    """
+
+    def __init__(self, model: tf.keras.Model, look_back: int = LOOK_BACK):
+        self.model = model
+        self.look_back = look_back
+        self._rollout = tf.function(
+            self._rollout_graph,
+            input_signature=[
+                tf.TensorSpec(shape=[None, look_back, 1], dtype=tf.float32),
+                tf.TensorSpec(shape=[], dtype=tf.int32)
+            ]
+        )
+
+    def _rollout_graph(self, windows: tf.Tensor, steps: tf.Tensor) -> tf.Tensor:
+        predictions = tf.TensorArray(tf.float32, size=steps)
+        window = windows
+        for step in tf.range(steps):
+            pred = self.model(window, training=False)  # (batch, 1)
+            predictions = predictions.write(step, pred[:, 0])
+            window = tf.concat([window[:, 1:, :], pred[:, tf.newaxis, :]], axis=1)
+        return tf.transpose(predictions.stack())  # (batch, steps)
+
+    def rollout(self, windows: np.ndarray, steps: int) -> np.ndarray:
+        """
+        Forecast ``steps`` values for each scaled window.
+
+        Args:
+            windows (np.ndarray): Scaled inputs of shape (batch, look_back).
+            steps (int): Number of hourly steps to predict.
+
+        Returns:
+            np.ndarray: Scaled predictions of shape (batch, steps).
+        """
+        x = np.asarray(windows, dtype=np.float32).reshape(-1, self.look_back, 1)
+        return self._rollout(tf.constant(x), tf.constant(steps, dtype=tf.int32)).numpy()
+
+
+class ForecastBatcher:
+    """
+    Merges rollouts requested at about the same time into one batched model call.
+
+    Requests arriving within ``BATCH_WINDOW_SECONDS`` of each other are stacked
+    and rolled out together for the longest horizon among them; each caller
+    gets its own slice. The rollout runs in a worker thread so the event loop
+    keeps serving other requests.
+    """
+
+    def __init__(self, forecaster: LSTMForecaster, batch_window: float = BATCH_WINDOW_SECONDS, max_batch_size: int = MAX_BATCH_SIZE):
+        self.forecaster = forecaster
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[np.ndarray, int, asyncio.Future]] = []
+        self._flush_handle = None
+        # The loop only keeps weak references to tasks, so running batches are held here
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, window: np.ndarray, steps: int) -> np.ndarray:
+        """Queue one scaled window for a ``steps``-long rollout and wait for its predictions."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((np.asarray(window, dtype=np.float32).reshape(-1), steps, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Run whatever is still queued and wait for every batch in flight, so no caller is left waiting."""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[np.ndarray, int, asyncio.Future]]) -> None:
+        if not batch:
+            return
+        windows = np.stack([window for window, _, _ in batch])
+        max_steps = max(steps for _, steps, _ in batch)
+        logger.info(f"Running batched LSTM rollout: {len(batch)} request(s), {max_steps} steps")
+        try:
+            predictions = await asyncio.to_thread(self.forecaster.rollout, windows, max_steps)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for row, (_, steps, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(predictions[row, :steps])
+
+
+# Load the pre-trained LSTM model
+forecaster = LSTMForecaster(load_model(MODEL_PATH))
+forecast_batcher = ForecastBatcher(forecaster)
+
+
+# Helper function to download hourly closing prices from yfinance
+def download_price_history(ticker: str, interval: str, current_date: datetime) -> pd.Series:
+    historical_start = current_date - timedelta(days=HISTORY_DAYS)
+    logger.info(f"Fetching {ticker} data from {historical_start} to {current_date}")
+    history = yf.download(ticker, start=historical_start, end=current_date + timedelta(days=1), interval=interval)
+
+    if history.empty:
+        logger.error("No historical data returned from yfinance.")
+        raise HTTPException(status_code=404, detail="No historical data available for the model.")
+
+    # Prepare historical data
+    prices = history["Close"]
+    if isinstance(prices, pd.DataFrame):
+        logger.warning(f"Prices is a DataFrame, converting to Series. Columns: {prices.columns.tolist()}")
+        if len(prices.columns) == 1:
+            prices = prices.iloc[:, 0]
+        else:
+            logger.error(f"Prices DataFrame has multiple columns: {prices.columns.tolist()}")
+            raise HTTPException(status_code=500, detail="Unexpected multi-column DataFrame for prices.")
+
+    prices = prices.dropna()
+    if prices.empty:
+        logger.error("Prices Series is empty after dropping NaN values.")
+        raise HTTPException(status_code=404, detail="No valid price data available after processing.")
+
+    # Ensure we have enough data for the LOOK_BACK window
+    if len(prices) < LOOK_BACK:
+        logger.error(f"Not enough data for LOOK_BACK window: {len(prices)} < {LOOK_BACK}")
+        raise HTTPException(status_code=400, detail="Not enough historical data for forecasting.")
+
+    return prices
+
+
+async def get_price_history(ticker: str, interval: str, current_date: datetime) -> pd.Series:
+    """Hourly closing prices, downloaded at most once per hour and shared by concurrent callers."""
+    current_hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    return await history_cache.get_or_load(
+        (ticker, interval, current_date, current_hour),
+        lambda: asyncio.to_thread(download_price_history, ticker, interval, current_date)
+    )
+
+
+async def get_price_rollout(ticker: str, prices: pd.Series, hours: int) -> np.ndarray:
+    """
+    Hourly forecast prices for the next ``hours`` hours after the last candle in ``prices``.
+
+    Rollouts are cached by (ticker, last candle timestamp, horizon). Any cached
+    rollout from the same candle that is at least as long is sliced instead of
+    running the model again, and new horizons are rounded up to whole weeks so
+    requests for overlapping date ranges land on the same entry.
+    """
+    last_candle = prices.index[-1]
+    for key, _ in rollout_cache.items():
+        cached_ticker, cached_candle, cached_hours = key
+        if cached_ticker == ticker and cached_candle == last_candle and cached_hours >= hours:
+            forecast = rollout_cache.get(key)
+            if forecast is not None:
+                return forecast[:hours]
+
+    horizon = math.ceil(hours / ROLLOUT_HORIZON_BUCKET_HOURS) * ROLLOUT_HORIZON_BUCKET_HOURS
+
+    async def run_rollout() -> np.ndarray:
+        # Prepare data for LSTM prediction
+        closing_prices = prices.values.reshape(-1, 1)
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled_data = scaler.fit_transform(closing_prices)  # Fit the scaler on all historical data
+
+        predictions = await forecast_batcher.submit(scaled_data[-LOOK_BACK:, 0], horizon)
+        return scaler.inverse_transform(np.asarray(predictions, dtype=np.float64).reshape(-1, 1)).flatten()
+
+    forecast = await rollout_cache.get_or_load((ticker, last_candle, horizon), run_rollout)
+    return forecast[:hours]
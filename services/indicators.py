@@ -0,0 +1,202 @@
+import numpy as np
+from scipy.signal import lfilter
+from typing import Dict, List, Optional, Tuple
+
+# Vectorized indicator kernels operating on contiguous float64 arrays.
+# Every rolling kernel is O(n) regardless of the window size and returns NaN
+# for positions that do not yet have a full window, matching pandas' default
+# min_periods behaviour.
+
+ONE_DAY_MS = 24 * 60 * 60 * 1000
+
+
+def as_array(values) -> np.ndarray:
+    """Return values as a contiguous float64 array without copying when possible."""
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+def _sliding_reduce(x: np.ndarray, window: int, ufunc: np.ufunc, identity: float) -> np.ndarray:
+    """
+    Apply an associative ufunc (minimum, maximum) over a sliding window in O(n).
+
+    Uses the van Herk/Gil-Werman scheme: the series is cut into blocks of
+    ``window`` elements, and every window is the combination of a suffix of one
+    block and a prefix of the next, so each element takes part in a constant
+    number of ufunc calls whatever the window size.
+    """
+    if window < 1:
+        raise ValueError(f"window must be >= 1, got {window}")
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window > n:
+        return out
+
+    nblocks = -(-n // window)
+    padded = np.full(nblocks * window, identity)
+    padded[:n] = x
+    blocks = padded.reshape(nblocks, window)
+    prefix = ufunc.accumulate(blocks, axis=1).ravel()
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    # Window ending at i starts at i - window + 1; both ranges are contiguous slices
+    count = n - window + 1
+    values = ufunc(suffix[:count], prefix[window - 1:n])
+    # A window aligned with a block is that block's full suffix; avoid counting it twice
+    values[::window] = suffix[:count:window]
+    out[window - 1:] = values
+    return out
+
+
+def rolling_sum(x: np.ndarray, window: int) -> np.ndarray:
+    """Rolling sum in O(n) using block-local prefix sums (same blocking as _sliding_reduce)."""
+    if window < 1:
+        raise ValueError(f"window must be >= 1, got {window}")
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window > n:
+        return out
+
+    # NaNs would leak through the block totals into neighbouring windows, so sum
+    # them as zero and mask every window that contained one afterwards
+    nan_mask = np.isnan(x)
+    has_nan = nan_mask.any()
+
+    nblocks = -(-n // window)
+    padded = np.zeros(nblocks * window)
+    padded[:n] = np.where(nan_mask, 0.0, x) if has_nan else x
+    prefix = np.add.accumulate(padded.reshape(nblocks, window), axis=1).ravel()
+
+    # Suffix of the starting block: block total minus the prefix before the start
+    count = n - window + 1
+    suffix = np.repeat(prefix[window - 1::window], window)[:count]
+    suffix[1:] -= prefix[:count - 1]
+    values = np.add(suffix, prefix[window - 1:n], out=out[window - 1:])
+    # Windows aligned with a block are exactly that block's total
+    values[::window] = prefix[window - 1:n:window]
+    if has_nan:
+        out[rolling_sum(nan_mask.astype(np.float64), window) > 0] = np.nan
+    return out
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    return rolling_sum(x, window) / window
+
+
+def rolling_min(x: np.ndarray, window: int) -> np.ndarray:
+    return _sliding_reduce(x, window, np.minimum, np.inf)
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+    return _sliding_reduce(x, window, np.maximum, -np.inf)
+
+
+def rolling_mean_std(x: np.ndarray, window: int, ddof: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """Rolling mean and standard deviation (sample by default, like pandas) from one pair of sums."""
+    finite = np.isfinite(x)
+    # Centering keeps the sum of squares small enough to avoid cancellation
+    center = x[finite].mean() if finite.any() else 0.0
+    centered = x - center
+    sums = rolling_sum(centered, window)
+    mean = sums / window + center
+    if window <= ddof:
+        return mean, np.full(len(x), np.nan)
+    sq_sums = rolling_sum(centered * centered, window)
+    var = (sq_sums - sums * sums / window) / (window - ddof)
+    return mean, np.sqrt(np.maximum(var, 0.0))
+
+
+def rolling_std(x: np.ndarray, window: int, ddof: int = 1) -> np.ndarray:
+    return rolling_mean_std(x, window, ddof)[1]
+
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    """Recursive EMA seeded with the first value (pandas ``ewm(span, adjust=False)``)."""
+    if span < 1:
+        raise ValueError(f"span must be >= 1, got {span}")
+    if len(x) == 0:
+        return np.empty(0)
+    alpha = 2.0 / (span + 1.0)
+    # y[n] = alpha * x[n] + (1 - alpha) * y[n-1], with the initial state chosen so y[0] = x[0]
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return out
+
+
+def diff(x: np.ndarray) -> np.ndarray:
+    out = np.empty(len(x))
+    if len(x):
+        out[0] = np.nan
+        np.subtract(x[1:], x[:-1], out=out[1:])
+    return out
+
+
+def bollinger(close: np.ndarray, window: int = 20, num_std: float = 2) -> Dict[str, np.ndarray]:
+    sma, std = rolling_mean_std(close, window)
+    return {
+        "sma": sma,
+        "ema": ema(close, window),
+        "bollinger_upper": sma + num_std * std,
+        "bollinger_lower": sma - num_std * std
+    }
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI using simple moving averages of gains and losses; undefined values are NaN."""
+    delta = diff(close)
+    gain = rolling_mean(np.where(delta > 0, delta, 0.0), period)
+    loss = rolling_mean(np.where(delta < 0, -delta, 0.0), period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    macd_line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(macd_line, signal)
+    return {"macd": macd_line, "signal": signal_line, "histogram": macd_line - signal_line}
+
+
+def stochastic(high: np.ndarray, low: np.ndarray, close: np.ndarray, k_period: int = 14, d_period: int = 3) -> Dict[str, np.ndarray]:
+    lowest_low = rolling_min(low, k_period)
+    highest_high = rolling_max(high, k_period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100.0 * (close - lowest_low) / (highest_high - lowest_low)
+    return {"k": k, "d": rolling_mean(k, d_period)}
+
+
+def vwap(high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray, open_time_ms: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Cumulative VWAP. When open times are given the accumulation restarts at each UTC day.
+    """
+    price_volume = (high + low + close) / 3.0 * volume
+    if open_time_ms is None or not len(open_time_ms):
+        cum_pv = np.cumsum(price_volume)
+        cum_volume = np.cumsum(volume)
+    else:
+        day = np.asarray(open_time_ms, dtype=np.int64) // ONE_DAY_MS
+        starts = np.flatnonzero(np.r_[True, day[1:] != day[:-1]])
+        lengths = np.diff(np.r_[starts, len(day)])
+        # Lay each day out as a row so the running sums restart without cross-day cancellation
+        rows = np.repeat(np.arange(len(starts)), lengths)
+        cols = np.arange(len(day)) - np.repeat(starts, lengths)
+        grid = np.zeros((len(starts), lengths.max()))
+        grid[rows, cols] = price_volume
+        cum_pv = np.cumsum(grid, axis=1)[rows, cols]
+        grid[rows, cols] = volume
+        cum_volume = np.cumsum(grid, axis=1)[rows, cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cum_pv / cum_volume
+
+
+def fill_nan(x: np.ndarray, fill) -> np.ndarray:
+    """Replace NaN with a scalar or with the values of another array."""
+    return np.where(np.isnan(x), fill, x)
+
+
+def to_list(x: np.ndarray, decimals: Optional[int] = 4) -> List[Optional[float]]:
+    """Round (unless decimals is None) and convert to a JSON-ready list, mapping NaN to None."""
+    rounded = np.round(x, decimals) if decimals is not None else x
+    nan_mask = np.isnan(rounded)
+    if not nan_mask.any():
+        return rounded.tolist()
+    values = rounded.astype(object)
+    values[nan_mask] = None
+    return values.tolist()
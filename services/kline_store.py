@@ -0,0 +1,270 @@
+import os
+import json
+import time
+import fcntl
+import asyncio
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Root directory of the on-disk candle store
+KLINE_STORE_DIR = os.getenv("KLINE_STORE_DIR", "kline_store")
+
+# Number of append-only segments a series may have before it is compacted
+MAX_SEGMENTS = 32
+
+# Number of series kept in memory after being read from disk
+MAX_CACHED_SERIES = 64
+
+KLINE_COLUMNS = ['open_time', 'open', 'high', 'low', 'close', 'volume']
+
+KlineFetcher = Callable[[int, int], Awaitable[List[list]]]
+
+
+# Helper function to convert raw Binance klines into the store layout
+def klines_to_frame(klines: List[list]) -> pd.DataFrame:
+    """Convert raw Binance kline rows into a frame with the store columns plus close_time."""
+    df = pd.DataFrame([row[:7] for row in klines], columns=KLINE_COLUMNS + ['close_time'])
+    df[['open_time', 'close_time']] = df[['open_time', 'close_time']].astype('int64')
+    df[KLINE_COLUMNS[1:]] = df[KLINE_COLUMNS[1:]].astype(float)
+    return df
+
+
+class KlineStore:
+    """
+    Durable, append-only candle store with one directory per (symbol, interval).
+
+    Each fetch from Binance is written as its own parquet segment and a small
+    ``meta.json`` records the time span the store is authoritative for. Reads
+    serve whatever is already on disk and only call the fetcher for the head
+    and tail ranges that are missing.
+
+    Several worker processes may share the store: files are written under a
+    unique temporary name and renamed into place, and each series directory
+    has a ``.lock`` file taken shared for reads and exclusive for writes. The
+    in-memory copy of a series is reused only while the segments on disk are
+    the ones it was built from. Waiting for the lock and parquet I/O run in a
+    worker thread, so they never block the event loop.
+    """
+
+    def __init__(self, root: str = KLINE_STORE_DIR):
+        self.root = root
+        # key -> (segment paths the frame was built from, frame)
+        self._series: "OrderedDict[Tuple[str, str], Tuple[Tuple[str, ...], pd.DataFrame]]" = OrderedDict()
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        # Guards the in-memory series cache, which worker threads of different series share
+        self._series_lock = threading.Lock()
+
+    def _series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, symbol.upper(), interval)
+
+    def _meta_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self._series_dir(symbol, interval), "meta.json")
+
+    def _lock(self, key: Tuple[str, str]) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    def _read_meta(self, symbol: str, interval: str) -> Dict[str, int]:
+        path = self._meta_path(symbol, interval)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    @contextmanager
+    def _file_lock(self, symbol: str, interval: str, exclusive: bool = True) -> Iterator[None]:
+        """OS lock on the series directory, shared with other worker processes; not re-entrant."""
+        series_dir = self._series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        with open(os.path.join(series_dir, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_atomic(self, path: str, write: Callable[[str], None]) -> None:
+        """Write through a temporary file unique to this writer, then rename it into place."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _write_meta(self, symbol: str, interval: str, meta: Dict[str, int]) -> None:
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+
+        self._write_atomic(self._meta_path(symbol, interval), write)
+
+    def _segment_name(self, df: pd.DataFrame) -> str:
+        first, last = int(df['open_time'].iloc[0]), int(df['open_time'].iloc[-1])
+        return f"{first:015d}_{last:015d}_{time.time_ns()}_{os.getpid()}.parquet"
+
+    def _segment_paths(self, symbol: str, interval: str) -> List[str]:
+        series_dir = self._series_dir(symbol, interval)
+        if not os.path.isdir(series_dir):
+            return []
+        return sorted(
+            os.path.join(series_dir, name)
+            for name in os.listdir(series_dir)
+            if name.endswith(".parquet")
+        )
+
+    def _load_unlocked(self, symbol: str, interval: str) -> pd.DataFrame:
+        """Series as on disk; the caller holds the series file lock."""
+        key = (symbol.upper(), interval)
+        paths = tuple(self._segment_paths(symbol, interval))
+        with self._series_lock:
+            cached = self._series.get(key)
+            if cached is not None and cached[0] == paths:
+                self._series.move_to_end(key)
+                return cached[1]
+
+        segments = [pd.read_parquet(path) for path in paths]
+        if segments:
+            df = pd.concat(segments, ignore_index=True)
+            df = df.drop_duplicates('open_time', keep='last').sort_values('open_time').reset_index(drop=True)
+        else:
+            df = klines_to_frame([])[KLINE_COLUMNS]
+
+        self._cache(key, paths, df)
+        return df
+
+    def _load(self, symbol: str, interval: str) -> pd.DataFrame:
+        with self._file_lock(symbol, interval, exclusive=False):
+            return self._load_unlocked(symbol, interval)
+
+    def _cache(self, key: Tuple[str, str], paths: Tuple[str, ...], df: pd.DataFrame) -> None:
+        with self._series_lock:
+            self._series[key] = (paths, df)
+            self._series.move_to_end(key)
+            while len(self._series) > MAX_CACHED_SERIES:
+                self._series.popitem(last=False)
+
+    def _append(self, symbol: str, interval: str, df: pd.DataFrame) -> None:
+        """Write a new segment and merge it into the in-memory series; the caller holds the series file lock."""
+        key = (symbol.upper(), interval)
+        current = self._load_unlocked(symbol, interval)
+        loaded_paths = tuple(self._segment_paths(symbol, interval))
+
+        path = os.path.join(self._series_dir(symbol, interval), self._segment_name(df))
+        self._write_atomic(path, lambda tmp_path: df[KLINE_COLUMNS].to_parquet(tmp_path, index=False))
+
+        merged = pd.concat([current, df[KLINE_COLUMNS]], ignore_index=True)
+        merged = merged.drop_duplicates('open_time', keep='last').sort_values('open_time').reset_index(drop=True)
+        paths = tuple(sorted(loaded_paths + (path,)))
+        self._cache(key, paths, merged)
+
+        if len(paths) > MAX_SEGMENTS:
+            self._compact(symbol, interval, merged, paths)
+
+    def _compact(self, symbol: str, interval: str, merged: pd.DataFrame, old_segments: Tuple[str, ...]) -> None:
+        """Rewrite all segments of a series as a single segment; the caller holds the series file lock."""
+        path = os.path.join(self._series_dir(symbol, interval), self._segment_name(merged))
+        self._write_atomic(path, lambda tmp_path: merged.to_parquet(tmp_path, index=False))
+        for old_path in old_segments:
+            os.remove(old_path)
+        self._cache((symbol.upper(), interval), (path,), merged)
+        logger.info(f"Compacted {len(old_segments)} kline segments for {symbol} {interval}")
+
+    def _read_meta_shared(self, symbol: str, interval: str) -> Dict[str, int]:
+        with self._file_lock(symbol, interval, exclusive=False):
+            return self._read_meta(symbol, interval)
+
+    def _store_fetched(
+        self,
+        symbol: str,
+        interval: str,
+        interval_ms: int,
+        range_start: int,
+        closed: pd.DataFrame,
+        meta: Dict[str, int]
+    ) -> Dict[str, int]:
+        """Append fetched closed candles and extend the stored coverage; returns the new meta. Blocking."""
+        with self._file_lock(symbol, interval):
+            if not closed.empty:
+                self._append(symbol, interval, closed.reset_index(drop=True))
+
+            # Another worker may have extended the series since meta was read
+            stored = self._read_meta(symbol, interval)
+            # Nothing exists before a fetched head range, so coverage extends to its start either way
+            covered_from = min(meta.get("covered_from", range_start), range_start, stored.get("covered_from", range_start))
+            covered_to = max(meta.get("covered_to", range_start - interval_ms), stored.get("covered_to", range_start - interval_ms))
+            if not closed.empty:
+                covered_to = max(covered_to, int(closed['open_time'].iloc[-1]))
+            meta = {"covered_from": covered_from, "covered_to": covered_to}
+            self._write_meta(symbol, interval, meta)
+            return meta
+
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: str,
+        interval_ms: int,
+        start_ms: int,
+        end_ms: int,
+        fetch_klines: KlineFetcher
+    ) -> pd.DataFrame:
+        """
+        Return candles with open time in [start_ms, end_ms], fetching only the missing head/tail.
+
+        Args:
+            symbol (str): Binance symbol, e.g. 'BTCUSDT'.
+            interval (str): Binance interval string (e.g. '1d', '1h', '15m').
+            interval_ms (int): Length of one candle in milliseconds.
+            start_ms (int): Requested start, in milliseconds.
+            end_ms (int): Requested end, in milliseconds.
+            fetch_klines: Coroutine function fetching raw klines for a (start_ms, end_ms) range.
+
+        Returns:
+            pd.DataFrame: Candles with the store columns, sorted by open time.
+        """
+        async with self._lock((symbol.upper(), interval)):
+            meta = await asyncio.to_thread(self._read_meta_shared, symbol, interval)
+            now_ms = int(time.time() * 1000)
+
+            missing_ranges = []
+            if not meta:
+                missing_ranges.append((start_ms, end_ms))
+            else:
+                if start_ms < meta["covered_from"]:
+                    missing_ranges.append((start_ms, meta["covered_from"] - 1))
+                if end_ms >= meta["covered_to"] + interval_ms:
+                    missing_ranges.append((meta["covered_to"] + interval_ms, end_ms))
+
+            forming = []
+            for range_start, range_end in missing_ranges:
+                logger.info(f"Fetching {symbol} {interval} klines from Binance for {range_start}-{range_end}")
+                fetched = klines_to_frame(await fetch_klines(range_start, range_end))
+
+                # Only closed candles are persisted; the forming candle is returned but refetched next time
+                closed = fetched[fetched['close_time'] < now_ms][KLINE_COLUMNS]
+                forming.append(fetched[fetched['close_time'] >= now_ms][KLINE_COLUMNS])
+                meta = await asyncio.to_thread(self._store_fetched, symbol, interval, interval_ms, range_start, closed, meta)
+
+            df = await asyncio.to_thread(self._load, symbol, interval)
+            df = df[(df['open_time'] >= start_ms) & (df['open_time'] <= end_ms)]
+            forming = [candles for candles in forming if not candles.empty]
+            if forming:
+                df = pd.concat([df] + forming, ignore_index=True)
+                df = df.drop_duplicates('open_time', keep='last').sort_values('open_time')
+                df = df[(df['open_time'] >= start_ms) & (df['open_time'] <= end_ms)]
+            return df.reset_index(drop=True)
+
+
+kline_store = KlineStore()
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Registry of lazily loaded subsystems so they can be warmed up by name
+LAZY_RESOURCES: Dict[str, "LazyResource"] = {}
+
+
+class LazyResource:
+    """
+    A heavy subsystem (model, index, SDK clients) built on first use.
+
+    ``factory`` is a blocking callable; it runs once in a worker thread so the
+    event loop keeps serving while TensorFlow or FAISS load, and concurrent
+    first callers share that one load. A failed load is retried by the next
+    caller. ``close`` releases a loaded value at shutdown.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], close: Optional[Callable[[Any], Awaitable[None]]] = None):
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self._value: Any = None
+        self._loaded = False
+        self._loading: Optional[asyncio.Future] = None
+        LAZY_RESOURCES[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def _load(self) -> Any:
+        start = time.perf_counter()
+        try:
+            value = await asyncio.to_thread(self.factory)
+        except Exception:
+            self._loading = None
+            raise
+        self._value = value
+        self._loaded = True
+        logger.info(f"Loaded {self.name} in {time.perf_counter() - start:.2f}s")
+        return value
+
+    async def get(self) -> Any:
+        if self._loaded:
+            return self._value
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+        return await asyncio.shield(self._loading)
+
+
+# Helper function to load the named subsystems ahead of their first request
+async def warm_up(names: Iterable[str]) -> None:
+    for name in names:
+        resource = LAZY_RESOURCES.get(name)
+        if resource is None:
+            logger.warning(f"Nothing to warm up for {name}; its router is not enabled")
+            continue
+        try:
+            await resource.get()
+        except Exception as e:
+            logger.error(f"Warm-up of {name} failed: {str(e)}")
+
+
+# Helper function to release every loaded subsystem that has a close hook (run at shutdown)
+async def close_loaded() -> None:
+    for resource in LAZY_RESOURCES.values():
+        if resource.loaded and resource.close is not None:
+            try:
+                await resource.close(resource._value)
+            except Exception as e:
+                logger.error(f"Closing {resource.name} failed: {str(e)}")
@@ -0,0 +1,262 @@
+import asyncio
+import itertools
+import logging
+import os
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import orjson
+import websockets
+
+from services.binance_client_pool import binance_client_pool
+from services.cache_utils import single_flight
+
+logger = logging.getLogger(__name__)
+
+COMBINED_STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+# Binance allows 1024 streams per connection; stay well below so one connection isn't a single point of failure
+MAX_STREAMS_PER_CONNECTION = int(os.getenv("MARKET_DATA_STREAMS_PER_CONNECTION", "200"))
+
+# Binance allows 5 control messages per second per connection
+CONTROL_MESSAGE_INTERVAL = 0.25
+
+# Rolling candles kept per kline stream and sent to a new subscriber
+MAX_CANDLES = int(os.getenv("MARKET_DATA_MAX_CANDLES", "500"))
+
+# Messages buffered per browser client; a slow client loses the oldest updates, not the connection
+CLIENT_QUEUE_SIZE = int(os.getenv("MARKET_DATA_CLIENT_QUEUE_SIZE", "256"))
+
+MAX_RECONNECT_DELAY = 30.0
+
+
+# Helper function to name the kline stream of a symbol and interval
+def kline_stream(symbol: str, interval: str) -> str:
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+# Helper function to name the 24h ticker stream of a symbol
+def ticker_stream(symbol: str) -> str:
+    return f"{symbol.lower()}@ticker"
+
+
+# Helper function to convert a REST kline row or a stream kline payload to the candle sent to clients
+def _candle(open_time: int, open_: str, high: str, low: str, close: str, volume: str, closed: bool) -> Dict[str, Any]:
+    return {
+        "timestamp": open_time,
+        "open": float(open_),
+        "high": float(high),
+        "low": float(low),
+        "close": float(close),
+        "volume": float(volume),
+        "closed": closed
+    }
+
+
+# Helper function to queue a message for a client, dropping its oldest message when it falls behind
+def offer(queue: "asyncio.Queue[str]", message: str) -> None:
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class UpstreamConnection:
+    """One combined-stream WebSocket to Binance whose subscriptions change at runtime."""
+
+    def __init__(self, hub: "MarketDataHub", url: str = COMBINED_STREAM_URL):
+        self.hub = hub
+        self.url = url
+        self.streams: Set[str] = set()
+        self._websocket = None
+        self._ids = itertools.count(1)
+        self._control_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _send_control(self, method: str, streams: List[str]) -> None:
+        if self._websocket is None or not streams:
+            return
+        async with self._control_lock:
+            await self._websocket.send(orjson.dumps({"method": method, "params": streams, "id": next(self._ids)}).decode())
+            await asyncio.sleep(CONTROL_MESSAGE_INTERVAL)
+
+    async def subscribe(self, stream: str) -> None:
+        self.streams.add(stream)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        else:
+            await self._send_control("SUBSCRIBE", [stream])
+
+    async def unsubscribe(self, stream: str) -> None:
+        self.streams.discard(stream)
+        await self._send_control("UNSUBSCRIBE", [stream])
+
+    async def _run(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.url) as websocket:
+                    self._websocket = websocket
+                    # Resubscribe everything after a (re)connect
+                    await self._send_control("SUBSCRIBE", sorted(self.streams))
+                    delay = 1.0
+                    async for raw in websocket:
+                        message = orjson.loads(raw)
+                        if "stream" in message:
+                            self.hub.dispatch(message["stream"], message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Market data connection dropped: {str(e)}; reconnecting in {delay:.0f}s")
+            finally:
+                self._websocket = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class MarketDataHub:
+    """
+    Shares Binance kline/ticker streams between any number of browser clients.
+
+    Each stream is subscribed upstream once, on the first client, and dropped
+    when the last client leaves; an upstream connection left without streams
+    is closed. Kline streams keep a rolling window of candles, seeded from
+    REST, which a new client receives as a snapshot before the incremental
+    updates. Each update is serialized once and queued to every subscriber.
+
+    Opening a stream (REST seed, SUBSCRIBE) is single-flight per stream, so
+    concurrent first clients of one stream share it and other streams are
+    not held up by it.
+    """
+
+    def __init__(self, max_candles: int = MAX_CANDLES, streams_per_connection: int = MAX_STREAMS_PER_CONNECTION):
+        self.max_candles = max_candles
+        self.streams_per_connection = streams_per_connection
+        self._subscribers: Dict[str, Set["asyncio.Queue[str]"]] = {}
+        self._candles: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._tickers: Dict[str, Dict[str, Any]] = {}
+        self._connections: List[UpstreamConnection] = []
+        self._stream_connections: Dict[str, UpstreamConnection] = {}
+        # stream -> the open in progress for it
+        self._opening: Dict[str, asyncio.Future] = {}
+
+    def _snapshot(self, stream: str) -> str:
+        if stream in self._candles:
+            return orjson.dumps({"type": "snapshot", "stream": stream, "candles": list(self._candles[stream])}).decode()
+        return orjson.dumps({"type": "snapshot", "stream": stream, "ticker": self._tickers.get(stream)}).decode()
+
+    async def _fetch_candles(self, symbol: str, interval: str) -> Deque[Dict[str, Any]]:
+        client = await binance_client_pool.get_public_client()
+        klines = await client.get_klines(symbol=symbol.upper(), interval=interval, limit=self.max_candles)
+        candles = deque(
+            (_candle(row[0], row[1], row[2], row[3], row[4], row[5], True) for row in klines),
+            maxlen=self.max_candles
+        )
+        if candles:
+            # The last REST candle is still open
+            candles[-1]["closed"] = False
+        return candles
+
+    def _connection_for_new_stream(self) -> UpstreamConnection:
+        for connection in self._connections:
+            if len(connection.streams) < self.streams_per_connection:
+                return connection
+        connection = UpstreamConnection(self)
+        self._connections.append(connection)
+        return connection
+
+    async def _open_stream(self, stream: str, symbol: str, interval: Optional[str]) -> None:
+        candles = await self._fetch_candles(symbol, interval) if interval else None
+        # Picking the connection and adding the stream to it happen without yielding
+        connection = self._connection_for_new_stream()
+        try:
+            await connection.subscribe(stream)
+        except BaseException:
+            connection.streams.discard(stream)
+            raise
+        self._stream_connections[stream] = connection
+        if candles is not None:
+            self._candles[stream] = candles
+        self._subscribers[stream] = set()
+
+    async def subscribe(self, queue: "asyncio.Queue[str]", symbol: str, interval: Optional[str] = None) -> str:
+        """Add a client queue to a kline stream (``interval`` given) or ticker stream; returns the stream name."""
+        stream = kline_stream(symbol, interval) if interval else ticker_stream(symbol)
+        # Loop in case the stream was closed again before this caller resumed
+        while stream not in self._subscribers:
+            await single_flight(self._opening, stream, lambda: self._open_stream(stream, symbol, interval))
+        # Snapshot and registration happen without yielding, so no update can overtake the snapshot
+        offer(queue, self._snapshot(stream))
+        self._subscribers[stream].add(queue)
+        return stream
+
+    async def unsubscribe(self, queue: "asyncio.Queue[str]", stream: str) -> None:
+        subscribers = self._subscribers.get(stream)
+        if subscribers is None or queue not in subscribers:
+            return
+        subscribers.discard(queue)
+        if subscribers:
+            return
+        # The stream's state is dropped before yielding, so a new subscriber opens it afresh
+        del self._subscribers[stream]
+        self._candles.pop(stream, None)
+        self._tickers.pop(stream, None)
+        connection = self._stream_connections.pop(stream)
+        if connection.streams == {stream}:
+            # Last stream on this connection: close it instead of keeping an idle socket
+            connection.streams.clear()
+            self._connections.remove(connection)
+            await connection.close()
+        else:
+            await connection.unsubscribe(stream)
+
+    def dispatch(self, stream: str, data: Dict[str, Any]) -> None:
+        """Apply one upstream event and fan it out to the stream's subscribers."""
+        subscribers = self._subscribers.get(stream)
+        if not subscribers:
+            return
+        if data.get("e") == "kline":
+            kline = data["k"]
+            candle = _candle(kline["t"], kline["o"], kline["h"], kline["l"], kline["c"], kline["v"], kline["x"])
+            candles = self._candles.setdefault(stream, deque(maxlen=self.max_candles))
+            if candles and candles[-1]["timestamp"] == candle["timestamp"]:
+                candles[-1] = candle
+            else:
+                candles.append(candle)
+            message = orjson.dumps({"type": "kline", "stream": stream, "candle": candle}).decode()
+        else:
+            ticker = {
+                "symbol": data["s"],
+                "last_price": float(data["c"]),
+                "price_change_percent": float(data["P"]),
+                "high": float(data["h"]),
+                "low": float(data["l"]),
+                "volume": float(data["v"]),
+                "quote_volume": float(data["q"]),
+                "event_time": data["E"]
+            }
+            self._tickers[stream] = ticker
+            message = orjson.dumps({"type": "ticker", "stream": stream, "ticker": ticker}).decode()
+        for queue in subscribers:
+            offer(queue, message)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "upstream_connections": len(self._connections),
+            "streams": len(self._subscribers),
+            "clients": sum(len(subscribers) for subscribers in self._subscribers.values())
+        }
+
+    async def close(self) -> None:
+        for connection in self._connections:
+            await connection.close()
+        self._connections.clear()
+        self._stream_connections.clear()
+        self._subscribers.clear()
+
+
+market_data_hub = MarketDataHub()
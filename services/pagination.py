@@ -0,0 +1,68 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+# Largest page a client may ask for
+MAX_PAGE_SIZE = 1000
+
+
+# Helper function to encode a keyset position as an opaque cursor token
+def encode_cursor(position: Dict[str, Any]) -> str:
+    payload = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+# Helper function to decode a cursor token back into the keyset position it was built from
+def decode_cursor(token: str, keys: Sequence[str]) -> Dict[str, Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or any(key not in position for key in keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+
+# Helper function to build the cursor that resumes after a stored record in (time, id) order
+def keyset_cursor(record: Dict[str, Any], time_field: str, id_field: str) -> str:
+    # Keep the stored datetime exactly; a millisecond round trip through float can shift it
+    return encode_cursor({time_field: record[time_field].isoformat(), id_field: record[id_field]})
+
+
+# Helper function to read the (time, id) position back out of a cursor built by keyset_cursor
+def keyset_position(token: str, time_field: str, id_field: str) -> Tuple[datetime, Any]:
+    position = decode_cursor(token, (time_field, id_field))
+    try:
+        return datetime.fromisoformat(position[time_field]), position[id_field]
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Helper function to validate the requested page size
+def check_page_size(page_size: int) -> None:
+    if page_size < 1 or page_size > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+
+
+# Helper function to page an in-memory list by keyset, for data that is stored as one small document
+def page_in_memory(
+    rows: List[Dict[str, Any]],
+    keys: Sequence[str],
+    page_size: int,
+    cursor: Optional[str]
+) -> Dict[str, Any]:
+    """Rows ordered by ``keys``; returns the page after ``cursor`` and the token of the next one."""
+    key: Callable[[Dict[str, Any]], tuple] = lambda row: tuple(row[field] for field in keys)
+    rows = sorted(rows, key=key)
+    if cursor:
+        position = decode_cursor(cursor, keys)
+        after = tuple(position[field] for field in keys)
+        rows = [row for row in rows if key(row) > after]
+    page = rows[:page_size]
+    next_cursor = encode_cursor({field: page[-1][field] for field in keys}) if len(rows) > page_size else None
+    return {"rows": page, "next_cursor": next_cursor}
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import HumanMessage
+from langchain_core.embeddings import Embeddings
+
+from services.cache_utils import CACHES, AsyncTTLCache, single_flight
+
+logger = logging.getLogger(__name__)
+
+# Query embeddings kept in memory; an embedding never changes, the TTL only bounds staleness after a model swap
+EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("RAG_EMBEDDING_CACHE_TTL", "86400"))
+
+# Answers reused for any question whose embedding is at least this cosine-similar to a cached one
+ANSWER_CACHE_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))
+
+# Documents retrieved per question
+RETRIEVAL_K = 4
+
+# Earlier messages of the conversation included in a streamed answer's prompt
+CHAT_HISTORY_MESSAGES = int(os.getenv("RAG_CHAT_HISTORY_MESSAGES", "6"))
+
+NO_RESULTS_ANSWER = "No relevant information found."
+
+
+# Helper function to normalize a question so trivially different spellings share a cache entry
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+# Helper function to build the prompt sent to the chat model, with earlier turns of the conversation when given
+def build_prompt(query: str, context: str, history: Optional[List[Dict[str, Any]]] = None) -> str:
+    if not history:
+        return f"""Use the following extracted document content to answer the question:
+
+        {context}
+
+        Question: {query}
+
+        Answer:"""
+    conversation = "\n".join(f"{message['role']}: {message['text']}" for message in history)
+    return f"""Use the following extracted document content to answer the question:
+
+        {context}
+
+        Conversation so far:
+        {conversation}
+
+        Question: {query}
+
+        Answer:"""
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that memoizes query embeddings.
+
+    Query embeddings go through an ``AsyncTTLCache`` keyed by the normalized
+    text, so a repeated question costs no embedding call and concurrent
+    identical questions share one. Document embeddings (index builds) pass
+    straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = EMBEDDING_CACHE_SIZE, ttl: float = EMBEDDING_CACHE_TTL):
+        self.embeddings = embeddings
+        self.cache = AsyncTTLCache("rag_query_embeddings", maxsize=maxsize, ttl=ttl)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        embedding = self.cache.get(key)
+        if embedding is None:
+            embedding = self.embeddings.embed_query(text)
+            self.cache.set(key, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.cache.get_or_load(normalize_query(text), lambda: self.embeddings.aembed_query(text))
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding rather than question text.
+
+    A lookup returns the answer of the most similar cached question when its
+    cosine similarity reaches ``threshold``. Entries expire after ``ttl``
+    seconds and the least recently used entry is evicted beyond ``maxsize``.
+    Vectors are stored unit-normalized in one matrix so a lookup is a single
+    matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        name: str = "rag_answers",
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        maxsize: int = ANSWER_CACHE_SIZE,
+        ttl: float = ANSWER_CACHE_TTL
+    ):
+        self.name = name
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, answer); the order is the LRU order
+        self._entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._keys: List[int] = []
+        self._vectors: Optional[np.ndarray] = None
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+        CACHES[name] = self
+
+    @staticmethod
+    def _unit(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, keys: List[int]) -> None:
+        if not keys:
+            return
+        drop = set(keys)
+        for key in keys:
+            self._entries.pop(key, None)
+        keep = [index for index, key in enumerate(self._keys) if key not in drop]
+        self._keys = [self._keys[index] for index in keep]
+        self._vectors = self._vectors[keep] if keep else None
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        self._remove([key for key, (expires_at, _) in self._entries.items() if expires_at <= now])
+
+    def lookup(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        self._expire()
+        if self._vectors is None:
+            self.misses += 1
+            return None
+        similarities = self._vectors @ self._unit(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        key = self._keys[best]
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key][1]
+
+    def store(self, embedding: List[float], answer: Dict[str, Any]) -> None:
+        self._expire()
+        if len(self._entries) >= self.maxsize:
+            self._remove(list(self._entries)[:len(self._entries) - self.maxsize + 1])
+        key = self._next_key
+        self._next_key += 1
+        self._entries[key] = (time.monotonic() + self.ttl, answer)
+        self._keys.append(key)
+        vector = self._unit(embedding)[np.newaxis, :]
+        self._vectors = vector if self._vectors is None else np.vstack([self._vectors, vector])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys = []
+        self._vectors = None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class RagPipeline:
+    """
+    Retrieval-augmented answering with two cache levels.
+
+    A question is embedded once through ``CachedEmbeddings``; the embedding
+    first probes the semantic answer cache and, on a miss, drives the vector
+    search directly so FAISS doesn't embed the text again. Any ``Embeddings``
+    implementation works, so the pipeline runs against a local fake model.
+    ``answer`` returns the whole answer; ``stream`` yields it token by token.
+    """
+
+    def __init__(self, embeddings: CachedEmbeddings, index: Any, chat: Any, answer_cache: Optional[SemanticAnswerCache] = None):
+        self.embeddings = embeddings
+        self.index = index
+        self.chat = chat
+        self.answer_cache = answer_cache or SemanticAnswerCache()
+        # Identical questions already being answered; later callers wait for the first one
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def _answer(self, query: str, embedding: List[float]) -> Dict[str, Any]:
+        relevant_docs = await self.index.asimilarity_search_by_vector(embedding, k=RETRIEVAL_K)
+        if not relevant_docs:
+            return {"answer": NO_RESULTS_ANSWER, "found": False}
+        context = "\n\n".join([doc.page_content for doc in relevant_docs])
+        response = await self.chat.ainvoke([HumanMessage(content=build_prompt(query, context))])
+        answer = {"answer": response.content, "found": True}
+        self.answer_cache.store(embedding, answer)
+        return answer
+
+    async def answer(self, query: str) -> Dict[str, Any]:
+        """Returns ``{"answer", "found", "cached"}``; ``found`` is False when no document matched."""
+        embedding = await self.embeddings.aembed_query(query)
+        cached = self.answer_cache.lookup(embedding)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        answer, shared = await single_flight(self._inflight, normalize_query(query), lambda: self._answer(query, embedding))
+        return {**answer, "cached": shared}
+
+    async def stream(
+        self,
+        query: str,
+        load_history: Callable[[int], Awaitable[List[Dict[str, Any]]]]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yields ``{"token": ...}`` events while the answer is generated, then
+        one ``{"done": True, "answer", "found", "cached"}`` event.
+
+        Retrieval and ``load_history`` (called with the number of earlier
+        messages wanted) run concurrently. Earlier turns go into the prompt,
+        so an answer is only read from or written to the answer cache when
+        the conversation has no history.
+        """
+        embedding = await self.embeddings.aembed_query(query)
+        relevant_docs, history = await asyncio.gather(
+            self.index.asimilarity_search_by_vector(embedding, k=RETRIEVAL_K),
+            load_history(CHAT_HISTORY_MESSAGES)
+        )
+        if not history:
+            cached = self.answer_cache.lookup(embedding)
+            if cached is not None:
+                yield {"token": cached["answer"]}
+                yield {"done": True, **cached, "cached": True}
+                return
+        if not relevant_docs:
+            yield {"token": NO_RESULTS_ANSWER}
+            yield {"done": True, "answer": NO_RESULTS_ANSWER, "found": False, "cached": False}
+            return
+
+        context = "\n\n".join([doc.page_content for doc in relevant_docs])
+        tokens = []
+        async for chunk in self.chat.astream([HumanMessage(content=build_prompt(query, context, history))]):
+            if chunk.content:
+                tokens.append(chunk.content)
+                yield {"token": chunk.content}
+        answer = {"answer": "".join(tokens), "found": True}
+        if not history:
+            self.answer_cache.store(embedding, answer)
+        yield {"done": True, **answer, "cached": False}
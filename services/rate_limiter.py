@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from binance.exceptions import BinanceAPIException
+
+from services.binance_client_pool import last_response_headers
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Binance request-weight budgets per IP per minute
+SPOT_WEIGHT_LIMIT = int(os.getenv("BINANCE_SPOT_WEIGHT_LIMIT", "6000"))
+FUTURES_WEIGHT_LIMIT = int(os.getenv("BINANCE_FUTURES_WEIGHT_LIMIT", "2400"))
+
+# Endpoint weights (GET /api/v3/myTrades without orderId, GET /fapi/v1/userTrades)
+SPOT_MY_TRADES_WEIGHT = 20
+FUTURES_USER_TRADES_WEIGHT = 5
+
+# Fraction of the budget we allow ourselves, leaving headroom for other callers on the same IP
+WEIGHT_SAFETY_FACTOR = 0.9
+
+# Number of per-symbol requests allowed in flight at once
+SYMBOL_FETCH_CONCURRENCY = int(os.getenv("BINANCE_SYMBOL_FETCH_CONCURRENCY", "10"))
+
+USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+MAX_RATE_LIMIT_RETRIES = 3
+
+
+class WeightRateLimiter:
+    """
+    Token bucket over Binance's per-minute request weight.
+
+    The bucket refills continuously at ``limit * safety / 60`` weight per
+    second. After every response the bucket is re-synced from the
+    ``X-MBX-USED-WEIGHT-1M`` header, so weight spent by other processes on the
+    same IP is accounted for. A 429/418 honours ``Retry-After``, empties the
+    bucket and halves the refill rate; the rate then recovers gradually while
+    requests succeed.
+    """
+
+    def __init__(self, name: str, weight_limit: int, safety: float = WEIGHT_SAFETY_FACTOR):
+        self.name = name
+        self.weight_limit = weight_limit
+        self.capacity = weight_limit * safety
+        self.tokens = self.capacity
+        self.rate_scale = 1.0
+        self.blocked_until = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / 60.0 * self.rate_scale
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.refill_rate)
+        self._updated_at = now
+
+    async def acquire(self, weight: int) -> None:
+        """Wait until ``weight`` can be spent without exceeding the budget."""
+        # One waiter at a time keeps the order fair and the bucket arithmetic simple
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.refill_rate)
+
+    def update_from_headers(self, headers: Optional[Any]) -> None:
+        """Sync the bucket with the weight Binance reports as already used this minute."""
+        if not headers:
+            return
+        used = headers.get(USED_WEIGHT_HEADER)
+        if used is None:
+            return
+        try:
+            remaining = self.capacity - int(used)
+        except ValueError:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+        if remaining > 0:
+            # Additive recovery after an earlier backoff
+            self.rate_scale = min(1.0, self.rate_scale + 0.05)
+
+    def back_off(self, retry_after: Optional[float]) -> None:
+        """Stop issuing requests after a 429/418 and slow the refill rate."""
+        delay = retry_after if retry_after is not None else 60.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        self.tokens = 0.0
+        self._updated_at = time.monotonic()
+        self.rate_scale = max(0.1, self.rate_scale / 2)
+        logger.warning(f"{self.name} rate limit hit; pausing {delay:.0f}s, refill rate now {self.rate_scale:.2f}x")
+
+    async def call(self, weight: int, request: Callable[..., Awaitable[T]], **params) -> T:
+        """
+        Run one Binance request under the limiter.
+
+        ``request`` is a method of a pooled client, which leaves the headers
+        of this request's own response in ``last_response_headers``.
+        """
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self.acquire(weight)
+            last_response_headers.set(None)
+            try:
+                result = await request(**params)
+            except BinanceAPIException as e:
+                headers = getattr(e.response, "headers", None)
+                self.update_from_headers(headers)
+                if e.status_code not in (418, 429) or attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                retry_after = headers.get("Retry-After") if headers else None
+                self.back_off(float(retry_after) if retry_after else None)
+                continue
+            self.update_from_headers(last_response_headers.get())
+            return result
+
+
+# Request weight is counted per IP, so every account shares the same limiters
+spot_weight_limiter = WeightRateLimiter("spot", SPOT_WEIGHT_LIMIT)
+futures_weight_limiter = WeightRateLimiter("futures", FUTURES_WEIGHT_LIMIT)
+
+
+async def gather_bounded(items: Iterable[Any], worker: Callable[[Any], Awaitable[T]], concurrency: int = SYMBOL_FETCH_CONCURRENCY) -> List[T]:
+    """Run ``worker`` over ``items`` with at most ``concurrency`` in flight; results keep input order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: Any) -> T:
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
@@ -0,0 +1,265 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from datetime import timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from binance.exceptions import BinanceAPIException
+
+from database.mongo_ops import *
+from services.binance_services import *
+from services.user_data_stream import user_data_streams
+
+logger = logging.getLogger(__name__)
+
+# Refresh cadence for accounts used within the active window, and for everyone else
+SNAPSHOT_ACTIVE_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_ACTIVE_REFRESH_SECONDS", "60"))
+SNAPSHOT_IDLE_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_IDLE_REFRESH_SECONDS", "900"))
+SNAPSHOT_ACTIVE_WINDOW_SECONDS = float(os.getenv("SNAPSHOT_ACTIVE_WINDOW_SECONDS", "1800"))
+
+# Each interval is stretched or shrunk by up to this fraction so refreshes don't line up
+SNAPSHOT_JITTER = float(os.getenv("SNAPSHOT_JITTER", "0.2"))
+
+# Accounts refreshed at once
+SNAPSHOT_CONCURRENCY = int(os.getenv("SNAPSHOT_CONCURRENCY", "4"))
+
+SPOT_BALANCES = "spot_balances"
+FUTURES_ACCOUNT_INFO = "futures_account_info"
+FUTURES_POSITIONS = "futures_positions"
+FUTURES_BALANCES = "futures_balances"
+
+SNAPSHOT_COLLECTIONS = {
+    SPOT_BALANCES: spot_data_collection,
+    FUTURES_ACCOUNT_INFO: futures_account_info_collection,
+    FUTURES_POSITIONS: futures_position_info_collection,
+    FUTURES_BALANCES: futures_account_balances_collection,
+}
+
+FUTURES_KINDS = (FUTURES_ACCOUNT_INFO, FUTURES_POSITIONS, FUTURES_BALANCES)
+
+# Binance error codes meaning the key may not use futures endpoints (futures not enabled or not permitted)
+FUTURES_REJECTED_CODES = {-2015, -2014, -1002}
+
+# Futures polling of an account that rejects it is retried after this long, doubling up to the maximum
+SNAPSHOT_FUTURES_RETRY_SECONDS = float(os.getenv("SNAPSHOT_FUTURES_RETRY_SECONDS", "900"))
+SNAPSHOT_FUTURES_MAX_RETRY_SECONDS = float(os.getenv("SNAPSHOT_FUTURES_MAX_RETRY_SECONDS", "86400"))
+
+AccountKey = Tuple[str, str, str]
+
+# account -> (monotonic time futures may be polled again, current backoff)
+_futures_backoff: Dict[AccountKey, Tuple[float, float]] = {}
+
+
+# Helper function to read an account's latest stored snapshot of one kind
+async def get_snapshot(kind: str, user_id: str, client_name: str, account_name: str) -> Optional[Dict[str, Any]]:
+    return await SNAPSHOT_COLLECTIONS[kind].find_one(
+        {"user_id": user_id, "client_name": client_name, "account_name": account_name},
+        {"_id": 0}
+    )
+
+
+# Helper function to express when a snapshot was taken, in epoch milliseconds
+def snapshot_as_of(document: Dict[str, Any]) -> int:
+    return int(document["timestamp"].replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+# Helper function to tell whether an account's futures polling is paused after a rejection
+def _futures_backed_off(key: AccountKey) -> bool:
+    backoff = _futures_backoff.get(key)
+    return backoff is not None and time.monotonic() < backoff[0]
+
+
+# Helper function to pause futures polling of an account whose key is rejected by futures endpoints
+def _back_off_futures(key: AccountKey) -> float:
+    previous = _futures_backoff.get(key)
+    delay = min(previous[1] * 2, SNAPSHOT_FUTURES_MAX_RETRY_SECONDS) if previous else SNAPSHOT_FUTURES_RETRY_SECONDS
+    _futures_backoff[key] = (time.monotonic() + delay, delay)
+    return delay
+
+
+# Core function to refresh every snapshot kind of one account from Binance
+async def refresh_account_snapshots(user_id: str, client_name: str, account_name: str, email: Optional[str]) -> None:
+    """
+    Refresh each snapshot kind independently, so one failing kind doesn't
+    keep the others stale. Accounts whose key is rejected by the futures
+    endpoints have futures polling paused with a growing backoff.
+    """
+    account = (await get_account_info(client_name, account_name))["data"]
+    api_key, secret_key = account["api_key"], account["secret_key"]
+    key = (user_id, client_name, account_name)
+
+    refreshes: List[Tuple[str, Callable[[], Awaitable[Any]]]] = []
+    # Snapshots kept live by a user data stream don't need polling
+    if not user_data_streams.is_live(key, SPOT_MARKET):
+        refreshes.append((SPOT_BALANCES, lambda: refresh_spot_balances(client_name, account_name, email, user_id, api_key, secret_key)))
+    refreshes.append((FUTURES_ACCOUNT_INFO, lambda: refresh_futures_account_info(client_name, account_name, email, user_id, api_key, secret_key)))
+    if not user_data_streams.is_live(key, FUTURES_MARKET):
+        refreshes.append((FUTURES_POSITIONS, lambda: refresh_futures_position_info(client_name, account_name, user_id, api_key, secret_key, email)))
+        refreshes.append((FUTURES_BALANCES, lambda: refresh_futures_account_balances(client_name, account_name, user_id, api_key, secret_key, email)))
+
+    for kind, refresh in refreshes:
+        futures = kind in FUTURES_KINDS
+        if futures and _futures_backed_off(key):
+            continue
+        try:
+            await refresh()
+        except BinanceAPIException as e:
+            if futures and e.code in FUTURES_REJECTED_CODES:
+                delay = _back_off_futures(key)
+                logger.info(f"Futures endpoints rejected for {client_name}/{account_name}, skipping futures for {delay:.0f}s: {str(e)}")
+            else:
+                logger.warning(f"{kind} refresh failed for {client_name}/{account_name}: {str(e)}")
+        except Exception as e:
+            logger.warning(f"{kind} refresh failed for {client_name}/{account_name}: {str(e)}")
+        else:
+            if futures:
+                _futures_backoff.pop(key, None)
+
+
+class SnapshotScheduler:
+    """
+    Keeps every registered account's snapshots fresh in the background.
+
+    Accounts are registered when their endpoints are used (and, at startup,
+    from the snapshots already stored). An account used within
+    ``active_window`` seconds is refreshed every ``active_interval`` seconds,
+    any other account every ``idle_interval`` seconds; each interval gets
+    random jitter. ``concurrency`` workers each take the next due account as
+    soon as they are free, so a slow account only holds up its own worker;
+    when several accounts are due at once the most recently active go first.
+    """
+
+    def __init__(
+        self,
+        active_interval: float = SNAPSHOT_ACTIVE_REFRESH_SECONDS,
+        idle_interval: float = SNAPSHOT_IDLE_REFRESH_SECONDS,
+        active_window: float = SNAPSHOT_ACTIVE_WINDOW_SECONDS,
+        jitter: float = SNAPSHOT_JITTER,
+        concurrency: int = SNAPSHOT_CONCURRENCY,
+        refresh: Callable[..., Awaitable[None]] = refresh_account_snapshots
+    ):
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.active_window = active_window
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.refresh = refresh
+        self._accounts: Dict[AccountKey, Dict[str, Any]] = {}
+        self._due: List[Tuple[float, int, AccountKey]] = []
+        self._scheduled: Dict[AccountKey, float] = {}
+        # Due accounts waiting for a free worker, and accounts being refreshed
+        self._ready: Set[AccountKey] = set()
+        self._running: Set[AccountKey] = set()
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _interval(self, account: Dict[str, Any]) -> float:
+        last_active = account["last_active"]
+        active = last_active is not None and time.monotonic() - last_active < self.active_window
+        interval = self.active_interval if active else self.idle_interval
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _schedule(self, key: AccountKey, due: float) -> None:
+        current = self._scheduled.get(key)
+        if current is not None and current <= due:
+            return
+        # A superseded heap entry is skipped when popped
+        self._scheduled[key] = due
+        heapq.heappush(self._due, (due, next(self._sequence), key))
+        self._wakeup.set()
+
+    def register(self, user_id: str, client_name: str, account_name: str, email: Optional[str] = None, active: bool = True) -> None:
+        """Track an account; ``active`` marks it as just used, moving it to the faster cadence."""
+        key = (user_id, client_name, account_name)
+        account = self._accounts.setdefault(key, {"email": email, "last_active": None})
+        account["email"] = email or account["email"]
+        if active:
+            account["last_active"] = time.monotonic()
+        self._schedule(key, time.monotonic() + self._interval(account))
+
+    async def _refresh_account(self, key: AccountKey) -> None:
+        account = self._accounts[key]
+        self._running.add(key)
+        try:
+            await self.refresh(*key, account["email"])
+        except Exception as e:
+            logger.warning(f"Snapshot refresh failed for {key[1]}/{key[2]}: {str(e)}")
+        finally:
+            self._running.discard(key)
+            self._schedule(key, time.monotonic() + self._interval(account))
+
+    async def _next_due(self) -> AccountKey:
+        """Wait for a due account and take it, most recently active first."""
+        while True:
+            now = time.monotonic()
+            while self._due and self._due[0][0] <= now:
+                due, _, key = heapq.heappop(self._due)
+                if self._scheduled.get(key) == due:
+                    del self._scheduled[key]
+                    # An account being refreshed is rescheduled when its refresh ends
+                    if key not in self._running:
+                        self._ready.add(key)
+            if self._ready:
+                key = max(self._ready, key=lambda key: self._accounts[key]["last_active"] or 0.0)
+                self._ready.discard(key)
+                return key
+            self._wakeup.clear()
+            timeout = self._due[0][0] - now if self._due else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self) -> None:
+        while True:
+            await self._refresh_account(await self._next_due())
+
+    async def _run(self) -> None:
+        await self.load_registered_accounts()
+        await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+
+    async def load_registered_accounts(self) -> None:
+        """Register every account that already has a stored snapshot, on the idle cadence."""
+        try:
+            for collection in SNAPSHOT_COLLECTIONS.values():
+                async for document in collection.find({}, {"_id": 0, "user_id": 1, "client_name": 1, "account_name": 1, "email": 1}):
+                    if document.get("user_id") and document.get("client_name") and document.get("account_name"):
+                        self.register(document["user_id"], document["client_name"], document["account_name"], document.get("email"), active=False)
+        except Exception as e:
+            logger.error(f"Failed to load accounts for snapshot refresh: {str(e)}")
+        logger.info(f"Snapshot scheduler tracking {len(self._accounts)} accounts")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+snapshot_scheduler = SnapshotScheduler()
+
+
+# Core function to serve an account's snapshot from storage, refreshing it from Binance only when asked or missing
+async def load_snapshot(
+    kind: str,
+    user_id: str,
+    client_name: str,
+    account_name: str,
+    email: Optional[str],
+    refresh: Callable[[], Awaitable[Dict[str, Any]]],
+    force_refresh: bool = False
+) -> Dict[str, Any]:
+    snapshot_scheduler.register(user_id, client_name, account_name, email)
+    user_data_streams.ensure_account(user_id, client_name, account_name, email)
+    document = None if force_refresh else await get_snapshot(kind, user_id, client_name, account_name)
+    if document is None:
+        document = await refresh()
+    return document
@@ -0,0 +1,65 @@
+import orjson
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from fastapi.responses import StreamingResponse
+
+# Response formats accepted by the list endpoints
+JSON_FORMAT = "json"
+NDJSON_FORMAT = "ndjson"
+JSON_STREAM_FORMAT = "json_stream"
+
+# Rows serialized per chunk written to the socket
+STREAM_CHUNK_ROWS = 500
+
+
+# Helper function to serialize one value
+def _dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=str)
+
+
+# Helper function to group encoded rows into chunks so each write carries a few hundred rows
+async def _chunks(rows: AsyncIterator[Dict[str, Any]], encode: Callable[[Dict[str, Any], bool], bytes]) -> AsyncIterator[bytes]:
+    buffer = []
+    first = True
+    async for row in rows:
+        buffer.append(encode(row, first))
+        first = False
+        if len(buffer) >= STREAM_CHUNK_ROWS:
+            yield b"".join(buffer)
+            buffer = []
+    if buffer:
+        yield b"".join(buffer)
+
+
+# Helper function to stream rows as newline-delimited JSON, one row per line
+async def ndjson_lines(rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    async for chunk in _chunks(rows, lambda row, first: orjson.dumps(row, default=str, option=orjson.OPT_APPEND_NEWLINE)):
+        yield chunk
+
+
+# Helper function to stream a response envelope whose ``rows_key`` list inside ``data`` is written row by row
+async def json_envelope(envelope: Dict[str, Any], rows_key: str, rows: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """
+    Yields the same document the buffered endpoint would return, i.e.
+    ``{..., "data": {..., rows_key: [row, row, ...]}}``, without holding the
+    list in memory.
+    """
+    head = {key: value for key, value in envelope.items() if key != "data"}
+    data = {key: value for key, value in envelope.get("data", {}).items() if key != rows_key}
+    yield _dumps(head)[:-1] + (b"," if head else b"") + b'"data":' + _dumps(data)[:-1] + (b"," if data else b"") + _dumps(rows_key) + b":["
+    async for chunk in _chunks(rows, lambda row, first: _dumps(row) if first else b"," + _dumps(row)):
+        yield chunk
+    yield b"]}}"
+
+
+# Helper function to encode one server-sent event
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    head = f"event: {event}\n".encode() if event else b""
+    return head + b"data: " + _dumps(data) + b"\n\n"
+
+
+# Core function to build the streaming response for a list endpoint
+def stream_rows(response_format: str, envelope: Dict[str, Any], rows_key: str, rows: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    if response_format == NDJSON_FORMAT:
+        return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson")
+    return StreamingResponse(json_envelope(envelope, rows_key, rows), media_type="application/json")
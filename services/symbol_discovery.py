@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from binance.async_client import AsyncClient
+from binance.exceptions import BinanceAPIException
+
+from database.mongo_ops import *
+from services.binance_client_pool import binance_client_pool
+from services.exchange_info import spot_exchange_info
+from services.rate_limiter import *
+
+logger = logging.getLogger(__name__)
+
+SPOT_MARKET = "spot"
+FUTURES_MARKET = "futures"
+
+# How long a discovered symbol set is trusted before the account is scanned again
+DISCOVERY_REFRESH_INTERVAL = timedelta(hours=6)
+
+# Probe every trading spot pair for past trades once per account, in the background (off by default:
+# ~20 weight per pair, so minutes of the shared request-weight budget)
+SPOT_HISTORY_SEED = os.getenv("BINANCE_SPOT_HISTORY_SEED", "0") == "1"
+
+# Running history seeds by account, so each account has at most one
+_history_seeds: Dict[Tuple[str, str, str], asyncio.Task] = {}
+
+# Income history only goes back about three months
+INCOME_LOOKBACK_MS = 90 * 24 * 60 * 60 * 1000
+INCOME_PAGE_LIMIT = 1000
+
+# Quote assets a held asset is most likely to have been traded against
+COMMON_QUOTE_ASSETS = {"USDT", "USDC", "FDUSD", "BTC", "ETH", "BNB"}
+
+# Endpoint weights (GET /api/v3/account, GET /fapi/v3/positionRisk, GET /fapi/v1/income)
+ACCOUNT_WEIGHT = 20
+POSITION_RISK_WEIGHT = 5
+INCOME_HISTORY_WEIGHT = 30
+
+
+# Helper function to build the Mongo filter for one account's symbol set
+def _traded_symbols_filter(user_id: str, client_name: str, account_name: str, market: str) -> Dict[str, Any]:
+    return {"user_id": user_id, "client_name": client_name, "account_name": account_name, "market": market}
+
+
+# Helper function to add symbols to an account's persisted set
+async def record_traded_symbols(
+    user_id: str,
+    client_name: str,
+    account_name: str,
+    market: str,
+    symbols: Iterable[str],
+    **fields
+) -> None:
+    symbols = sorted(set(symbols))
+    if not symbols and not fields:
+        return
+    update: Dict[str, Any] = {"$addToSet": {"symbols": {"$each": symbols}}}
+    if fields:
+        update["$set"] = fields
+    await traded_symbols_collection.update_one(
+        _traded_symbols_filter(user_id, client_name, account_name, market),
+        update,
+        upsert=True
+    )
+
+
+# Helper function to list spot pairs that could involve the assets an account holds
+async def _spot_symbols_from_balances(client: AsyncClient) -> Set[str]:
+    account_info = await spot_weight_limiter.call(ACCOUNT_WEIGHT, client.get_account)
+    held_assets = {
+        balance["asset"]
+        for balance in account_info["balances"]
+        if float(balance["free"]) > 0 or float(balance["locked"]) > 0
+    }
+    if not held_assets:
+        return set()
+
+    quote_assets = held_assets | COMMON_QUOTE_ASSETS
+    symbols = set()
+    for base_asset in held_assets:
+        for quote_asset in quote_assets:
+            symbols.update(await spot_exchange_info.list_symbols(base_asset=base_asset, quote_asset=quote_asset))
+    return symbols
+
+
+# Helper function to find every listed spot pair the account has ever traded (one-off, weight 20 per pair)
+async def _spot_symbols_from_trade_history(client: AsyncClient) -> Set[str]:
+    async def has_traded(symbol: str) -> bool:
+        try:
+            trades = await spot_weight_limiter.call(SPOT_MY_TRADES_WEIGHT, client.get_my_trades, symbol=symbol, limit=1)
+        except BinanceAPIException as e:
+            logger.warning(f"Failed to probe trade history for symbol {symbol}: {str(e)}")
+            return False
+        return bool(trades)
+
+    listed = await spot_exchange_info.list_symbols(status="TRADING")
+    traded = await gather_bounded(listed, has_traded)
+    return {symbol for symbol, found in zip(listed, traded) if found}
+
+
+# Background job recording the spot pairs found in an account's full trade history
+async def _seed_spot_history(api_key: str, secret_key: str, user_id: str, client_name: str, account_name: str) -> None:
+    logger.info(f"Seeding traded spot symbols from full trade history for {client_name}/{account_name}")
+    try:
+        # Its own client lease, held for the duration of this task
+        client = await binance_client_pool.get_client(api_key, secret_key)
+        symbols = await _spot_symbols_from_trade_history(client)
+        await record_traded_symbols(user_id, client_name, account_name, SPOT_MARKET, symbols, history_seeded_at=datetime.utcnow())
+        logger.info(f"Seeded {len(symbols)} traded spot symbols for {client_name}/{account_name}")
+    except Exception as e:
+        logger.warning(f"Spot history seed failed for {client_name}/{account_name}: {str(e)}")
+
+
+# Helper function to start the history seed of an account unless one is already running
+def _start_history_seed(client: AsyncClient, user_id: str, client_name: str, account_name: str) -> None:
+    key = (user_id, client_name, account_name)
+    if key in _history_seeds:
+        return
+    task = asyncio.create_task(_seed_spot_history(client.API_KEY, client.API_SECRET, user_id, client_name, account_name))
+    _history_seeds[key] = task
+    task.add_done_callback(lambda _: _history_seeds.pop(key, None))
+
+
+# Helper function to collect futures symbols from open positions and income history
+async def _futures_symbols_from_account(client: AsyncClient, income_synced_to: Optional[int]) -> Dict[str, Any]:
+    symbols: Set[str] = set()
+
+    positions = await futures_weight_limiter.call(POSITION_RISK_WEIGHT, client.futures_position_information)
+    symbols.update(position["symbol"] for position in positions if float(position["positionAmt"]) != 0)
+
+    # Realized PnL, commissions and funding fees name every symbol traded in the lookback window
+    now_ms = int(time.time() * 1000)
+    cursor = max(income_synced_to or 0, now_ms - INCOME_LOOKBACK_MS)
+    while True:
+        income = await futures_weight_limiter.call(
+            INCOME_HISTORY_WEIGHT,
+            client.futures_income_history,
+            startTime=cursor,
+            endTime=now_ms,
+            limit=INCOME_PAGE_LIMIT
+        )
+        symbols.update(entry["symbol"] for entry in income if entry.get("symbol"))
+        if len(income) < INCOME_PAGE_LIMIT:
+            break
+        cursor = income[-1]["time"] + 1
+
+    return {"symbols": symbols, "income_synced_to": now_ms}
+
+
+# Core function to get the symbols an account has actually traded
+async def get_traded_symbols(
+    client: AsyncClient,
+    user_id: str,
+    client_name: str,
+    account_name: str,
+    market: str
+) -> List[str]:
+    """
+    Return the persisted traded-symbol set for an account, rescanning the
+    account when the set is missing or older than ``DISCOVERY_REFRESH_INTERVAL``.
+
+    Spot candidates come from held balances (paired with held or common quote
+    assets); futures candidates come from open positions and income history.
+    Symbols of previously stored trades are always included, and the sync
+    functions add the symbols of new trades via ``record_traded_symbols``.
+
+    Binance has no endpoint listing the pairs a spot account has traded, so
+    balances alone miss pairs whose assets were sold off; such old trades are
+    only found if they were stored before. With ``BINANCE_SPOT_HISTORY_SEED=1``
+    the first spot discovery also starts a background job probing every
+    trading pair's history once (about ``20 * len(pairs)`` weight, spread out
+    by the rate limiter); the pairs it finds are synced by the next trade-list
+    call. Pairs no longer trading are not probed.
+    """
+    document = await traded_symbols_collection.find_one(_traded_symbols_filter(user_id, client_name, account_name, market))
+    if document and document.get("discovered_at") and datetime.utcnow() - document["discovered_at"] < DISCOVERY_REFRESH_INTERVAL:
+        return sorted(document.get("symbols", []))
+
+    logger.info(f"Discovering traded {market} symbols for {client_name}/{account_name}")
+    fields: Dict[str, Any] = {"discovered_at": datetime.utcnow()}
+    if market == SPOT_MARKET:
+        discovered = await _spot_symbols_from_balances(client)
+        if SPOT_HISTORY_SEED and not (document and document.get("history_seeded_at")):
+            _start_history_seed(client, user_id, client_name, account_name)
+        discovered.update(await spot_trade_records_collection.distinct(
+            "symbol",
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name}
+        ))
+    else:
+        futures_scan = await _futures_symbols_from_account(client, document.get("income_synced_to") if document else None)
+        discovered = futures_scan["symbols"]
+        fields["income_synced_to"] = futures_scan["income_synced_to"]
+        discovered.update(await futures_trade_records_collection.distinct(
+            "symbol",
+            {"user_id": user_id, "client_name": client_name, "account_name": account_name}
+        ))
+
+    await record_traded_symbols(user_id, client_name, account_name, market, discovered, **fields)
+    known = set(document.get("symbols", [])) if document else set()
+    symbols = sorted(known | discovered)
+    logger.info(f"{len(symbols)} traded {market} symbols for {client_name}/{account_name}")
+    return symbols
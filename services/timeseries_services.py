@@ -1,11 +1,35 @@
 from fastapi import HTTPException
 import pandas as pd
-from binance.client import Client
 from binance.exceptions import BinanceAPIException
+from binance.helpers import date_to_milliseconds
 import numpy as np
+import time
+from typing import Dict, List
 from database.mongo_ops import *
+from services import indicators
+from services.kline_store import kline_store
+from services.binance_client_pool import binance_client_pool
 from datetime import datetime, timedelta
 
+# Mapping of Binance intervals to timedelta units
+INTERVAL_MAP = {
+    '1m': timedelta(minutes=1),
+    '3m': timedelta(minutes=3),
+    '5m': timedelta(minutes=5),
+    '15m': timedelta(minutes=15),
+    '30m': timedelta(minutes=30),
+    '1h': timedelta(hours=1),
+    '2h': timedelta(hours=2),
+    '4h': timedelta(hours=4),
+    '6h': timedelta(hours=6),
+    '8h': timedelta(hours=8),
+    '12h': timedelta(hours=12),
+    '1d': timedelta(days=1),
+    '3d': timedelta(days=3),
+    '1w': timedelta(weeks=1),
+    '1M': timedelta(days=30)  # Approximate
+}
+
 
 async def fetch_ohlcv(email: str, symbol: str, interval: str, start_str: str, end_str: str) -> pd.DataFrame:
     try:
@@ -13,15 +37,26 @@ async def fetch_ohlcv(email: str, symbol: str, interval: str, start_str: str, en
         account_response = await get_account_info_by_email(email)
         api_key = account_response["data"]["api_key"]
         secret_key = account_response["data"]["secret_key"]
-        client = Client(api_key=api_key, api_secret=secret_key)
-        klines = client.get_historical_klines(symbol, interval, start_str, end_str)
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_asset_volume', 'number_of_trades',
-            'taker_buy_base_volume', 'taker_buy_quote_volume', 'ignore'
-        ])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df[['open', 'high', 'low', 'close', 'volume']] = df[['open', 'high', 'low', 'close', 'volume']].astype(float)
+        client = await binance_client_pool.get_client(api_key, secret_key)
+
+        if interval not in INTERVAL_MAP:
+            raise HTTPException(status_code=400, detail=f"Unsupported interval: {interval}")
+
+        async def fetch_klines(range_start: int, range_end: int) -> list:
+            return await client.get_historical_klines(symbol, interval, range_start, range_end)
+
+        # Serve from the local candle store and only download the missing head/tail
+        start_ms = date_to_milliseconds(start_str)
+        end_ms = date_to_milliseconds(end_str) if end_str else int(time.time() * 1000)
+        df = await kline_store.get_klines(
+            symbol=symbol,
+            interval=interval,
+            interval_ms=int(INTERVAL_MAP[interval].total_seconds() * 1000),
+            start_ms=start_ms,
+            end_ms=end_ms,
+            fetch_klines=fetch_klines
+        )
+        df['timestamp'] = pd.to_datetime(df['open_time'], unit='ms')
         return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
     except BinanceAPIException as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -43,29 +78,111 @@ def adjust_start_date(start_date: str, interval: str, window: int = 20) -> str:
     # Parse the start date
     start_dt = datetime.strptime(start_date, "%Y-%m-%d")
     
-    # Mapping of intervals to timedelta units
-    interval_map = {
-        '1m': timedelta(minutes=1),
-        '3m': timedelta(minutes=3),
-        '5m': timedelta(minutes=5),
-        '15m': timedelta(minutes=15),
-        '30m': timedelta(minutes=30),
-        '1h': timedelta(hours=1),
-        '2h': timedelta(hours=2),
-        '4h': timedelta(hours=4),
-        '6h': timedelta(hours=6),
-        '8h': timedelta(hours=8),
-        '12h': timedelta(hours=12),
-        '1d': timedelta(days=1),
-        '3d': timedelta(days=3),
-        '1w': timedelta(weeks=1),
-        '1M': timedelta(days=30)  # Approximate
-    }
-
-    if interval not in interval_map:
+    if interval not in INTERVAL_MAP:
         raise ValueError(f"Unsupported interval: {interval}")
 
-    adjustment = interval_map[interval] * (window - 1)
+    adjustment = INTERVAL_MAP[interval] * (window - 1)
     adjusted_dt = start_dt - adjustment
 
     return adjusted_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# Helper function to select the rows from the user-requested start date onwards
+def requested_rows(df: pd.DataFrame, start_date: str) -> np.ndarray:
+    original_start_datetime = datetime.strptime(start_date, "%Y-%m-%d")
+    return (df['timestamp'] >= original_start_datetime).to_numpy()
+
+
+# Helper function to format the timestamps of the selected rows
+def format_timestamps(df: pd.DataFrame, mask: np.ndarray) -> List[str]:
+    return df['timestamp'][mask].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
+
+
+# Intervals for which VWAP is anchored to the start of each day
+INTRADAY_INTERVALS = ["1m", "3m", "5m", "15m", "30m", "1h", "2h", "4h"]
+
+
+# Helper function to calculate SMA, EMA and Bollinger Bands
+def compute_trend(df: pd.DataFrame, interval: str, window: int = 20, num_std: float = 2) -> Dict[str, np.ndarray]:
+    return indicators.bollinger(indicators.as_array(df['close']), window=window, num_std=num_std)
+
+
+# Helper function to calculate RSI
+def compute_rsi(df: pd.DataFrame, interval: str, period: int = 14) -> Dict[str, np.ndarray]:
+    rsi = indicators.rsi(indicators.as_array(df['close']), period=period)
+    return {"rsi": indicators.fill_nan(rsi, 50)}  # Default to neutral RSI if NaN
+
+
+# Helper function to calculate MACD
+def compute_macd(df: pd.DataFrame, interval: str, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    macd = indicators.macd(indicators.as_array(df['close']), fast=fast, slow=slow, signal=signal)
+    return {name: indicators.fill_nan(values, 0) for name, values in macd.items()}
+
+
+# Helper function to calculate the Stochastic Oscillator (%K and %D)
+def compute_stochastic(df: pd.DataFrame, interval: str, k_period: int = 14, d_period: int = 3) -> Dict[str, np.ndarray]:
+    stochastic = indicators.stochastic(
+        indicators.as_array(df['high']),
+        indicators.as_array(df['low']),
+        indicators.as_array(df['close']),
+        k_period=k_period,
+        d_period=d_period
+    )
+    return {name: indicators.fill_nan(values, 50) for name, values in stochastic.items()}
+
+
+# Helper function to calculate VWAP
+def compute_vwap(df: pd.DataFrame, interval: str) -> Dict[str, np.ndarray]:
+    close = indicators.as_array(df['close'])
+    # For intraday intervals, reset VWAP daily
+    open_time_ms = df['timestamp'].to_numpy(dtype='datetime64[ms]').astype(np.int64) if interval in INTRADAY_INTERVALS else None
+    vwap = indicators.vwap(
+        indicators.as_array(df['high']),
+        indicators.as_array(df['low']),
+        close,
+        indicators.as_array(df['volume']),
+        open_time_ms=open_time_ms
+    )
+    return {"vwap": indicators.fill_nan(vwap, close)}  # Use close price if VWAP is NaN
+
+
+# Registry of indicators: calculator and the warm-up periods it needs for given params
+INDICATORS = {
+    "trend": {
+        "compute": compute_trend,
+        "warmup": lambda params: int(params.get("window", 20))
+    },
+    "rsi": {
+        "compute": compute_rsi,
+        "warmup": lambda params: int(params.get("period", 14)) + 1
+    },
+    "macd": {
+        "compute": compute_macd,
+        "warmup": lambda params: int(params.get("slow", 26)) + int(params.get("signal", 9))
+    },
+    "stochastic": {
+        "compute": compute_stochastic,
+        "warmup": lambda params: int(params.get("k_period", 14)) + int(params.get("d_period", 3))
+    },
+    "vwap": {
+        "compute": compute_vwap,
+        "warmup": lambda params: 20  # Same anchor as the single VWAP endpoint
+    }
+}
+
+
+def indicator_warmup(name: str, params: Dict[str, float]) -> int:
+    """Number of periods the indicator needs before the requested start date."""
+    if name not in INDICATORS:
+        raise HTTPException(status_code=400, detail=f"Unsupported indicator: {name}")
+    return INDICATORS[name]["warmup"](params)
+
+
+def compute_indicator(df: pd.DataFrame, name: str, interval: str, params: Dict[str, float]) -> Dict[str, np.ndarray]:
+    """Run a registered indicator on an OHLCV frame and return its output series."""
+    if name not in INDICATORS:
+        raise HTTPException(status_code=400, detail=f"Unsupported indicator: {name}")
+    try:
+        return INDICATORS[name]["compute"](df, interval, **params)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parameters for {name}: {str(e)}")
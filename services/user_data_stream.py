@@ -0,0 +1,437 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import websockets
+from pymongo import ReplaceOne
+
+from database.mongo_ops import *
+from services.binance_client_pool import binance_client_pool
+from services.binance_services import *
+from services.symbol_discovery import SPOT_MARKET, FUTURES_MARKET, record_traded_symbols
+
+logger = logging.getLogger(__name__)
+
+# Off unless enabled: every streamed account holds two WebSocket connections
+USER_DATA_STREAMS_ENABLED = os.getenv("USER_DATA_STREAMS") == "1"
+
+SPOT_STREAM_URL = "wss://stream.binance.com:9443/ws/"
+FUTURES_STREAM_URL = "wss://fstream.binance.com/ws/"
+
+# listenKeys expire after 60 minutes without a keepalive
+LISTEN_KEY_KEEPALIVE_SECONDS = 30 * 60
+
+# How often in-memory state is written back to MongoDB
+USER_STREAM_FLUSH_SECONDS = float(os.getenv("USER_STREAM_FLUSH_SECONDS", "2"))
+
+# Full REST resync while connected; catches anything the deltas don't carry (mark price, available balance)
+USER_STREAM_RESYNC_SECONDS = float(os.getenv("USER_STREAM_RESYNC_SECONDS", "1800"))
+
+# Streams of accounts nobody has asked about for this long are closed
+USER_STREAM_IDLE_SECONDS = float(os.getenv("USER_STREAM_IDLE_SECONDS", "3600"))
+
+USER_STREAM_MAX_RECONNECT_DELAY = 60.0
+
+# When set, every received frame is appended to <dir>/<client>_<account>_<market>.ndjson for replay
+USER_STREAM_RECORD_DIR = os.getenv("USER_STREAM_RECORD_DIR")
+
+AccountKey = Tuple[str, str, str]
+
+# Fields a position first seen on the stream gets until the next REST resync fills them in
+POSITION_DEFAULTS = {
+    "positionAmt": 0.0, "entryPrice": 0.0, "breakEvenPrice": 0.0, "markPrice": 0.0, "unRealizedProfit": 0.0,
+    "liquidationPrice": 0.0, "isolatedMargin": 0.0, "notional": 0.0, "marginAsset": "", "isolatedWallet": 0.0,
+    "initialMargin": 0.0, "maintMargin": 0.0, "positionInitialMargin": 0.0, "openOrderInitialMargin": 0.0,
+    "adl": 0.0, "bidNotional": 0.0, "askNotional": 0.0
+}
+
+# Fields a futures balance first seen on the stream gets until the next REST resync fills them in
+FUTURES_BALANCE_DEFAULTS = {
+    "accountAlias": "", "balance": 0.0, "crossWalletBalance": 0.0, "crossUnPnl": 0.0,
+    "availableBalance": 0.0, "maxWithdrawAmount": 0.0, "marginAvailable": True
+}
+
+
+# Helper function to convert an event timestamp in milliseconds to the stored datetime
+def _event_time(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000)
+
+
+class AccountState:
+    """
+    In-memory copy of one account's spot balances, futures balances and
+    futures positions, seeded from REST and kept current by user-data-stream
+    deltas. ``dirty`` names the snapshots changed since the last flush;
+    ``spot_trades`` / ``futures_trades`` hold fills waiting to be stored.
+    """
+
+    def __init__(self, user_id: str, client_name: str, account_name: str, email: Optional[str] = None):
+        self.account = {"user_id": user_id, "client_name": client_name, "account_name": account_name, "email": email}
+        self.spot_balances: Dict[str, Dict[str, Any]] = {}
+        self.futures_balances: Dict[str, Dict[str, Any]] = {}
+        self.positions: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.spot_trades: List[Dict[str, Any]] = []
+        self.futures_trades: List[Dict[str, Any]] = []
+        self.dirty: Set[str] = set()
+        self.live: Set[str] = set()
+        self.last_active = time.monotonic()
+        # Events older than the REST snapshot a market was seeded from are already reflected in it
+        self._seeded_at: Dict[str, int] = {}
+
+    @property
+    def key(self) -> AccountKey:
+        return self.account["user_id"], self.account["client_name"], self.account["account_name"]
+
+    @property
+    def pending(self) -> bool:
+        """Whether anything is waiting to be flushed."""
+        return bool(self.dirty or self.spot_trades or self.futures_trades)
+
+    def seed_spot(self, balances_document: Dict[str, Any], as_of_ms: int) -> None:
+        self.spot_balances = {balance["asset"]: dict(balance) for balance in balances_document["balances"]}
+        self._seeded_at[SPOT_MARKET] = as_of_ms
+        self.dirty.discard("spot_balances")
+
+    def seed_futures(self, balances_document: Dict[str, Any], positions_document: Dict[str, Any], as_of_ms: int) -> None:
+        self.futures_balances = {balance["asset"]: dict(balance) for balance in balances_document["balances"]}
+        self.positions = {(position["symbol"], position["positionSide"]): dict(position) for position in positions_document["positions"]}
+        self._seeded_at[FUTURES_MARKET] = as_of_ms
+        self.dirty -= {"futures_balances", "futures_positions"}
+
+    def apply(self, market: str, event: Dict[str, Any]) -> None:
+        """Apply one stream event; events already covered by the seeding snapshot are ignored."""
+        if event.get("E", 0) < self._seeded_at.get(market, 0):
+            return
+        event_type = event.get("e")
+        if event_type == "outboundAccountPosition":
+            self._apply_outbound_account_position(event)
+        elif event_type == "executionReport":
+            self._apply_execution_report(event)
+        elif event_type == "ACCOUNT_UPDATE":
+            self._apply_account_update(event)
+        elif event_type == "ORDER_TRADE_UPDATE":
+            self._apply_order_trade_update(event)
+
+    def _apply_outbound_account_position(self, event: Dict[str, Any]) -> None:
+        for balance in event["B"]:
+            free, locked = float(balance["f"]), float(balance["l"])
+            # Spot snapshots only keep non-zero balances
+            if free > 0 or locked > 0:
+                self.spot_balances[balance["a"]] = {"asset": balance["a"], "free": free, "locked": locked}
+            else:
+                self.spot_balances.pop(balance["a"], None)
+        self.dirty.add("spot_balances")
+
+    def _apply_execution_report(self, event: Dict[str, Any]) -> None:
+        if event["x"] != "TRADE":
+            return
+        self.spot_trades.append({
+            **self.account,
+            "symbol": event["s"],
+            "id": event["t"],
+            "orderId": event["i"],
+            "orderListId": event["g"],
+            "price": float(event["L"]),
+            "qty": float(event["l"]),
+            "quoteQty": float(event["Y"]),
+            "commission": float(event["n"]),
+            "commissionAsset": event["N"],
+            "time": _event_time(event["T"]),
+            "isBuyer": event["S"] == "BUY",
+            "isMaker": event["m"]
+        })
+
+    def _apply_account_update(self, event: Dict[str, Any]) -> None:
+        update_time = _event_time(event["T"])
+        for balance in event["a"].get("B", []):
+            entry = self.futures_balances.setdefault(balance["a"], {"asset": balance["a"], **FUTURES_BALANCE_DEFAULTS})
+            entry["balance"] = float(balance["wb"])
+            entry["crossWalletBalance"] = float(balance["cw"])
+            entry["updateTime"] = update_time
+            self.dirty.add("futures_balances")
+        for position in event["a"].get("P", []):
+            key = (position["s"], position["ps"])
+            entry = self.positions.setdefault(key, {"symbol": position["s"], "positionSide": position["ps"], **POSITION_DEFAULTS})
+            entry["positionAmt"] = float(position["pa"])
+            entry["entryPrice"] = float(position["ep"])
+            entry["breakEvenPrice"] = float(position.get("bep", entry["breakEvenPrice"]))
+            entry["unRealizedProfit"] = float(position["up"])
+            entry["isolatedWallet"] = float(position["iw"])
+            entry["updateTime"] = update_time
+            self.dirty.add("futures_positions")
+
+    def _apply_order_trade_update(self, event: Dict[str, Any]) -> None:
+        order = event["o"]
+        if order["x"] != "TRADE":
+            return
+        price, qty = float(order["L"]), float(order["l"])
+        self.futures_trades.append({
+            **self.account,
+            "symbol": order["s"],
+            "id": order["t"],
+            "orderId": order["i"],
+            "side": order["S"],
+            "price": price,
+            "qty": qty,
+            "realizedPnl": float(order["rp"]),
+            "quoteQty": price * qty,
+            "commission": float(order.get("n", 0)),
+            "commissionAsset": order.get("N"),
+            "time": _event_time(order["T"]),
+            "positionSide": order["ps"],
+            "buyer": order["S"] == "BUY",
+            "maker": order["m"]
+        })
+
+    def snapshot_document(self, kind: str) -> Dict[str, Any]:
+        """The stored snapshot document of ``kind``, in the same shape the REST refresh writes."""
+        if kind == "spot_balances":
+            content = {"balances": list(self.spot_balances.values())}
+        elif kind == "futures_balances":
+            content = {"balances": list(self.futures_balances.values())}
+        else:
+            content = {"positions": list(self.positions.values())}
+        return {**self.account, **content, "timestamp": datetime.utcnow(), "document_id": str(uuid.uuid4())}
+
+
+class FrameRecorder:
+    """Appends raw stream frames to an NDJSON file so a session can be replayed later."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def record(self, market: str, frame: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps({"market": market, "received_at": int(time.time() * 1000), "frame": frame}) + "\n")
+
+
+# Helper function to read recorded frames back as (market, event) pairs
+def read_recorded_frames(path: str) -> Iterable[Tuple[str, Dict[str, Any]]]:
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                entry = json.loads(line)
+                yield entry["market"], json.loads(entry["frame"])
+
+
+# Core function to replay a recorded session into an account state, e.g. one seeded from stored snapshots in a test
+def replay_frames(path: str, state: AccountState) -> AccountState:
+    for market, event in read_recorded_frames(path):
+        state.apply(market, event)
+    return state
+
+
+# Collections each snapshot kind is flushed to
+STREAM_SNAPSHOT_COLLECTIONS = {
+    "spot_balances": spot_data_collection,
+    "futures_balances": futures_account_balances_collection,
+    "futures_positions": futures_position_info_collection,
+}
+
+
+class UserDataStreamManager:
+    """
+    One spot and one futures user-data stream per tracked account.
+
+    Each consumer creates a listenKey, connects, seeds the account state from
+    REST, then applies deltas until the socket drops or the key expires, and
+    reconnects with backoff. The key is kept alive every 30 minutes and the
+    state is resynced from REST every ``USER_STREAM_RESYNC_SECONDS``. Dirty
+    snapshots and new fills are flushed in batches every
+    ``USER_STREAM_FLUSH_SECONDS``.
+    """
+
+    def __init__(self, enabled: bool = USER_DATA_STREAMS_ENABLED, flush_interval: float = USER_STREAM_FLUSH_SECONDS, record_dir: Optional[str] = USER_STREAM_RECORD_DIR):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.record_dir = record_dir
+        self._states: Dict[AccountKey, AccountState] = {}
+        self._consumers: Dict[AccountKey, List[asyncio.Task]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def is_live(self, key: AccountKey, market: str) -> bool:
+        state = self._states.get(key)
+        return state is not None and market in state.live
+
+    def ensure_account(self, user_id: str, client_name: str, account_name: str, email: Optional[str] = None) -> None:
+        """Start streaming an account if it isn't already, and mark it as in use."""
+        if not self.enabled or self._flush_task is None:
+            return
+        key = (user_id, client_name, account_name)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = AccountState(user_id, client_name, account_name, email)
+            self._consumers[key] = [
+                asyncio.create_task(self._consume(state, SPOT_MARKET)),
+                asyncio.create_task(self._consume(state, FUTURES_MARKET)),
+            ]
+            logger.info(f"Started user data streams for {client_name}/{account_name}")
+        state.last_active = time.monotonic()
+
+    async def _seed(self, state: AccountState, market: str, api_key: str, secret_key: str) -> None:
+        user_id, client_name, account_name = state.key
+        email = state.account["email"]
+        as_of_ms = int(time.time() * 1000)
+        if market == SPOT_MARKET:
+            state.seed_spot(await refresh_spot_balances(client_name, account_name, email, user_id, api_key, secret_key), as_of_ms)
+        else:
+            balances = await refresh_futures_account_balances(client_name, account_name, user_id, api_key, secret_key, email)
+            positions = await refresh_futures_position_info(client_name, account_name, user_id, api_key, secret_key, email)
+            state.seed_futures(balances, positions, as_of_ms)
+
+    async def _consume(self, state: AccountState, market: str) -> None:
+        _, client_name, account_name = state.key
+        recorder = None
+        if self.record_dir:
+            recorder = FrameRecorder(os.path.join(self.record_dir, f"{client_name}_{account_name}_{market}.ndjson"))
+        delay = 1.0
+        while True:
+            try:
+                account = (await get_account_info(client_name, account_name))["data"]
+                client = await binance_client_pool.get_client(account["api_key"], account["secret_key"])
+                if market == SPOT_MARKET:
+                    listen_key = await client.stream_get_listen_key()
+                    url, keepalive = SPOT_STREAM_URL + listen_key, client.stream_keepalive
+                else:
+                    listen_key = await client.futures_stream_get_listen_key()
+                    url, keepalive = FUTURES_STREAM_URL + listen_key, client.futures_stream_keepalive
+
+                async with websockets.connect(url) as websocket:
+                    # Connect before seeding so no delta between the snapshot and the stream is lost
+                    await self._seed(state, market, account["api_key"], account["secret_key"])
+                    state.live.add(market)
+                    delay = 1.0
+                    next_keepalive = time.monotonic() + LISTEN_KEY_KEEPALIVE_SECONDS
+                    next_resync = time.monotonic() + USER_STREAM_RESYNC_SECONDS
+                    while True:
+                        timeout = max(0.0, min(next_keepalive, next_resync) - time.monotonic())
+                        try:
+                            frame = await asyncio.wait_for(websocket.recv(), timeout)
+                        except asyncio.TimeoutError:
+                            if time.monotonic() >= next_keepalive:
+                                await keepalive(listenKey=listen_key)
+                                next_keepalive = time.monotonic() + LISTEN_KEY_KEEPALIVE_SECONDS
+                            if time.monotonic() >= next_resync:
+                                await self._seed(state, market, account["api_key"], account["secret_key"])
+                                next_resync = time.monotonic() + USER_STREAM_RESYNC_SECONDS
+                            continue
+                        if recorder:
+                            recorder.record(market, frame)
+                        event = json.loads(frame)
+                        if event.get("e") == "listenKeyExpired":
+                            logger.info(f"{market} listenKey expired for {client_name}/{account_name}; reconnecting")
+                            break
+                        state.apply(market, event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"{market} user data stream for {client_name}/{account_name} failed: {str(e)}; retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, USER_STREAM_MAX_RECONNECT_DELAY)
+            finally:
+                state.live.discard(market)
+
+    async def flush(self) -> None:
+        """
+        Write every changed snapshot and all pending fills, one bulk write per collection.
+
+        Changes are taken off the account states before writing; whatever a
+        failed write carried is put back so the next flush retries it.
+        """
+        replacements: Dict[str, List[Tuple[AccountState, ReplaceOne]]] = {kind: [] for kind in STREAM_SNAPSHOT_COLLECTIONS}
+        trades: Dict[str, List[Tuple[AccountState, List[Dict[str, Any]]]]] = {SPOT_MARKET: [], FUTURES_MARKET: []}
+        for state in self._states.values():
+            account_filter = {field: state.account[field] for field in ACCOUNT_KEY_FIELDS}
+            for kind in state.dirty:
+                replacements[kind].append((state, ReplaceOne(account_filter, state.snapshot_document(kind), upsert=True)))
+            state.dirty = set()
+            if state.spot_trades:
+                trades[SPOT_MARKET].append((state, state.spot_trades))
+            if state.futures_trades:
+                trades[FUTURES_MARKET].append((state, state.futures_trades))
+            state.spot_trades, state.futures_trades = [], []
+
+        errors = []
+        for kind, pending in replacements.items():
+            if not pending:
+                continue
+            try:
+                await STREAM_SNAPSHOT_COLLECTIONS[kind].bulk_write([operation for _, operation in pending], ordered=False)
+            except Exception as e:
+                errors.append(e)
+                # The document is rebuilt from the current state on the next flush
+                for state, _ in pending:
+                    state.dirty.add(kind)
+
+        # Stream fills are stored without moving the REST sync watermarks, so a gap
+        # while disconnected is still filled in by the next trade-list sync
+        for market, collection in ((SPOT_MARKET, spot_trade_records_collection), (FUTURES_MARKET, futures_trade_records_collection)):
+            pending = trades[market]
+            if not pending:
+                continue
+            try:
+                await upsert_records(collection, [trade for _, fills in pending for trade in fills], TRADE_KEY_FIELDS)
+            except Exception as e:
+                errors.append(e)
+                # Upserts are keyed per trade, so retrying the whole batch stores nothing twice
+                for state, fills in pending:
+                    if market == SPOT_MARKET:
+                        state.spot_trades = fills + state.spot_trades
+                    else:
+                        state.futures_trades = fills + state.futures_trades
+                continue
+            for state, fills in pending:
+                try:
+                    await record_traded_symbols(*state.key, market, {trade["symbol"] for trade in fills})
+                except Exception as e:
+                    # Discovery also reads symbols from the stored trades, so these are not lost
+                    errors.append(e)
+
+        if errors:
+            raise errors[0]
+
+    def _stop_account(self, key: AccountKey) -> None:
+        for task in self._consumers.pop(key, []):
+            task.cancel()
+        self._states.pop(key, None)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush user data stream state: {str(e)}")
+            now = time.monotonic()
+            for key, state in list(self._states.items()):
+                if now - state.last_active > USER_STREAM_IDLE_SECONDS and not state.pending:
+                    logger.info(f"Closing idle user data streams for {key[1]}/{key[2]}")
+                    self._stop_account(key)
+
+    def start(self) -> None:
+        if self.enabled and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is None:
+            return
+        self._flush_task.cancel()
+        self._flush_task = None
+        for tasks in self._consumers.values():
+            for task in tasks:
+                task.cancel()
+        self._consumers.clear()
+        # Keep whatever arrived since the last flush
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush user data stream state on shutdown: {str(e)}")
+        self._states.clear()
+
+
+user_data_streams = UserDataStreamManager()
@@ -1,7 +1,7 @@
-import requests
 import logging
 from fastapi import HTTPException
 from typing import Dict, Any, List, Optional
+from services.exchange_info import spot_exchange_info, futures_exchange_info
 
 # Binance API base URL
 BASE_URL = "https://api.binance.com"
@@ -14,9 +14,7 @@ logger = logging.getLogger(__name__)
 # Helper function to get all trading symbols from Binance
 async def get_all_symbols():
     try:
-        response = requests.get(f"{BASE_URL}/api/v3/exchangeInfo")
-        response.raise_for_status()
-        symbols = [symbol["symbol"] for symbol in response.json()["symbols"]]
+        symbols = await spot_exchange_info.list_symbols()
         return symbols
     except Exception as e:
         logger.error(f"Failed to fetch symbols: {str(e)}")
@@ -37,9 +35,7 @@ def split_time_range(start_time: int, end_time: int) -> list[tuple[int, int]]:
 # Helper function to get all futures trading symbols from Binance
 async def get_all_symbols_futures() -> List[str]:
     try:
-        response = requests.get(f"{BASE_URL_FUTURES}/fapi/v1/exchangeInfo")
-        response.raise_for_status()
-        symbols = [symbol["symbol"] for symbol in response.json()["symbols"]]
+        symbols = await futures_exchange_info.list_symbols()
         return symbols
     except Exception as e:
         logger.error(f"Failed to fetch futures symbols: {str(e)}")
@@ -0,0 +1,172 @@
+import argparse
+import json
+import logging
+import math
+import os
+import pickle
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Store served by the chatbot
+RAG_INDEX_PATH = os.getenv("RAG_INDEX_PATH", "binance_docs_index_store")
+
+# Memory-map the index instead of reading it into each worker's heap
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "1") == "1"
+
+# Search-time knobs: IVF lists probed per query, HNSW candidate list size
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+RAG_HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+
+FLAT_INDEX = "flat"
+IVF_INDEX = "ivf"
+HNSW_INDEX = "hnsw"
+INDEX_TYPES = (FLAT_INDEX, IVF_INDEX, HNSW_INDEX)
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+METADATA_FILE = "index.json"
+
+
+# Helper function to read how a store was built; stores written by FAISS.save_local are flat
+def read_metadata(path: str) -> Dict[str, Any]:
+    metadata_path = Path(path) / METADATA_FILE
+    if not metadata_path.exists():
+        return {"type": FLAT_INDEX}
+    return json.loads(metadata_path.read_text())
+
+
+# Helper function to read a FAISS index, memory-mapped when possible
+def read_index(path: str, index_type: str = FLAT_INDEX, mmap: bool = RAG_INDEX_MMAP) -> Any:
+    index_path = str(Path(path) / INDEX_FILE)
+    if mmap:
+        # IVF maps its inverted lists; flat and HNSW map their code arrays
+        flag = faiss.IO_FLAG_MMAP if index_type == IVF_INDEX else faiss.IO_FLAG_MMAP_IFC
+        try:
+            return faiss.read_index(index_path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            logger.warning(f"Memory-mapping {index_path} failed, reading it into memory: {str(e)}")
+    return faiss.read_index(index_path)
+
+
+# Helper function to apply the search-time parameters of IVF and HNSW indexes
+# (read_index and make_index already return the concrete index class)
+def tune_index(index: Any, nprobe: int = RAG_IVF_NPROBE, ef_search: int = RAG_HNSW_EF_SEARCH) -> Any:
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = nprobe
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+
+# Core function to load the chatbot's vector store with the configured backend
+def load_vector_store(
+    embeddings: Any,
+    path: str = RAG_INDEX_PATH,
+    mmap: bool = RAG_INDEX_MMAP,
+    nprobe: int = RAG_IVF_NPROBE,
+    ef_search: int = RAG_HNSW_EF_SEARCH
+) -> Any:
+    """
+    Same result as ``FAISS.load_local(path, embeddings)``, but mapped and tuned.
+
+    The store is the layout ``FAISS.save_local`` writes (``index.faiss`` plus
+    ``index.pkl`` with the docstore and id mapping), optionally with an
+    ``index.json`` from ``build_store``. Mapping lets every uvicorn worker
+    share the same page-cache pages instead of holding its own copy.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    metadata = read_metadata(path)
+    start = time.perf_counter()
+    index = tune_index(read_index(path, metadata["type"], mmap), nprobe, ef_search)
+    # Our own store, written by FAISS.save_local or build_store below
+    with open(Path(path) / DOCSTORE_FILE, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    logger.info(f"Loaded {metadata['type']} index from {path} ({index.ntotal} vectors) in {time.perf_counter() - start:.2f}s")
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+# Helper function to pick an IVF list count for a corpus size; FAISS wants ~39 training points per list
+def default_nlist(count: int) -> int:
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+# Core function to build an index of the given type over a matrix of vectors
+def make_index(
+    vectors: np.ndarray,
+    index_type: str,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    ef_construction: int = 200
+) -> Any:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dimension = vectors.shape[1]
+    if index_type == FLAT_INDEX:
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == IVF_INDEX:
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, nlist or default_nlist(len(vectors)))
+        index.train(vectors)
+    elif index_type == HNSW_INDEX:
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        raise ValueError(f"Unsupported index type: {index_type}")
+    index.add(vectors)
+    return index
+
+
+# Core function to rebuild a stored index as another type, reusing its vectors and docstore
+def build_store(
+    source: str,
+    output: str,
+    index_type: str,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    ef_construction: int = 200
+) -> Dict[str, Any]:
+    source_index = faiss.read_index(str(Path(source) / INDEX_FILE))
+    vectors = source_index.reconstruct_n(0, source_index.ntotal)
+    index = make_index(vectors, index_type, nlist, hnsw_m, ef_construction)
+
+    Path(output).mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(Path(output) / INDEX_FILE))
+    # Vector ids are unchanged, so the docstore and id mapping carry over as is
+    shutil.copyfile(Path(source) / DOCSTORE_FILE, Path(output) / DOCSTORE_FILE)
+    metadata = {"type": index_type, "vectors": int(index.ntotal), "dimension": int(index.d)}
+    if index_type == IVF_INDEX:
+        metadata["nlist"] = int(index.nlist)
+    elif index_type == HNSW_INDEX:
+        metadata.update({"hnsw_m": hnsw_m, "ef_construction": ef_construction})
+    (Path(output) / METADATA_FILE).write_text(json.dumps(metadata, indent=2))
+    return metadata
+
+
+def main():
+    """
+    Build an IVF or HNSW store from the existing flat one (no re-embedding):
+        python -m services.vector_index --output binance_docs_index_ivf --type ivf
+        python -m services.vector_index --output binance_docs_index_hnsw --type hnsw --hnsw-m 32
+    """
+    parser = argparse.ArgumentParser(description="Build a FAISS store for the docs chatbot")
+    parser.add_argument("--source", default=RAG_INDEX_PATH, help="Existing store to take the vectors and docstore from")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--type", choices=INDEX_TYPES, default=IVF_INDEX)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default ~4*sqrt(vectors))")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    metadata = build_store(args.source, args.output, args.type, args.nlist, args.hnsw_m, args.ef_construction)
+    print(f"Built {args.output} in {time.perf_counter() - start:.1f}s: {metadata}")
+
+
+if __name__ == "__main__":
+    main()
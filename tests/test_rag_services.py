@@ -0,0 +1,168 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from services import rag_services
+from services.rag_services import CachedEmbeddings, RagPipeline, SemanticAnswerCache, normalize_query
+
+QUESTION = "What is the API rate limit?"
+# Cosine similarity to QUESTION ~0.995, above the 0.95 threshold
+NEAR_DUPLICATE = "What's the API rate limit"
+# Cosine similarity to QUESTION 0.6
+OTHER_QUESTION = "How do I withdraw funds?"
+
+VECTORS = {
+    normalize_query(QUESTION): [1.0, 0.0, 0.0],
+    normalize_query(NEAR_DUPLICATE): [0.99, 0.1, 0.0],
+    normalize_query(OTHER_QUESTION): [0.6, 0.8, 0.0],
+}
+
+
+class FakeEmbeddings(Embeddings):
+    """Fixed vectors per normalized question, recording every call."""
+
+    def __init__(self, vectors: Dict[str, List[float]]):
+        self.vectors = vectors
+        self.calls: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls.append(text)
+        return self.vectors[normalize_query(text)]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+class FakeIndex:
+    async def asimilarity_search_by_vector(self, embedding, k=4):
+        return [SimpleNamespace(page_content="Requests are limited to 6000 weight per minute.")]
+
+
+class FakeChat:
+    """Answers with a counter so every generated answer is distinguishable; ``release`` gates replies."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        answer = f"answer {self.calls}"
+        await self.release.wait()
+        return SimpleNamespace(content=answer)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def make_pipeline(ttl: float = 3600) -> RagPipeline:
+    embeddings = CachedEmbeddings(FakeEmbeddings(VECTORS))
+    return RagPipeline(embeddings, FakeIndex(), FakeChat(), SemanticAnswerCache(threshold=0.95, ttl=ttl))
+
+
+def test_exact_repeat_is_answered_from_cache():
+    pipeline = make_pipeline()
+
+    async def ask_twice():
+        return await pipeline.answer(QUESTION), await pipeline.answer("  what is the api RATE limit?")
+
+    first, second = asyncio.run(ask_twice())
+
+    assert first == {"answer": "answer 1", "found": True, "cached": False}
+    assert second == {"answer": "answer 1", "found": True, "cached": True}
+    assert pipeline.chat.calls == 1
+    # The normalized repeat reuses the cached embedding too
+    assert pipeline.embeddings.embeddings.calls == [QUESTION]
+
+
+def test_near_duplicate_above_threshold_is_a_hit():
+    pipeline = make_pipeline()
+
+    async def ask():
+        await pipeline.answer(QUESTION)
+        return await pipeline.answer(NEAR_DUPLICATE)
+
+    assert asyncio.run(ask()) == {"answer": "answer 1", "found": True, "cached": True}
+    assert pipeline.chat.calls == 1
+    assert pipeline.answer_cache.hits == 1
+
+
+def test_question_below_threshold_is_a_miss():
+    pipeline = make_pipeline()
+
+    async def ask():
+        await pipeline.answer(QUESTION)
+        return await pipeline.answer(OTHER_QUESTION)
+
+    assert asyncio.run(ask()) == {"answer": "answer 2", "found": True, "cached": False}
+    assert pipeline.chat.calls == 2
+    assert pipeline.answer_cache.misses == 2
+
+
+def test_cached_answer_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rag_services, "time", clock)
+    pipeline = make_pipeline(ttl=60)
+
+    async def ask_over_time():
+        first = await pipeline.answer(QUESTION)
+        clock.now += 59
+        within_ttl = await pipeline.answer(QUESTION)
+        clock.now += 1
+        expired = await pipeline.answer(QUESTION)
+        return first, within_ttl, expired
+
+    first, within_ttl, expired = asyncio.run(ask_over_time())
+
+    assert (first["cached"], within_ttl["cached"], expired["cached"]) == (False, True, False)
+    assert expired["answer"] == "answer 2"
+    assert pipeline.answer_cache.stats()["size"] == 1
+
+
+def test_concurrent_identical_questions_share_one_answer():
+    pipeline = make_pipeline()
+
+    async def ask_together():
+        pipeline.chat.release.clear()
+        tasks = [asyncio.create_task(pipeline.answer(QUESTION)) for _ in range(5)]
+        await asyncio.sleep(0)
+        pipeline.chat.release.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(ask_together())
+
+    assert pipeline.chat.calls == 1
+    assert {result["answer"] for result in results} == {"answer 1"}
+    assert sorted(result["cached"] for result in results) == [False, True, True, True, True]
+    assert pipeline.embeddings.embeddings.calls == [QUESTION]
+
+
+def test_cancelled_leader_does_not_strand_waiters():
+    pipeline = make_pipeline()
+
+    async def cancel_leader():
+        pipeline.chat.release.clear()
+        leader = asyncio.create_task(pipeline.answer(QUESTION))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(pipeline.answer(QUESTION))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        pipeline.chat.release.set()
+        return await asyncio.wait_for(waiter, 1)
+
+    result = asyncio.run(cancel_leader())
+
+    # The waiter took over the load after the leader was cancelled
+    assert result == {"answer": "answer 2", "found": True, "cached": False}
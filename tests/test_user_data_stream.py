@@ -0,0 +1,141 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from services import user_data_stream
+from services.user_data_stream import AccountState, UserDataStreamManager, replay_frames
+
+FRAMES_PATH = Path(__file__).parent / "fixtures" / "user_data_stream_frames.ndjson"
+
+# Time of the REST snapshots the state is seeded from; the fixture's first frame predates it
+SEEDED_AT_MS = 1700000000000
+
+
+def seeded_state() -> AccountState:
+    state = AccountState("user-1", "client", "main", "user@example.com")
+    state.seed_spot({"balances": [{"asset": "ETH", "free": 2.0, "locked": 0.0}]}, SEEDED_AT_MS)
+    state.seed_futures(
+        {"balances": [{"asset": "USDT", "balance": 500.0, "crossWalletBalance": 500.0, "availableBalance": 480.0}]},
+        {"positions": [{"symbol": "ETHUSDT", "positionSide": "BOTH", "positionAmt": 0.5, "entryPrice": 2000.0, "markPrice": 2010.0}]},
+        SEEDED_AT_MS
+    )
+    return state
+
+
+def test_replay_updates_spot_balances():
+    state = replay_frames(str(FRAMES_PATH), seeded_state())
+
+    # The ETH update is older than the seeding snapshot; zero balances are dropped
+    assert state.spot_balances == {
+        "ETH": {"asset": "ETH", "free": 2.0, "locked": 0.0},
+        "BTC": {"asset": "BTC", "free": 0.6, "locked": 0.0},
+        "USDT": {"asset": "USDT", "free": 4000.0, "locked": 0.0},
+    }
+
+
+def test_replay_updates_futures_balances_and_positions():
+    state = replay_frames(str(FRAMES_PATH), seeded_state())
+
+    usdt = state.futures_balances["USDT"]
+    assert usdt["balance"] == 499.8
+    assert usdt["crossWalletBalance"] == 499.8
+    # Fields the stream does not carry keep their REST values
+    assert usdt["availableBalance"] == 480.0
+
+    assert state.positions[("ETHUSDT", "BOTH")]["positionAmt"] == 0.5
+    btc = state.positions[("BTCUSDT", "BOTH")]
+    assert btc["positionAmt"] == 0.01
+    assert btc["entryPrice"] == 30000.0
+    assert btc["breakEvenPrice"] == 30012.0
+    assert btc["unRealizedProfit"] == 1.5
+    assert state.dirty == {"spot_balances", "futures_balances", "futures_positions"}
+
+
+def test_replay_collects_fills_only():
+    state = replay_frames(str(FRAMES_PATH), seeded_state())
+
+    assert len(state.spot_trades) == 1
+    spot = state.spot_trades[0]
+    assert (spot["symbol"], spot["id"], spot["orderId"]) == ("BTCUSDT", 111, 222)
+    assert (spot["price"], spot["qty"], spot["quoteQty"]) == (30000.0, 0.1, 3000.0)
+    assert (spot["commission"], spot["commissionAsset"]) == (0.0001, "BNB")
+    assert spot["isBuyer"] is True and spot["isMaker"] is True
+    assert "isBestMatch" not in spot
+    assert spot["account_name"] == "main"
+
+    assert len(state.futures_trades) == 1
+    futures = state.futures_trades[0]
+    assert (futures["symbol"], futures["id"], futures["orderId"]) == ("BTCUSDT", 444, 333)
+    assert (futures["price"], futures["qty"], futures["quoteQty"]) == (30000.0, 0.01, 300.0)
+    assert (futures["commission"], futures["commissionAsset"]) == (0.12, "USDT")
+    assert futures["buyer"] is True and futures["maker"] is False
+
+
+class FakeCollection:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.writes = []
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.fail:
+            raise RuntimeError("write failed")
+        self.writes.append(operations)
+
+
+def replayed_manager() -> UserDataStreamManager:
+    manager = UserDataStreamManager(enabled=False)
+    state = replay_frames(str(FRAMES_PATH), seeded_state())
+    manager._states[state.key] = state
+    return manager
+
+
+def test_flush_keeps_changes_when_writes_fail(monkeypatch):
+    async def failing_upsert(collection, records, key_fields):
+        raise RuntimeError("write failed")
+
+    async def record_traded_symbols(*args):
+        pass
+
+    collections = {kind: FakeCollection(fail=kind == "futures_positions") for kind in user_data_stream.STREAM_SNAPSHOT_COLLECTIONS}
+    monkeypatch.setattr(user_data_stream, "STREAM_SNAPSHOT_COLLECTIONS", collections)
+    monkeypatch.setattr(user_data_stream, "upsert_records", failing_upsert)
+    monkeypatch.setattr(user_data_stream, "record_traded_symbols", record_traded_symbols)
+    manager = replayed_manager()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(manager.flush())
+
+    state = next(iter(manager._states.values()))
+    assert len(collections["spot_balances"].writes) == 1
+    assert len(collections["futures_balances"].writes) == 1
+    assert state.dirty == {"futures_positions"}
+    assert [trade["id"] for trade in state.spot_trades] == [111]
+    assert [trade["id"] for trade in state.futures_trades] == [444]
+    assert state.pending
+
+
+def test_flush_clears_changes_once_written(monkeypatch):
+    stored = []
+    recorded = []
+
+    async def upsert_records(collection, records, key_fields):
+        stored.extend(records)
+        return len(records)
+
+    async def record_traded_symbols(user_id, client_name, account_name, market, symbols):
+        recorded.append((market, symbols))
+
+    collections = {kind: FakeCollection() for kind in user_data_stream.STREAM_SNAPSHOT_COLLECTIONS}
+    monkeypatch.setattr(user_data_stream, "STREAM_SNAPSHOT_COLLECTIONS", collections)
+    monkeypatch.setattr(user_data_stream, "upsert_records", upsert_records)
+    monkeypatch.setattr(user_data_stream, "record_traded_symbols", record_traded_symbols)
+    manager = replayed_manager()
+
+    asyncio.run(manager.flush())
+
+    state = next(iter(manager._states.values()))
+    assert not state.pending
+    assert all(len(collection.writes) == 1 for collection in collections.values())
+    assert sorted(trade["id"] for trade in stored) == [111, 444]
+    assert sorted(recorded) == [("futures", {"BTCUSDT"}), ("spot", {"BTCUSDT"})]
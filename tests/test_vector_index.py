@@ -0,0 +1,79 @@
+import pickle
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from services import vector_index
+from services.vector_index import DOCSTORE_FILE, INDEX_FILE, build_store, load_vector_store
+
+DIMENSION = 8
+COUNT = 400
+
+
+class FakeEmbeddings(Embeddings):
+    """Embeds a document's number as its row of the fixed vector matrix."""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[int(text.split()[-1])].tolist()
+
+
+def save_flat_store(path: Path, vectors: np.ndarray) -> None:
+    """Writes the layout ``FAISS.save_local`` produces."""
+    index = faiss.IndexFlatL2(DIMENSION)
+    index.add(vectors)
+    path.mkdir()
+    faiss.write_index(index, str(path / INDEX_FILE))
+    ids = {i: str(i) for i in range(COUNT)}
+    docstore = InMemoryDocstore({str(i): Document(page_content=f"doc {i}") for i in range(COUNT)})
+    with open(path / DOCSTORE_FILE, "wb") as f:
+        pickle.dump((docstore, ids), f)
+
+
+@pytest.fixture
+def vectors() -> np.ndarray:
+    return np.random.default_rng(0).random((COUNT, DIMENSION), dtype=np.float32)
+
+
+@pytest.mark.parametrize("index_type", vector_index.INDEX_TYPES)
+@pytest.mark.parametrize("mmap", [True, False])
+def test_loaded_store_answers_similarity_search(tmp_path, vectors, index_type, mmap):
+    flat = tmp_path / "flat"
+    save_flat_store(flat, vectors)
+    path = flat
+    if index_type != vector_index.FLAT_INDEX:
+        path = tmp_path / index_type
+        build_store(str(flat), str(path), index_type)
+
+    store = load_vector_store(FakeEmbeddings(vectors), str(path), mmap=mmap, nprobe=8, ef_search=32)
+
+    assert store.index.d == DIMENSION
+    assert store.index.ntotal == COUNT
+    # A stored vector's nearest neighbour is its own document
+    assert store.similarity_search("doc 42", k=1)[0].page_content == "doc 42"
+
+
+def test_tune_index_sets_search_parameters(tmp_path, vectors):
+    save_flat_store(tmp_path / "flat", vectors)
+    build_store(str(tmp_path / "flat"), str(tmp_path / "ivf"), vector_index.IVF_INDEX)
+    build_store(str(tmp_path / "flat"), str(tmp_path / "hnsw"), vector_index.HNSW_INDEX)
+
+    ivf = vector_index.tune_index(vector_index.read_index(str(tmp_path / "ivf"), vector_index.IVF_INDEX), nprobe=5)
+    hnsw = vector_index.tune_index(vector_index.read_index(str(tmp_path / "hnsw"), vector_index.HNSW_INDEX), ef_search=48)
+
+    assert ivf.nprobe == 5
+    assert hnsw.hnsw.efSearch == 48